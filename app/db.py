@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
@@ -14,3 +14,25 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+
+
+def enable_sqlite_foreign_keys(dbapi_connection, _connection_record) -> None:
+    """Без этой настройки SQLite не проверяет внешние ключи и не выполняет ON DELETE CASCADE:
+    удаление эксперимента оставило бы его точки, статистику каналов и агрегаты."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def enable_sqlite_wal(dbapi_connection, _connection_record) -> None:
+    """WAL: чтение не блокируется долгой транзакцией импорта, а запись не ждёт читателей."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", enable_sqlite_foreign_keys)
+    if engine.url.database not in (None, "", ":memory:"):
+        event.listen(engine, "connect", enable_sqlite_wal)
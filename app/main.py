@@ -1,21 +1,51 @@
 from __future__ import annotations
 
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 
+from app import migrations
 from app.db import engine
-from app.models import Base
+from app.dependencies import get_db
 from app.routers import analytics, experiments, export, import_data, web
+from app.services import export_job_service, import_job_service, live_ingest_service
+
+# Новая БД создаётся по моделям, существующая доводится до текущей схемы
+migrations.upgrade(engine)
+
+# 1 — при старте считать прерванными все незавершённые фоновые импорты и выгрузки в БД.
+# Включается только для единственного процесса приложения: при нескольких воркерах uvicorn
+# или поэтапном перезапуске это остановило бы задачи других процессов и удалило их файлы.
+RECOVER_INTERRUPTED_JOBS = int(os.getenv("RECOVER_INTERRUPTED_JOBS", "0"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if RECOVER_INTERRUPTED_JOBS:
+        # Сессия — через get_db, чтобы действовала и подмена зависимости
+        sessions = app.dependency_overrides.get(get_db, get_db)()
+        db = next(sessions)
+        try:
+            import_job_service.recover_interrupted_runs(db)
+            export_job_service.recover_interrupted_jobs(db)
+        finally:
+            sessions.close()
+    yield
+    live_ingest_service.shutdown()
+    import_job_service.shutdown()
+    export_job_service.shutdown()
 
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Experiment Logger & Analyzer",
     description="Импорт и анализ экспериментальных данных: каналы, графики, сводка, экспорт.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 _app_dir = Path(__file__).resolve().parent
@@ -0,0 +1,588 @@
+"""Миграции схемы для уже существующих БД.
+
+Новая БД создаётся по моделям (``create_all``) и сразу получает последнюю версию.
+Для БД, созданной раньше, недостающие шаги MIGRATIONS выполняются по порядку,
+номер версии хранится в таблице ``schema_version``. БД без этой таблицы, но с
+данными считается БД исходной версии 0.
+
+Каждый шаг описывает таблицы так, как они выглядели на момент шага (а не через
+текущие модели), чтобы старые шаги не менялись при следующих изменениях схемы.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from collections.abc import Callable
+
+import numpy as np
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    MetaData,
+    Select,
+    SmallInteger,
+    String,
+    Table,
+    Text,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    inspect,
+    literal,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.types import TypeEngine
+
+from app.models import Base
+from app.services import rollup_service
+from app.services.sketches import Moments, TDigest
+
+logger = logging.getLogger(__name__)
+
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+# ---------------------------------------------------------------------------
+# 1: недостающие колонки import_runs (статус фоновых импортов, прогресс, сжатие, источник)
+#    Колонки, которые появлялись в модели до этой миграции, — все здесь; новые — отдельными шагами.
+# ---------------------------------------------------------------------------
+
+_IMPORT_RUN_COLUMNS: list[tuple[str, TypeEngine, str | None]] = [
+    # (имя, тип, значение по умолчанию для NOT NULL колонок)
+    ("finished_at", DateTime(timezone=True), None),
+    ("status", String(16), "'done'"),
+    ("rows_processed", BigInteger(), "0"),
+    ("bytes_processed", BigInteger(), "0"),
+    ("bytes_total", BigInteger(), None),
+    ("duration_seconds", Float(), None),
+    ("rows_per_sec", Float(), None),
+    ("compression", String(8), None),
+    ("compressed_bytes", BigInteger(), None),
+    ("uncompressed_bytes", BigInteger(), None),
+    ("error_message", Text(), None),
+    ("source", String(8), "'file'"),
+]
+
+
+def _add_import_run_columns(conn: Connection) -> None:
+    existing = {column["name"] for column in inspect(conn).get_columns("import_runs")}
+    for name, column_type, default in _IMPORT_RUN_COLUMNS:
+        if name in existing:
+            continue
+        ddl = f"ALTER TABLE import_runs ADD COLUMN {name} {column_type.compile(conn.dialect)}"
+        if default is not None:
+            ddl += f" NOT NULL DEFAULT {default}"
+        conn.execute(text(ddl))
+
+
+# ---------------------------------------------------------------------------
+# 2: справочники channels/units/tags и код качества в data_points
+# ---------------------------------------------------------------------------
+
+_QUALITY_CODES = {"OK": 1, "WARN": 2, "BAD": 3}
+
+
+def _dictionary_encode(conn: Connection) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("data_points")}
+    if "channel_id" in columns:
+        return
+
+    md = _reflect_parents(conn)
+    dimensions = {
+        name: Table(
+            name,
+            md,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("name", String(length), nullable=False, unique=True),
+        )
+        for name, length in (("channels", 128), ("units", 32), ("tags", 64))
+    }
+    for table in dimensions.values():
+        table.create(conn, checkfirst=True)
+
+    current = Table("data_points", MetaData(), autoload_with=conn)
+    for name, column in (("channels", current.c.channel), ("units", current.c.unit), ("tags", current.c.tag)):
+        table = dimensions[name]
+        names = select(column).where(column.is_not(None)).where(column.not_in(select(table.c.name))).distinct()
+        conn.execute(insert(table).from_select(["name"], names))
+
+    channels, units, tags = dimensions["channels"], dimensions["units"], dimensions["tags"]
+
+    def rows(old: Table) -> Select:
+        quality = case(_QUALITY_CODES, value=old.c.quality, else_=None)
+        return (
+            select(
+                old.c.id, old.c.experiment_id, old.c.import_run_id, old.c.timestamp,
+                channels.c.id, old.c.value, units.c.id, quality, tags.c.id,
+            )
+            .select_from(old)
+            .join(channels, channels.c.name == old.c.channel)
+            .outerjoin(units, units.c.name == old.c.unit)
+            .outerjoin(tags, tags.c.name == old.c.tag)
+        )
+
+    _rebuild_data_points(
+        conn,
+        md,
+        [
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("experiment_id", ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False, index=True),
+            Column("import_run_id", ForeignKey("import_runs.id"), nullable=False, index=True),
+            Column("timestamp", DateTime(timezone=True), nullable=False, index=True),
+            Column("channel_id", ForeignKey("channels.id"), nullable=False, index=True),
+            Column("value", Float, nullable=False),
+            Column("unit_id", ForeignKey("units.id"), nullable=True),
+            Column("quality", SmallInteger, nullable=True, index=True),
+            Column("tag_id", ForeignKey("tags.id"), nullable=True, index=True),
+            Index("ix_dp_experiment_timestamp_channel", "experiment_id", "timestamp", "channel_id"),
+        ],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# 3: время точки — целые микросекунды UTC (ts_us) и смещение в минутах (tz_offset)
+# ---------------------------------------------------------------------------
+
+def _epoch_us_expression(conn: Connection, column: ColumnElement) -> ColumnElement:
+    if conn.dialect.name == "sqlite":
+        # SQLite хранил DateTime текстом 'YYYY-MM-DD HH:MM:SS.ffffff' без смещения
+        seconds = cast(func.strftime("%s", column), BigInteger)
+        fraction = func.substr(func.substr(column, 21, 6).concat("000000"), 1, 6)
+        return seconds * 1_000_000 + case((func.substr(column, 20, 1) == ".", cast(fraction, BigInteger)), else_=0)
+    if conn.dialect.name == "postgresql":
+        return cast(func.extract("epoch", column) * 1_000_000, BigInteger)
+    raise RuntimeError(f"Migration to ts_us is not implemented for {conn.dialect.name}")
+
+
+def _epoch_timestamps(conn: Connection) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("data_points")}
+    if "ts_us" in columns:
+        return
+
+    md = _reflect_parents(conn)
+
+    def rows(old: Table) -> Select:
+        # Исходное смещение в старой схеме не сохранялось: SQLite писал локальное время без пояса.
+        # Такие значения считаются UTC (tz_offset = 0) — выводятся с теми же часами и минутами.
+        return select(
+            old.c.id, old.c.experiment_id, old.c.import_run_id,
+            _epoch_us_expression(conn, old.c.timestamp), literal(0, SmallInteger),
+            old.c.channel_id, old.c.value, old.c.unit_id, old.c.quality, old.c.tag_id,
+        )
+
+    _rebuild_data_points(
+        conn,
+        md,
+        [
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("experiment_id", ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False, index=True),
+            Column("import_run_id", ForeignKey("import_runs.id"), nullable=False, index=True),
+            Column("ts_us", BigInteger, nullable=False, index=True),
+            Column("tz_offset", SmallInteger, nullable=False),
+            Column("channel_id", ForeignKey("channels.id"), nullable=False, index=True),
+            Column("value", Float, nullable=False),
+            Column("unit_id", ForeignKey("units.id"), nullable=True),
+            Column("quality", SmallInteger, nullable=True, index=True),
+            Column("tag_id", ForeignKey("tags.id"), nullable=True, index=True),
+            Index("ix_dp_experiment_ts_channel", "experiment_id", "ts_us", "channel_id"),
+        ],
+        rows,
+    )
+
+
+# ---------------------------------------------------------------------------
+# 4: индексы data_points под запросы series/channels и export/summary
+# ---------------------------------------------------------------------------
+
+_REDUNDANT_INDEXES = (
+    "ix_data_points_experiment_id",
+    "ix_data_points_ts_us",
+    "ix_data_points_channel_id",
+    "ix_data_points_quality",
+    "ix_data_points_tag_id",
+    "ix_dp_experiment_ts_channel",
+)
+
+
+def _query_indexes(conn: Connection) -> None:
+    for name in _REDUNDANT_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    dp = Table("data_points", MetaData(), autoload_with=conn)
+    Index(
+        "ix_dp_experiment_channel_ts", dp.c.experiment_id, dp.c.channel_id, dp.c.ts_us, dp.c.tz_offset, dp.c.value
+    ).create(conn, checkfirst=True)
+    Index("ix_dp_experiment_ts", dp.c.experiment_id, dp.c.ts_us).create(conn, checkfirst=True)
+
+
+# ---------------------------------------------------------------------------
+# 5: материализованная статистика каналов channel_stats
+# ---------------------------------------------------------------------------
+
+def _channel_stats(conn: Connection) -> None:
+    md = _reflect_parents(conn)
+    stats = Table(
+        "channel_stats",
+        md,
+        Column("experiment_id", ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True),
+        Column("channel_id", ForeignKey("channels.id"), primary_key=True),
+        Column("count", BigInteger, nullable=False),
+        Column("min", Float, nullable=False),
+        Column("max", Float, nullable=False),
+        Column("sum", Float, nullable=False),
+        Column("first_ts", BigInteger, nullable=False),
+        Column("last_ts", BigInteger, nullable=False),
+    )
+    stats.create(conn, checkfirst=True)
+    conn.execute(delete(stats))
+
+    dp = Table("data_points", MetaData(), autoload_with=conn)
+    points = select(
+        dp.c.experiment_id,
+        dp.c.channel_id,
+        func.count(),
+        func.min(dp.c.value),
+        func.max(dp.c.value),
+        func.sum(dp.c.value),
+        func.min(dp.c.ts_us),
+        func.max(dp.c.ts_us),
+    ).group_by(dp.c.experiment_id, dp.c.channel_id)
+    conn.execute(insert(stats).from_select([column.name for column in stats.columns], points))
+
+
+# ---------------------------------------------------------------------------
+# 6: сводки распределения channel_sketches по уже загруженным точкам
+# ---------------------------------------------------------------------------
+
+_SKETCH_CHUNK = 100_000
+
+
+def _channel_sketches(conn: Connection) -> None:
+    md = _reflect_parents(conn)
+    sketches = Table(
+        "channel_sketches",
+        md,
+        Column("experiment_id", ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True),
+        Column("channel_id", ForeignKey("channels.id"), primary_key=True),
+        Column("import_run_id", ForeignKey("import_runs.id"), primary_key=True),
+        Column("count", BigInteger, nullable=False),
+        Column("mean", Float, nullable=False),
+        Column("m2", Float, nullable=False),
+        Column("digest", LargeBinary, nullable=False),
+    )
+    sketches.create(conn, checkfirst=True)
+    conn.execute(delete(sketches))
+
+    # Точки читаются в порядке индекса (эксперимент, канал); значения копятся кусками,
+    # чтобы память не зависела от размера канала
+    dp = Table("data_points", MetaData(), autoload_with=conn)
+    stmt = select(dp.c.experiment_id, dp.c.channel_id, dp.c.import_run_id, dp.c.value).order_by(
+        dp.c.experiment_id, dp.c.channel_id
+    )
+    pending: dict[tuple[int, int, int], list[float]] = defaultdict(list)
+    summaries: dict[tuple[int, int, int], tuple[Moments, TDigest]] = {}
+
+    def add(key: tuple[int, int, int]) -> None:
+        values = np.asarray(pending.pop(key), dtype=np.float64)
+        moments, digest = summaries.setdefault(key, (Moments(), TDigest()))
+        moments.add(values)
+        digest.add(values)
+
+    def write() -> None:
+        for key in list(pending):
+            add(key)
+        rows = [
+            {
+                "experiment_id": experiment_id, "channel_id": channel_id, "import_run_id": run_id,
+                "count": moments.count, "mean": moments.mean, "m2": moments.m2, "digest": digest.to_bytes(),
+            }
+            for (experiment_id, channel_id, run_id), (moments, digest) in summaries.items()
+        ]
+        if rows:
+            conn.execute(insert(sketches), rows)
+        summaries.clear()
+
+    channel = None
+    for experiment_id, channel_id, run_id, value in conn.execution_options(stream_results=True).execute(stmt):
+        if (experiment_id, channel_id) != channel:
+            write()
+            channel = (experiment_id, channel_id)
+        values = pending[experiment_id, channel_id, run_id]
+        values.append(value)
+        if len(values) >= _SKETCH_CHUNK:
+            add((experiment_id, channel_id, run_id))
+    write()
+
+
+# ---------------------------------------------------------------------------
+# 7: пирамида агрегатов channel_rollups по уже загруженным точкам
+# ---------------------------------------------------------------------------
+
+def _channel_rollups(conn: Connection) -> None:
+    md = _reflect_parents(conn)
+    rollups = Table(
+        "channel_rollups",
+        md,
+        Column("experiment_id", ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True),
+        Column("channel_id", ForeignKey("channels.id"), primary_key=True),
+        Column("resolution", Integer, primary_key=True),
+        Column("bucket_us", BigInteger, primary_key=True),
+        Column("count", BigInteger, nullable=False),
+        Column("min", Float, nullable=False),
+        Column("max", Float, nullable=False),
+        Column("sum", Float, nullable=False),
+        Column("first_ts", BigInteger, nullable=False),
+        Column("first_value", Float, nullable=False),
+        Column("first_offset", SmallInteger, nullable=False, server_default="0"),
+        Column("last_ts", BigInteger, nullable=False),
+        Column("last_value", Float, nullable=False),
+    )
+    rollups.create(conn, checkfirst=True)
+    conn.execute(delete(rollups))
+
+    # Точки каждого эксперимента читаются кусками; корзины на границах кусков объединяет upsert
+    dp = Table("data_points", MetaData(), autoload_with=conn)
+    experiment_ids = conn.execute(select(dp.c.experiment_id).distinct()).scalars().all()
+    for experiment_id in experiment_ids:
+        stmt = select(dp.c.channel_id, dp.c.ts_us, dp.c.tz_offset, dp.c.value).where(
+            dp.c.experiment_id == experiment_id
+        )
+        result = conn.execution_options(yield_per=rollup_service.ROLLUP_REBUILD_CHUNK).execute(stmt)
+        for chunk in result.partitions():
+            channel_ids, timestamps, offsets, values = zip(*chunk)
+            rollup_service.add_points(conn, experiment_id, channel_ids, timestamps, offsets, values, table=rollups)
+
+
+# ---------------------------------------------------------------------------
+# 8: версия данных эксперимента (ETag и кэш ответов analytics)
+# ---------------------------------------------------------------------------
+
+def _experiment_data_version(conn: Connection) -> None:
+    existing = {column["name"] for column in inspect(conn).get_columns("experiments")}
+    if "data_version" not in existing:
+        conn.execute(text("ALTER TABLE experiments ADD COLUMN data_version BIGINT NOT NULL DEFAULT 0"))
+
+
+# ---------------------------------------------------------------------------
+# 9: id экспериментов не переиспользуются (AUTOINCREMENT в SQLite)
+# ---------------------------------------------------------------------------
+
+# Таблицы с experiment_id; сначала ссылающиеся на import_runs
+_EXPERIMENT_CHILDREN = (
+    "data_points", "channel_sketches", "channel_stats", "channel_rollups", "export_jobs", "import_runs",
+)
+
+
+def _experiment_autoincrement(conn: Connection) -> None:
+    # В PostgreSQL последовательность SERIAL и так не возвращает освободившиеся id
+    if conn.dialect.name != "sqlite":
+        return
+    # Следующий id — больше любого встречавшегося, в том числе у строк удалённых экспериментов
+    used = [conn.execute(text("SELECT MAX(id) FROM experiments")).scalar() or 0]
+    for name in _EXPERIMENT_CHILDREN:
+        if inspect(conn).has_table(name):
+            used.append(conn.execute(text(f"SELECT MAX(experiment_id) FROM {name}")).scalar() or 0)
+
+    md = MetaData()
+    experiments = Table(
+        "experiments_new",
+        md,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("name", String(255), nullable=False),
+        Column("stand", String(128)),
+        Column("operator", String(128)),
+        Column("notes", Text),
+        Column("created_at", DateTime(timezone=True), nullable=False),
+        Column("data_version", BigInteger, nullable=False, server_default="0"),
+        sqlite_autoincrement=True,
+    )
+    experiments.create(conn)
+    columns = ", ".join(column.name for column in experiments.columns)
+    conn.execute(text(f"INSERT INTO experiments_new ({columns}) SELECT {columns} FROM experiments"))
+    # Внешние ключи на время миграции выключены (upgrade): ссылки на experiments остаются по имени
+    conn.execute(text("DROP TABLE experiments"))
+    conn.execute(text("ALTER TABLE experiments_new RENAME TO experiments"))
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'experiments'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('experiments', :seq)"), {"seq": max(used)})
+
+
+# ---------------------------------------------------------------------------
+# 10: строки удалённых экспериментов (SQLite работал без PRAGMA foreign_keys)
+# ---------------------------------------------------------------------------
+
+def _orphaned_experiment_rows(conn: Connection) -> None:
+    for name in _EXPERIMENT_CHILDREN:
+        if inspect(conn).has_table(name):
+            conn.execute(text(f"DELETE FROM {name} WHERE experiment_id NOT IN (SELECT id FROM experiments)"))
+
+
+# ---------------------------------------------------------------------------
+# 11: смещение пояса первой точки корзины (series по агрегатам — в поясе точек)
+# ---------------------------------------------------------------------------
+
+def _rollup_first_offset(conn: Connection) -> None:
+    existing = {column["name"] for column in inspect(conn).get_columns("channel_rollups")}
+    if "first_offset" in existing:
+        return
+    conn.execute(text("ALTER TABLE channel_rollups ADD COLUMN first_offset SMALLINT NOT NULL DEFAULT 0"))
+    # Первая точка корзины находится по ix_dp_experiment_channel_ts, tz_offset берётся из индекса
+    conn.execute(text(
+        "UPDATE channel_rollups SET first_offset = COALESCE(("
+        "SELECT tz_offset FROM data_points AS dp WHERE dp.experiment_id = channel_rollups.experiment_id "
+        "AND dp.channel_id = channel_rollups.channel_id AND dp.ts_us = channel_rollups.first_ts LIMIT 1), 0)"
+    ))
+
+
+# ---------------------------------------------------------------------------
+# 12: запрос отмены импорта в БД (его видят воркеры всех процессов)
+# ---------------------------------------------------------------------------
+
+def _import_run_cancel_requested(conn: Connection) -> None:
+    existing = {column["name"] for column in inspect(conn).get_columns("import_runs")}
+    if "cancel_requested" not in existing:
+        conn.execute(text("ALTER TABLE import_runs ADD COLUMN cancel_requested BOOLEAN NOT NULL DEFAULT false"))
+
+
+# ---------------------------------------------------------------------------
+# 13: запрос отмены выгрузки в БД (export_jobs без данных создаёт create_all)
+# ---------------------------------------------------------------------------
+
+def _export_job_cancel_requested(conn: Connection) -> None:
+    if not inspect(conn).has_table("export_jobs"):
+        return
+    existing = {column["name"] for column in inspect(conn).get_columns("export_jobs")}
+    if "cancel_requested" not in existing:
+        conn.execute(text("ALTER TABLE export_jobs ADD COLUMN cancel_requested BOOLEAN NOT NULL DEFAULT false"))
+
+
+# ---------------------------------------------------------------------------
+# Общие шаги
+# ---------------------------------------------------------------------------
+
+def _reflect_parents(conn: Connection) -> MetaData:
+    """MetaData с таблицами, на которые ссылается data_points (для внешних ключей)."""
+    md = MetaData()
+    for name in ("experiments", "import_runs", "channels", "units", "tags"):
+        if inspect(conn).has_table(name):
+            Table(name, md, autoload_with=conn)
+    return md
+
+
+def _rebuild_data_points(
+    conn: Connection,
+    md: MetaData,
+    columns: list[Column | Index],
+    rows: Callable[[Table], Select],
+) -> None:
+    """Пересоздаёт data_points с новым набором колонок и переносит строки запросом rows(old).
+
+    Колонки rows(old) перечисляются в порядке колонок новой таблицы.
+    """
+    # Имена индексов глобальны (SQLite, PostgreSQL): старые удаляются до создания новых
+    for index in inspect(conn).get_indexes("data_points"):
+        conn.execute(text(f"DROP INDEX {index['name']}"))
+    conn.execute(text("ALTER TABLE data_points RENAME TO data_points_old"))
+    old = Table("data_points_old", md, autoload_with=conn)
+
+    new = Table("data_points", md, *columns)
+    new.create(conn)
+    conn.execute(insert(new).from_select([column.name for column in new.columns], rows(old)))
+    old.drop(conn)
+    md.remove(old)
+
+    if conn.dialect.name == "postgresql":
+        # Явные id не двигают последовательность SERIAL
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('data_points', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM data_points), 0) + 1, false)"
+        ))
+
+
+# Номер версии -> шаг; номера только растут, выполненные шаги не меняются
+MIGRATIONS: list[tuple[int, Callable[[Connection], None]]] = [
+    (1, _add_import_run_columns),
+    (2, _dictionary_encode),
+    (3, _epoch_timestamps),
+    (4, _query_indexes),
+    (5, _channel_stats),
+    (6, _channel_sketches),
+    (7, _channel_rollups),
+    (8, _experiment_data_version),
+    (9, _experiment_autoincrement),
+    (10, _orphaned_experiment_rows),
+    (11, _rollup_first_offset),
+    (12, _import_run_cancel_requested),
+    (13, _export_job_cancel_requested),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _get_version(conn: Connection) -> int | None:
+    if not inspect(conn).has_table("schema_version"):
+        return None
+    return conn.execute(select(schema_version.c.version)).scalar()
+
+
+def _set_version(conn: Connection, version: int) -> None:
+    _version_metadata.create_all(conn)
+    conn.execute(delete(schema_version))
+    conn.execute(insert(schema_version).values(version=version))
+
+
+def _disable_sqlite_foreign_keys(conn: Connection) -> bool:
+    """Выключает проверку внешних ключей SQLite на время миграции; возвращает, была ли она включена.
+
+    Так SQLite рекомендует перестраивать таблицы, а в БД, созданных до включения
+    foreign_keys, остаются строки удалённых экспериментов (их удаляет шаг 10).
+    PRAGMA действует только вне транзакции.
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    enabled = bool(conn.exec_driver_sql("PRAGMA foreign_keys").scalar())
+    conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    conn.commit()
+    return enabled
+
+
+def upgrade(engine: Engine) -> list[int]:
+    """Доводит схему БД до текущей; возвращает номера выполненных шагов."""
+    applied = []
+    with engine.connect() as conn:
+        foreign_keys = _disable_sqlite_foreign_keys(conn)
+        try:
+            with conn.begin():
+                version = _get_version(conn)
+                if version is None:
+                    # Нет таблиц приложения — новая БД, создаётся сразу в последней версии
+                    version = 0 if inspect(conn).has_table("experiments") else LATEST_VERSION
+
+                for number, step in MIGRATIONS:
+                    if number > version:
+                        logger.info("Applying schema migration %d: %s", number, step.__name__)
+                        step(conn)
+                        applied.append(number)
+
+                Base.metadata.create_all(conn)
+                _set_version(conn, max(version, LATEST_VERSION))
+        finally:
+            if foreign_keys:
+                conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+                conn.commit()
+    return applied
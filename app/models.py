@@ -2,9 +2,42 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, String, Text
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+    Text,
+    TypeDecorator,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+# Коды качества точки в БД (SmallInteger вместо строки в каждой строке data_points)
+QUALITY_CODES = {"OK": 1, "WARN": 2, "BAD": 3}
+QUALITY_NAMES = {code: name for name, code in QUALITY_CODES.items()}
+
+
+class QualityCode(TypeDecorator):
+    """Качество хранится кодом QUALITY_CODES, в Python и в запросах — строкой OK/WARN/BAD.
+
+    Неизвестная строка (например, в фильтре выгрузки) превращается в 0 и ничему не соответствует.
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: str | None, dialect) -> int | None:
+        return None if value is None else QUALITY_CODES.get(value, 0)
+
+    def process_result_value(self, value: int | None, dialect) -> str | None:
+        return None if value is None else QUALITY_NAMES.get(value)
+
 
 class Base(DeclarativeBase):
     pass
@@ -12,6 +45,8 @@ class Base(DeclarativeBase):
 
 class Experiment(Base):
     __tablename__ = "experiments"
+    # id удалённого эксперимента не достаётся новому: ETag и кэш ответов ключуются (id, data_version)
+    __table_args__ = ({"sqlite_autoincrement": True},)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -19,6 +54,8 @@ class Experiment(Base):
     operator: Mapped[str | None] = mapped_column(String(128), nullable=True)
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # Растёт с каждой записанной пачкой точек и с удалением точек: ETag и ключи кэша ответов
+    data_version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
 
     data_points: Mapped[list["DataPoint"]] = relationship(
         back_populates="experiment",
@@ -30,6 +67,22 @@ class Experiment(Base):
         cascade="all, delete-orphan",
         passive_deletes=True,
     )
+    channel_stats: Mapped[list["ChannelStats"]] = relationship(
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    channel_sketches: Mapped[list["ChannelSketch"]] = relationship(
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    channel_rollups: Mapped[list["ChannelRollup"]] = relationship(
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    export_jobs: Mapped[list["ExportJob"]] = relationship(
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
 
 class ImportRun(Base):
@@ -40,36 +93,177 @@ class ImportRun(Base):
         ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False, index=True
     )
     started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    source: Mapped[str] = mapped_column(String(8), nullable=False, default="file")  # file/live
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="done")  # queued/running/done/failed/cancelled
     inserted: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     skipped: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     errors: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    rows_processed: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    bytes_processed: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    bytes_total: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    duration_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)
+    rows_per_sec: Mapped[float | None] = mapped_column(Float, nullable=True)
+    compression: Mapped[str | None] = mapped_column(String(8), nullable=True)  # gzip/bz2/zstd
+    compressed_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    uncompressed_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Запрос отмены: воркер любого процесса проверяет его после каждой зафиксированной пачки
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
 
     experiment: Mapped["Experiment"] = relationship(back_populates="import_runs")
     data_points: Mapped[list["DataPoint"]] = relationship(back_populates="import_run")
 
 
+class ExportJob(Base):
+    """Фоновая выгрузка: параметры, прогресс и готовый файл в спуле (export_job_service).
+
+    Готовый файл переиспользуется для той же выгрузки (params_hash), пока его не вытеснят
+    по сроку или по размеру спула — тогда статус становится expired.
+    """
+
+    __tablename__ = "export_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    experiment_id: Mapped[int] = mapped_column(
+        ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # queued/running/done/failed/cancelled/expired
+    params: Mapped[str] = mapped_column(Text, nullable=False)  # JSON: format, layout, фильтры
+    params_hash: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    rows_written: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    rows_estimate: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    bytes_written: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    accessed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Запрос отмены: воркер любого процесса проверяет его на границе каждого куска
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+
+
+class Channel(Base):
+    """Справочник каналов: data_points хранит короткий целый ключ вместо имени."""
+
+    __tablename__ = "channels"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
+
+
+class Unit(Base):
+    __tablename__ = "units"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(32), nullable=False, unique=True)
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+
+
 class DataPoint(Base):
     __tablename__ = "data_points"
 
-    # Compound index for the most common query pattern: filter by experiment + time range + channel
+    # Индексы под запросы, а не под каждую колонку: каждый лишний индекс замедляет импорт.
+    # Отдельные индексы по experiment_id/ts_us не нужны — это префиксы составных.
     __table_args__ = (
-        Index("ix_dp_experiment_timestamp_channel", "experiment_id", "timestamp", "channel"),
+        # series и статистика каналов: эксперимент + каналы + диапазон времени, порядок (канал, время);
+        # tz_offset и value включены в индекс, чтобы эти запросы не читали саму таблицу
+        Index("ix_dp_experiment_channel_ts", "experiment_id", "channel_id", "ts_us", "tz_offset", "value"),
+        # export и summary: эксперимент + диапазон времени, порядок по времени
+        Index("ix_dp_experiment_ts", "experiment_id", "ts_us"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     experiment_id: Mapped[int] = mapped_column(
-        ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False, index=True
+        ForeignKey("experiments.id", ondelete="CASCADE"), nullable=False
     )
+    # Удаление точек прерванного или отменённого импорта
     import_run_id: Mapped[int] = mapped_column(
         ForeignKey("import_runs.id"), nullable=False, index=True
     )
-    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
-    channel: Mapped[str] = mapped_column(String(128), nullable=False, index=True)
+    # Время точки — целые микросекунды UTC от эпохи: сравнения и min/max идут по integer,
+    # а не по ISO-строке. Исходное смещение (минуты) нужно только для вывода.
+    ts_us: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    tz_offset: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)
+    channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id"), nullable=False)
     value: Mapped[float] = mapped_column(Float, nullable=False)
-    unit: Mapped[str | None] = mapped_column(String(32), nullable=True)
-    quality: Mapped[str | None] = mapped_column(String(8), nullable=True, index=True)  # OK/WARN/BAD
-    tag: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    unit_id: Mapped[int | None] = mapped_column(ForeignKey("units.id"), nullable=True)
+    quality: Mapped[str | None] = mapped_column(QualityCode, nullable=True)  # OK/WARN/BAD
+    tag_id: Mapped[int | None] = mapped_column(ForeignKey("tags.id"), nullable=True)
 
     experiment: Mapped["Experiment"] = relationship(back_populates="data_points")
     import_run: Mapped["ImportRun"] = relationship(back_populates="data_points")
+
+
+class ChannelStats(Base):
+    """Статистика канала в эксперименте, обновляется вместе с записью точек.
+
+    Хранятся только аддитивные величины (count, sum) и экстремумы — их можно
+    досчитывать по каждой записанной пачке без чтения уже записанных точек.
+    """
+
+    __tablename__ = "channel_stats"
+
+    experiment_id: Mapped[int] = mapped_column(
+        ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True
+    )
+    channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id"), primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    min: Mapped[float] = mapped_column(Float, nullable=False)
+    max: Mapped[float] = mapped_column(Float, nullable=False)
+    sum: Mapped[float] = mapped_column(Float, nullable=False)
+    first_ts: Mapped[int] = mapped_column(BigInteger, nullable=False)  # ts_us
+    last_ts: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+class ChannelSketch(Base):
+    """Сводка распределения значений канала по одному импорту (app/services/sketches.py).
+
+    Строки разных импортов объединяются при запросе: stddev из моментов, квантили из t-digest.
+    """
+
+    __tablename__ = "channel_sketches"
+
+    experiment_id: Mapped[int] = mapped_column(
+        ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True
+    )
+    channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id"), primary_key=True)
+    import_run_id: Mapped[int] = mapped_column(ForeignKey("import_runs.id"), primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    mean: Mapped[float] = mapped_column(Float, nullable=False)
+    m2: Mapped[float] = mapped_column(Float, nullable=False)
+    digest: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+class ChannelRollup(Base):
+    """Агрегаты канала по интервалам времени (корзинам) нескольких разрешений.
+
+    Строятся при импорте (app/services/rollup_service.py); series читает их вместо точек,
+    когда корзин выбранного разрешения хватает на запрошенное число точек.
+    """
+
+    __tablename__ = "channel_rollups"
+
+    experiment_id: Mapped[int] = mapped_column(
+        ForeignKey("experiments.id", ondelete="CASCADE"), primary_key=True
+    )
+    channel_id: Mapped[int] = mapped_column(ForeignKey("channels.id"), primary_key=True)
+    resolution: Mapped[int] = mapped_column(Integer, primary_key=True)  # секунды
+    bucket_us: Mapped[int] = mapped_column(BigInteger, primary_key=True)  # начало корзины, ts_us
+    count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    min: Mapped[float] = mapped_column(Float, nullable=False)
+    max: Mapped[float] = mapped_column(Float, nullable=False)
+    sum: Mapped[float] = mapped_column(Float, nullable=False)
+    first_ts: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    first_value: Mapped[float] = mapped_column(Float, nullable=False)
+    first_offset: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0)  # tz_offset первой точки
+    last_ts: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    last_value: Mapped[float] = mapped_column(Float, nullable=False)
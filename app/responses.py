@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson есть в requirements.txt; без него — стандартный json
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """JSON в байтах: orjson, если он установлен, иначе json с теми же настройками, что у JSONResponse."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ для больших выборок из примитивных типов.
+
+    Возвращённый из обработчика объект Response FastAPI не прогоняет через
+    jsonable_encoder (обход каждого значения в Python). Сериализует orjson,
+    если он установлен, иначе стандартный json так же, как JSONResponse.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
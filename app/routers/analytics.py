@@ -1,35 +1,181 @@
 from __future__ import annotations
 
+from collections.abc import Callable, Iterator
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.dependencies import get_db
-from app.services import analytics_service, experiment_service
+from app.responses import FastJSONResponse, dumps
+from app.services import (
+    aggregate_service,
+    analytics_service,
+    downsampling,
+    experiment_service,
+    result_cache,
+    series_binary,
+)
 
 router = APIRouter(tags=["analytics"])
 
 
 @router.get("/experiments/{experiment_id}/channels")
-def get_channels(experiment_id: int, db: Session = Depends(get_db)):
-    experiment_service.get_experiment_or_404(db, experiment_id)
-    return analytics_service.get_channels(db, experiment_id)
+def get_channels(
+    experiment_id: int,
+    request: Request,
+    exact: bool = Query(default=False),
+    db: Session = Depends(get_db),
+):
+    return _conditional(
+        request,
+        db,
+        "channels",
+        experiment_id,
+        {"exact": exact},
+        lambda: FastJSONResponse(analytics_service.get_channels(db, experiment_id, exact=exact)),
+    )
 
 
 @router.get("/experiments/{experiment_id}/series")
 def get_series(
     experiment_id: int,
+    request: Request,
     channels: list[str] = Query(default=[]),
     start: datetime | None = Query(default=None),
     end: datetime | None = Query(default=None),
+    max_points: int | None = Query(default=None, ge=2),
+    downsample: str = Query(default=downsampling.METHOD_LTTB),
+    series_format: str = Query(default=analytics_service.SERIES_FORMAT_ROWS, alias="format"),
+    delta: bool = Query(default=False),
+    stream: bool = Query(default=False),
+    limit: int | None = Query(default=None, ge=1),
+    cursor: str | None = Query(default=None),
+    db: Session = Depends(get_db),
+):
+    if stream or limit is not None or cursor is not None:
+        analytics_service.check_series_paging(max_points, series_format)
+
+        def render_page() -> Response:
+            reader = analytics_service.SeriesReader(
+                db, experiment_id, channels, start, end, cursor=cursor, limit=limit
+            )
+            if stream:
+                return StreamingResponse(_stream_series(reader, paged=limit is not None), media_type="application/json")
+            return FastJSONResponse(reader.page())
+
+        params = {"channels": channels, "start": start, "end": end, "stream": stream, "limit": limit, "cursor": cursor}
+        # Поток не буферизуется ради кэша: для него только ETag и 304
+        return _conditional(request, db, "series", experiment_id, params, render_page, cacheable=not stream)
+    # Двоичный ответ — по format=binary или по Accept; JSON остаётся по умолчанию
+    if series_binary.accepts(request.headers.get("accept")):
+        series_format = analytics_service.SERIES_FORMAT_BINARY
+
+    def render() -> Response:
+        series = analytics_service.get_series(
+            db,
+            experiment_id,
+            channels,
+            start,
+            end,
+            max_points=max_points,
+            method=downsample,
+            series_format=series_format,
+            delta=delta,
+        )
+        if series_format == analytics_service.SERIES_FORMAT_BINARY:
+            return Response(content=series_binary.encode(series), media_type=series_binary.MEDIA_TYPE)
+        return FastJSONResponse(series)
+
+    params = {
+        "channels": channels,
+        "start": start,
+        "end": end,
+        "max_points": max_points,
+        "downsample": downsample,
+        "format": series_format,
+        "delta": delta,
+    }
+    response = _conditional(request, db, "series", experiment_id, params, render)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def _stream_series(reader: analytics_service.SeriesReader, *, paged: bool) -> Iterator[bytes]:
+    """JSON ответа series по кускам: тот же документ, что и без stream (с limit — страница)."""
+    yield b'{"series":{' if paged else b"{"
+    seen: set[str] = set()
+    current = None
+    for channel, points in reader:
+        if channel != current:
+            yield (b"]," if current is not None else b"") + dumps(channel) + b":["
+            current, first = channel, True
+            seen.add(channel)
+        yield (b"" if first else b",") + dumps(points)[1:-1]
+        first = False
+    if current is not None:
+        yield b"]"
+    # Каналы без точек — пустые списки, как в обычном ответе
+    for channel in reader.channels:
+        if channel not in seen:
+            yield (b"," if seen else b"") + dumps(channel) + b":[]"
+            seen.add(channel)
+    yield b"}"
+    if paged:
+        yield b',"next":' + dumps(reader.next_cursor) + b"}"
+
+
+@router.get("/experiments/{experiment_id}/aggregate")
+def get_aggregate(
+    experiment_id: int,
+    channels: list[str] = Query(default=[]),
+    bucket: str = Query(...),
+    fn: str = Query(default="avg"),
+    start: datetime | None = Query(default=None),
+    end: datetime | None = Query(default=None),
     db: Session = Depends(get_db),
 ):
     experiment_service.get_experiment_or_404(db, experiment_id)
-    return analytics_service.get_series(db, experiment_id, channels, start, end)
+    return aggregate_service.get_aggregate(db, experiment_id, channels, bucket, fn, start, end)
 
 
 @router.get("/experiments/{experiment_id}/summary")
-def get_summary(experiment_id: int, db: Session = Depends(get_db)):
-    experiment_service.get_experiment_or_404(db, experiment_id)
-    return analytics_service.get_summary(db, experiment_id)
+def get_summary(experiment_id: int, request: Request, db: Session = Depends(get_db)):
+    return _conditional(
+        request,
+        db,
+        "summary",
+        experiment_id,
+        {},
+        lambda: FastJSONResponse(analytics_service.get_summary(db, experiment_id)),
+    )
+
+
+def _conditional(
+    request: Request,
+    db: Session,
+    endpoint: str,
+    experiment_id: int,
+    params: dict[str, object],
+    render: Callable[[], Response],
+    *,
+    cacheable: bool = True,
+) -> Response:
+    """Ответ с ETag по версии данных эксперимента: 304 при совпадении If-None-Match,
+    иначе тело из result_cache или от render() (с сохранением в кэш)."""
+    data_version = experiment_service.get_data_version_or_404(db, experiment_id)
+    key = result_cache.cache_key(endpoint, experiment_id, data_version, params)
+    # no-cache: клиент и прокси хранят ответ, но перед использованием сверяют ETag
+    headers = {"ETag": result_cache.etag(key), "Cache-Control": "no-cache"}
+    if result_cache.not_modified(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    cached = result_cache.cache.get(key) if cacheable else None
+    if cached is not None:
+        return Response(content=cached.body, media_type=cached.media_type, headers=headers)
+    response = render()
+    response.headers.update(headers)
+    if cacheable:
+        result_cache.cache.put(key, result_cache.CachedResponse(bytes(response.body), response.media_type))
+    return response
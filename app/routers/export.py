@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import json
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.dependencies import get_db
-from app.services import experiment_service, export_service
+from app.services import (
+    experiment_service,
+    export_job_service,
+    export_service,
+    export_wide,
+)
 
 router = APIRouter(tags=["export"])
 
@@ -19,19 +25,98 @@ def export_csv(
     start: datetime | None = Query(default=None),
     end: datetime | None = Query(default=None),
     quality: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1),
     db: Session = Depends(get_db),
 ):
     experiment_service.get_experiment_or_404(db, experiment_id)
-    csv_content = export_service.export_csv(
+    # Файл пишется по мере чтения точек: память не зависит от размера выгрузки
+    csv_chunks = export_service.iter_export_csv(
         db,
         experiment_id=experiment_id,
         channels=channels or None,
         start=start,
         end=end,
         quality=quality,
+        limit=limit,
     )
-    return Response(
-        content=csv_content,
+    return StreamingResponse(
+        csv_chunks,
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename=experiment_{experiment_id}.csv"},
     )
+
+
+def export_options(
+    export_format: str = Query(default=export_service.EXPORT_FORMAT_CSV, alias="format"),
+    layout: str = Query(default=export_service.EXPORT_LAYOUT_LONG),
+    tolerance: str | None = Query(default=None),
+    interval: str | None = Query(default=None),
+    fill: str = Query(default=export_wide.WIDE_FILL_EMPTY),
+    channels: list[str] = Query(default=[]),
+    start: datetime | None = Query(default=None),
+    end: datetime | None = Query(default=None),
+    quality: str | None = Query(default=None),
+    limit: int | None = Query(default=None, ge=1),
+) -> dict[str, object]:
+    """Параметры выгрузки (GET export и фоновые выгрузки) — аргументы export_service.iter_export."""
+    return {
+        "channels": channels or None,
+        "start": start,
+        "end": end,
+        "quality": quality,
+        "export_format": export_format,
+        "layout": layout,
+        "tolerance": tolerance,
+        "interval": interval,
+        "fill": fill,
+        "limit": limit,
+    }
+
+
+@router.get("/experiments/{experiment_id}/export")
+def export_data(
+    experiment_id: int,
+    options: dict = Depends(export_options),
+    db: Session = Depends(get_db),
+):
+    experiment_service.get_experiment_or_404(db, experiment_id)
+    # Параметры проверяются здесь: после начала потока ошибку уже не вернуть статусом
+    chunks = export_service.iter_export(db, experiment_id, **options)
+    media_type, suffix = export_service.EXPORT_FORMATS[options["export_format"]]
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=experiment_{experiment_id}{suffix}"},
+    )
+
+
+@router.post("/experiments/{experiment_id}/export-jobs")
+def submit_export_job(
+    experiment_id: int,
+    response: Response,
+    options: dict = Depends(export_options),
+    db: Session = Depends(get_db),
+):
+    experiment_service.get_experiment_or_404(db, experiment_id)
+    job, created = export_job_service.submit_export(db, experiment_id, options)
+    # Новая задача — 202; та же выгрузка, уже готовая или выполняемая, — 200
+    response.status_code = 202 if created else 200
+    return job
+
+
+@router.get("/export-jobs/{job_id}")
+def get_export_job(job_id: int, db: Session = Depends(get_db)):
+    return export_job_service.job_to_dict(export_job_service.get_export_job(db, job_id))
+
+
+@router.post("/export-jobs/{job_id}/cancel", status_code=202)
+def cancel_export_job(job_id: int, db: Session = Depends(get_db)):
+    return export_job_service.cancel_export(db, job_id)
+
+
+@router.get("/export-jobs/{job_id}/download")
+def download_export_job(job_id: int, db: Session = Depends(get_db)):
+    path, job = export_job_service.open_artifact(db, job_id)
+    media_type = export_service.EXPORT_FORMATS[json.loads(job.params)["export_format"]][0]
+    # FileResponse (Starlette >= 0.40) отвечает на Range (206) и If-Range: прерванную загрузку можно продолжить
+    return FileResponse(path, media_type=media_type, filename=job.filename)
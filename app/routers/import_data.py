@@ -1,10 +1,24 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, UploadFile
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    UploadFile,
+    WebSocket,
+)
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.dependencies import get_db
-from app.services import experiment_service, import_service
+from app.services import (
+    experiment_service,
+    import_job_service,
+    import_service,
+    live_ingest_service,
+)
 
 router = APIRouter(tags=["import"])
 
@@ -13,10 +27,39 @@ router = APIRouter(tags=["import"])
 async def import_data(
     experiment_id: int,
     file: UploadFile,
+    response: Response,
+    background: bool = False,
+    engine: str = import_service.ENGINE_ROWS,
     db: Session = Depends(get_db),
 ):
-    experiment_service.get_experiment_or_404(db, experiment_id)
-    return await import_service.import_file(file, experiment_id, db)
+    # Обработчик асинхронный (UploadFile), поэтому синхронные запросы к БД — в пул потоков
+    await run_in_threadpool(experiment_service.get_experiment_or_404, db, experiment_id)
+    if background:
+        response.status_code = 202
+        return await import_job_service.submit_import(file, experiment_id, db, engine=engine)
+    return await import_service.import_file(file, experiment_id, db, engine=engine)
+
+
+@router.post("/experiments/{experiment_id}/ingest")
+async def ingest_stream(
+    experiment_id: int,
+    request: Request,
+    name: str | None = None,
+    db: Session = Depends(get_db),
+):
+    # Тело запроса — поток NDJSON (chunked); читается по мере поступления
+    await run_in_threadpool(experiment_service.get_experiment_or_404, db, experiment_id)
+    return await live_ingest_service.ingest_http(request.stream(), experiment_id, db, name=name)
+
+
+@router.websocket("/experiments/{experiment_id}/ingest/ws")
+async def ingest_websocket(
+    websocket: WebSocket,
+    experiment_id: int,
+    name: str | None = None,
+    db: Session = Depends(get_db),
+):
+    await live_ingest_service.ingest_websocket(websocket, experiment_id, db, name=name)
 
 
 @router.get("/experiments/{experiment_id}/imports")
@@ -27,3 +70,16 @@ def get_import_history(
 ):
     experiment_service.get_experiment_or_404(db, experiment_id)
     return import_service.list_import_runs_for_experiment(db, experiment_id, limit=limit)
+
+
+@router.get("/imports/{run_id}")
+def get_import_run(run_id: int, db: Session = Depends(get_db)):
+    run = import_service.get_import_run(db, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Import run {run_id} not found")
+    return run
+
+
+@router.post("/imports/{run_id}/cancel", status_code=202)
+def cancel_import_run(run_id: int, db: Session = Depends(get_db)):
+    return import_job_service.cancel_import(db, run_id)
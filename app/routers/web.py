@@ -4,10 +4,17 @@ from fastapi import APIRouter, Depends, Form, HTTPException, Request, UploadFile
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.dependencies import get_db
-from app.services import analytics_service, experiment_service, import_service
+from app.services import (
+    analytics_service,
+    experiment_service,
+    import_job_service,
+    import_service,
+)
 from app.services.experiment_service import create_experiment
+from app.services.import_service import RUN_ACTIVE_STATUSES, RUN_CANCELLED, RUN_FAILED
 
 templates = Jinja2Templates(directory="app/templates")
 
@@ -18,6 +25,7 @@ router = APIRouter(prefix="/ui", tags=["ui"])
 def experiments_list(request: Request, db: Session = Depends(get_db)):
     experiments = experiment_service.list_experiments(db)
     return templates.TemplateResponse(
+        request,
         "experiments.html",
         {"request": request, "experiments": experiments},
     )
@@ -43,6 +51,7 @@ def create_experiment_htmx(
         notes=notes or None,
     )
     return templates.TemplateResponse(
+        request,
         "partials/experiment_row.html",
         {"request": request, "experiment": experiment},
     )
@@ -59,7 +68,7 @@ def experiment_detail(request: Request, experiment_id: int, db: Session = Depend
     experiment = experiment_service.get_experiment(db, experiment_id)
     if experiment is None:
         return templates.TemplateResponse(
-            "404.html", {"request": request}, status_code=404
+            request, "404.html", {"request": request}, status_code=404
         )
 
     channels = analytics_service.get_channels(db, experiment_id)
@@ -67,6 +76,7 @@ def experiment_detail(request: Request, experiment_id: int, db: Session = Depend
     import_history = import_service.list_import_runs_for_experiment(db, experiment_id)
 
     return templates.TemplateResponse(
+        request,
         "experiment.html",
         {
             "request": request,
@@ -78,38 +88,84 @@ def experiment_detail(request: Request, experiment_id: int, db: Session = Depend
     )
 
 
+def _import_response(
+    request: Request,
+    db: Session,
+    experiment_id: int,
+    result: dict | None,
+    error: str | None,
+) -> HTMLResponse:
+    channels = analytics_service.get_channels(db, experiment_id)
+    summary = analytics_service.get_summary(db, experiment_id)
+    import_history = import_service.list_import_runs_for_experiment(db, experiment_id)
+
+    return templates.TemplateResponse(
+        request,
+        "partials/import_response.html",
+        {
+            "request": request,
+            "result": result,
+            "error": error,
+            "channels": channels,
+            "summary": summary,
+            "import_history": import_history,
+        },
+    )
+
+
 @router.post("/experiments/{experiment_id}/import", response_class=HTMLResponse)
 async def import_data_htmx(
     request: Request,
     experiment_id: int,
     file: UploadFile,
+    background: bool = Form(default=False),
     db: Session = Depends(get_db),
 ):
-    experiment = experiment_service.get_experiment(db, experiment_id)
+    experiment = await run_in_threadpool(experiment_service.get_experiment, db, experiment_id)
     if experiment is None:
         return HTMLResponse('<div class="alert alert-danger">Эксперимент не найден</div>')
 
     result = None
     error = None
     try:
+        if background:
+            run = await import_job_service.submit_import(file, experiment_id, db)
+            return templates.TemplateResponse(
+                request, "partials/import_progress.html", {"request": request, "run": run}
+            )
         result = await import_service.import_file(file, experiment_id, db)
     except HTTPException as exc:
         error = exc.detail
 
-    channels = analytics_service.get_channels(db, experiment_id)
-    summary = analytics_service.get_summary(db, experiment_id)
-    import_history = import_service.list_import_runs_for_experiment(db, experiment_id)
+    return await run_in_threadpool(_import_response, request, db, experiment_id, result, error)
+
+
+@router.get("/imports/{run_id}/progress", response_class=HTMLResponse)
+def import_progress_htmx(request: Request, run_id: int, db: Session = Depends(get_db)):
+    run = import_service.get_import_run(db, run_id)
+    if run is None:
+        return HTMLResponse('<div class="alert alert-danger">Импорт не найден</div>')
+    if run["status"] in RUN_ACTIVE_STATUSES:
+        return templates.TemplateResponse(
+            request, "partials/import_progress.html", {"request": request, "run": run}
+        )
+
+    error = None
+    if run["status"] == RUN_CANCELLED:
+        error = "Импорт отменён"
+    elif run["status"] == RUN_FAILED:
+        error = run["error_message"] or "Импорт завершился с ошибкой"
+    return _import_response(request, db, run["experiment_id"], run, error)
+
 
+@router.post("/imports/{run_id}/cancel", response_class=HTMLResponse)
+def cancel_import_htmx(request: Request, run_id: int, db: Session = Depends(get_db)):
+    try:
+        run = import_job_service.cancel_import(db, run_id)
+    except HTTPException:
+        return import_progress_htmx(request, run_id, db)
     return templates.TemplateResponse(
-        "partials/import_response.html",
-        {
-            "request": request,
-            "result": result,
-            "error": error,
-            "channels": channels,
-            "summary": summary,
-            "import_history": import_history,
-        },
+        request, "partials/import_progress.html", {"request": request, "run": run}
     )
 
 
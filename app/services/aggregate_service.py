@@ -0,0 +1,134 @@
+"""Агрегация каналов по интервалам времени (GET /experiments/{id}/aggregate).
+
+Группировка выполняется в БД: по корзинам пирамиды channel_rollups, если длина
+интервала кратна одному из её разрешений, границы диапазона на него выровнены
+и оно построено для данных каналов, иначе — по точкам data_points. Интервалы отсчитываются от эпохи (UTC).
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import ColumnElement, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Channel, ChannelRollup, DataPoint
+from app.services import rollup_service
+from app.services.timestamps import to_epoch_us
+
+AGGREGATE_FUNCTIONS = ("avg", "min", "max", "count", "sum")
+
+_BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_BUCKET_RE = re.compile(r"(\d+)([smhd])")
+
+
+def parse_bucket(bucket: str) -> int:
+    """'5m' -> 300: длина интервала в секундах (s, m, h, d)."""
+    match = _BUCKET_RE.fullmatch(bucket.strip())
+    if match is None or int(match[1]) == 0:
+        raise HTTPException(status_code=400, detail="bucket must be a positive number with unit: s, m, h, d")
+    return int(match[1]) * _BUCKET_UNITS[match[2]]
+
+
+def parse_functions(fn: str) -> list[str]:
+    functions = list(dict.fromkeys(name.strip() for name in fn.split(",") if name.strip()))
+    if not functions or not set(functions) <= set(AGGREGATE_FUNCTIONS):
+        raise HTTPException(status_code=400, detail="fn must be one of: " + ", ".join(AGGREGATE_FUNCTIONS))
+    return functions
+
+
+def _bucket_start(ts: ColumnElement[int], bucket_us: int) -> ColumnElement[int]:
+    # Остаток % в SQLite и PostgreSQL берёт знак делимого: для времени до 1970 года
+    # он приводится к неотрицательному, чтобы интервал начинался не позже точки
+    return ts - (ts % bucket_us + bucket_us) % bucket_us
+
+
+def _source_resolution(bucket: int, start_us: int | None, end_us: int | None) -> int | None:
+    """Самое грубое разрешение пирамиды, корзины которого складываются в интервалы без остатка."""
+    for resolution in sorted(rollup_service.ROLLUP_RESOLUTIONS, reverse=True):
+        resolution_us = resolution * 1_000_000
+        if bucket % resolution == 0 and all(
+            bound is None or bound % resolution_us == 0 for bound in (start_us, end_us)
+        ):
+            return resolution
+    return None
+
+
+def _expressions(table: type[ChannelRollup | DataPoint]) -> tuple[ColumnElement[int], dict[str, ColumnElement]]:
+    """Колонка времени и выражения функций для группировки по корзинам пирамиды или по точкам."""
+    if table is ChannelRollup:
+        count, total = func.sum(ChannelRollup.count), func.sum(ChannelRollup.sum)
+        return ChannelRollup.bucket_us, {
+            "avg": total / count,
+            "min": func.min(ChannelRollup.min),
+            "max": func.max(ChannelRollup.max),
+            "count": count,
+            "sum": total,
+        }
+    return DataPoint.ts_us, {
+        "avg": func.avg(DataPoint.value),
+        "min": func.min(DataPoint.value),
+        "max": func.max(DataPoint.value),
+        "count": func.count(),
+        "sum": func.sum(DataPoint.value),
+    }
+
+
+def get_aggregate(
+    db: Session,
+    experiment_id: int,
+    channels: list[str],
+    bucket: str,
+    fn: str,
+    start: datetime | None,
+    end: datetime | None,
+) -> dict:
+    """Агрегаты каналов по интервалам bucket в диапазоне [start, end).
+
+    Ответ колоночный: по каналу — массив начал интервалов "t" (мс от эпохи, UTC)
+    и по массиву на каждую функцию из fn; пустые интервалы не возвращаются.
+    """
+    bucket_seconds = parse_bucket(bucket)
+    functions = parse_functions(fn)
+    start_us = to_epoch_us(start) if start else None
+    end_us = to_epoch_us(end) if end else None
+    resolution = _source_resolution(bucket_seconds, start_us, end_us)
+
+    result = {
+        "bucket": bucket_seconds,
+        "resolution": resolution,
+        "channels": {ch: {"t": [], **{name: [] for name in functions}} for ch in channels},
+    }
+    if not channels:
+        return result
+    names = dict(db.execute(select(Channel.id, Channel.name).where(Channel.name.in_(channels))).all())
+    if not names:
+        return result
+    if resolution is not None and not rollup_service.is_built(db, experiment_id, names, resolution):
+        result["resolution"] = resolution = None
+
+    bucket_us = bucket_seconds * 1_000_000
+    table = DataPoint if resolution is None else ChannelRollup
+    ts, expressions = _expressions(table)
+    t = _bucket_start(ts, bucket_us).label("t")
+    stmt = (
+        select(table.channel_id, t, *(expressions[name].label(name) for name in functions))
+        .where(table.experiment_id == experiment_id, table.channel_id.in_(names))
+        .group_by(table.channel_id, t)
+        .order_by(table.channel_id, t)
+    )
+    if resolution is not None:
+        stmt = stmt.where(ChannelRollup.resolution == resolution)
+    if start_us is not None:
+        stmt = stmt.where(ts >= start_us)
+    if end_us is not None:
+        stmt = stmt.where(ts < end_us)
+
+    for channel_id, t_us, *values in db.execute(stmt):
+        columns = result["channels"][names[channel_id]]
+        columns["t"].append(t_us // 1000)
+        for name, value in zip(functions, values):
+            columns[name].append(value)
+    return result
@@ -1,88 +1,376 @@
 from __future__ import annotations
 
+import os
+from collections.abc import Iterator
 from datetime import datetime
 
-from sqlalchemy import func, select
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import Select, func, select, tuple_
 from sqlalchemy.orm import Session
 
-from app.models import DataPoint
+from app.models import Channel, ChannelStats, DataPoint
+from app.services import channel_stats_service, downsampling, rollup_service
+from app.services.timestamps import format_epoch_us, to_epoch_us
 
 
-def get_channels(db: Session, experiment_id: int) -> list[dict]:
-    """Возвращает список каналов с базовой статистикой по эксперименту."""
+def _format_us(epoch_us: int | None) -> str | None:
+    # Агрегаты по нескольким точкам отдаются в UTC: исходные смещения могут различаться
+    return format_epoch_us(epoch_us) if epoch_us is not None else None
+
+
+def get_channels(db: Session, experiment_id: int, *, exact: bool = False) -> list[dict]:
+    """Возвращает список каналов со статистикой по эксперименту.
+
+    count/min/max/avg читаются из channel_stats (обновляется при импорте), а не считаются
+    по точкам — время ответа зависит от числа каналов, а не точек. stddev и квантили
+    объединяются из сводок импортов (приближённо) или, при exact=True, считаются по точкам.
+    """
     stmt = (
         select(
-            DataPoint.channel,
-            func.count().label("count"),
-            func.min(DataPoint.value).label("min"),
-            func.max(DataPoint.value).label("max"),
-            func.avg(DataPoint.value).label("avg"),
-            func.min(DataPoint.timestamp).label("first_ts"),
-            func.max(DataPoint.timestamp).label("last_ts"),
+            ChannelStats.channel_id,
+            Channel.name.label("channel"),
+            ChannelStats.count,
+            ChannelStats.min,
+            ChannelStats.max,
+            ChannelStats.sum,
+            ChannelStats.first_ts,
+            ChannelStats.last_ts,
         )
-        .where(DataPoint.experiment_id == experiment_id)
-        .group_by(DataPoint.channel)
-        .order_by(DataPoint.channel)
+        .join(Channel, Channel.id == ChannelStats.channel_id)
+        .where(ChannelStats.experiment_id == experiment_id)
+        .order_by(Channel.name)
     )
     rows = db.execute(stmt).all()
 
+    if exact:
+        distributions = channel_stats_service.get_exact_distributions(
+            db, experiment_id, [row.channel_id for row in rows]
+        )
+    else:
+        distributions = channel_stats_service.get_distributions(db, experiment_id)
+    empty = dict.fromkeys(["stddev", *channel_stats_service.QUANTILES])
+
     return [
         {
             "channel": row.channel,
             "count": row.count,
             "min": row.min,
             "max": row.max,
-            "avg": round(row.avg, 6) if row.avg is not None else None,
-            "first_ts": row.first_ts.isoformat() if row.first_ts else None,
-            "last_ts": row.last_ts.isoformat() if row.last_ts else None,
+            "avg": round(row.sum / row.count, 6),
+            **distributions.get(row.channel_id, empty),
+            "first_ts": _format_us(row.first_ts),
+            "last_ts": _format_us(row.last_ts),
         }
         for row in rows
     ]
 
 
+# Сколько точек series читается из курсора за раз при потоковой и постраничной выдаче
+SERIES_STREAM_CHUNK = int(os.getenv("SERIES_STREAM_CHUNK", "10000"))
+
+SERIES_FORMAT_ROWS = "rows"
+SERIES_FORMAT_COLUMNAR = "columnar"
+SERIES_FORMAT_BINARY = "binary"
+SERIES_FORMATS = (SERIES_FORMAT_ROWS, SERIES_FORMAT_COLUMNAR, SERIES_FORMAT_BINARY)
+
+
 def get_series(
     db: Session,
     experiment_id: int,
     channels: list[str],
     start: datetime | None,
     end: datetime | None,
-) -> dict[str, list[dict]]:
-    """Возвращает временные ряды по выбранным каналам для построения графиков."""
+    *,
+    max_points: int | None = None,
+    method: str = downsampling.METHOD_LTTB,
+    series_format: str = SERIES_FORMAT_ROWS,
+    delta: bool = False,
+) -> dict[str, list[dict]] | dict[str, dict]:
+    """Возвращает временные ряды по выбранным каналам для построения графиков.
+
+    С max_points каждый канал прореживается до max_points точек (LTTB или min/max
+    по корзинам), и ответ по каналу — {"total": исходное число точек, "points": [...],
+    "resolution": ...}. Если на диапазон хватает корзин пирамиды агрегатов, ряд строится
+    по самому грубому такому разрешению (resolution — его длина в секундах), когда оно
+    построено для данных каналов, иначе по точкам (resolution = None).
+
+    В формате columnar вместо списка точек канал — {"t": [мс от эпохи], "v": [...]}
+    (с max_points — плюс total и resolution); delta=True передаёт в "t" первое время
+    и дальше разности соседних. В формате binary "t" и "v" — массивы numpy (мкс UTC
+    и значения) для series_binary.encode; delta не применяется.
+    """
+    if method not in downsampling.METHODS:
+        raise HTTPException(
+            status_code=400,
+            detail="downsample must be one of: " + ", ".join(downsampling.METHODS),
+        )
+    if series_format not in SERIES_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail="format must be one of: " + ", ".join(SERIES_FORMATS),
+        )
     if not channels:
         return {}
 
+    # Имена -> ключи отдельным запросом: тогда точки читаются из ix_dp_experiment_channel_ts
+    # сразу в порядке (канал, время), без сортировки и без обращения к таблице
+    names = dict(db.execute(select(Channel.id, Channel.name).where(Channel.name.in_(channels))).all())
+
+    start_us = to_epoch_us(start) if start else None
+    end_us = to_epoch_us(end) if end else None
+    if max_points is not None and names:
+        span_us, points = _series_extent(db, experiment_id, names, start_us, end_us)
+        resolution = rollup_service.pick_resolution(span_us, max_points, points)
+        if resolution is not None and rollup_service.is_built(db, experiment_id, names, resolution):
+            buckets = rollup_service.get_buckets(db, experiment_id, names, resolution, start_us, end_us)
+            return _rollup_series(buckets, channels, names, resolution, max_points, method, series_format, delta)
+
     stmt = (
-        select(DataPoint.channel, DataPoint.timestamp, DataPoint.value)
+        select(DataPoint.channel_id, DataPoint.ts_us, DataPoint.tz_offset, DataPoint.value)
         .where(DataPoint.experiment_id == experiment_id)
-        .where(DataPoint.channel.in_(channels))
-        .order_by(DataPoint.channel, DataPoint.timestamp)
+        .where(DataPoint.channel_id.in_(names))
+        .order_by(DataPoint.channel_id, DataPoint.ts_us)
     )
-    if start:
-        stmt = stmt.where(DataPoint.timestamp >= start)
-    if end:
-        stmt = stmt.where(DataPoint.timestamp <= end)
+    if start_us is not None:
+        stmt = stmt.where(DataPoint.ts_us >= start_us)
+    if end_us is not None:
+        stmt = stmt.where(DataPoint.ts_us <= end_us)
 
-    rows = db.execute(stmt).all()
+    if max_points is not None or series_format != SERIES_FORMAT_ROWS:
+        return _column_series(db, stmt, channels, names, max_points, method, series_format, delta)
 
     result: dict[str, list[dict]] = {ch: [] for ch in channels}
-    for row in rows:
-        result[row.channel].append({"timestamp": row.timestamp.isoformat(), "value": row.value})
+    if not names:
+        return result
+    for row in db.execute(stmt):
+        result[names[row.channel_id]].append(
+            {"timestamp": format_epoch_us(row.ts_us, row.tz_offset), "value": row.value}
+        )
+    return result
+
+
+def _channel_output(
+    ts_us: np.ndarray, offsets: np.ndarray | None, values: np.ndarray, series_format: str, delta: bool
+) -> dict:
+    """Точки канала в формате ответа; offsets=None — время в UTC."""
+    if series_format == SERIES_FORMAT_BINARY:
+        return {"t": ts_us.astype(np.int64, copy=False), "v": values.astype(np.float64, copy=False)}
+    if series_format == SERIES_FORMAT_COLUMNAR:
+        t = ts_us // 1000
+        if delta:
+            t = np.diff(t, prepend=0)
+        return {"t": t.tolist(), "v": values.tolist()}
+    offsets = offsets.tolist() if offsets is not None else [0] * len(ts_us)
+    return {
+        "points": [
+            {"timestamp": format_epoch_us(ts, offset), "value": value}
+            for ts, offset, value in zip(ts_us.tolist(), offsets, values.tolist())
+        ]
+    }
+
+
+def _column_series(
+    db: Session,
+    stmt: Select,
+    channels: list[str],
+    names: dict[int, str],
+    max_points: int | None,
+    method: str,
+    series_format: str,
+    delta: bool,
+) -> dict[str, dict]:
+    # Сначала колонки канала целиком, ISO-строки или списки — только для оставленных точек
+    empty = _channel_output(np.empty(0, np.int64), None, np.empty(0), series_format, delta)
+    if max_points is not None:
+        empty.update(total=0, resolution=None)
+    result: dict[str, dict] = {ch: dict(empty) for ch in channels}
+    # Core-соединение: строки без слоя загрузки ORM (он дороже самой выборки)
+    rows = db.connection().execute(stmt).all() if names else []
+    if not rows:
+        return result
+
+    channel, ts_us, offsets, values = (np.array(column) for column in zip(*rows))
+    values = values.astype(np.float64)
+    starts = np.flatnonzero(np.r_[True, channel[1:] != channel[:-1]])
+    for lo, hi in zip(starts.tolist(), np.r_[starts[1:], len(channel)].tolist()):
+        t, v, offset = ts_us[lo:hi], values[lo:hi], offsets[lo:hi]
+        output = {}
+        if max_points is not None:
+            keep = downsampling.downsample(t, v, max_points, method)
+            t, v, offset = t[keep], v[keep], offset[keep]
+            output = {"total": hi - lo, "resolution": None}
+        result[names[int(channel[lo])]] = {**_channel_output(t, offset, v, series_format, delta), **output}
     return result
 
 
+def _series_extent(
+    db: Session, experiment_id: int, names: dict[int, str], start_us: int | None, end_us: int | None
+) -> tuple[int, int]:
+    """Длина запрошенного диапазона в мкс и оценка числа точек канала в нём.
+
+    Оценка — среднее число точек канала по channel_stats, пропорционально доле диапазона.
+    """
+    channels, count, first_ts, last_ts = db.execute(
+        select(
+            func.count(),
+            func.sum(ChannelStats.count),
+            func.min(ChannelStats.first_ts),
+            func.max(ChannelStats.last_ts),
+        )
+        .where(ChannelStats.experiment_id == experiment_id)
+        .where(ChannelStats.channel_id.in_(names))
+    ).one()
+    if not channels:
+        return 0, 0
+    lo = first_ts if start_us is None else max(start_us, first_ts)
+    hi = last_ts if end_us is None else min(end_us, last_ts)
+    span = max(hi - lo, 0)
+    full = max(last_ts - first_ts, 1)
+    return span, count * min(span, full) // full // channels
+
+
+def _rollup_series(
+    buckets: dict[int, dict[str, np.ndarray]],
+    channels: list[str],
+    names: dict[int, str],
+    resolution: int,
+    max_points: int,
+    method: str,
+    series_format: str,
+    delta: bool,
+) -> dict[str, dict]:
+    # Точка корзины — её начало в поясе её первой точки и среднее; для min/max корзина
+    # даёт обе точки, и прореживание выбирает огибающую уже среди них
+    empty = _channel_output(np.empty(0, np.int64), None, np.empty(0), series_format, delta)
+    result: dict[str, dict] = {ch: {**empty, "total": 0, "resolution": resolution} for ch in channels}
+    for channel_id, columns in buckets.items():
+        if method == downsampling.METHOD_MINMAX:
+            t = np.repeat(columns["bucket_us"], 2)
+            offsets = np.repeat(columns["first_offset"], 2)
+            v = np.column_stack([columns["min"], columns["max"]]).ravel()
+        else:
+            t, offsets = columns["bucket_us"], columns["first_offset"]
+            v = columns["sum"] / columns["count"]
+        keep = downsampling.downsample(t, v, max_points, method)
+        result[names[channel_id]] = {
+            **_channel_output(t[keep], offsets[keep], v[keep], series_format, delta),
+            "total": int(columns["count"].sum()),
+            "resolution": resolution,
+        }
+    return result
+
+
+def check_series_paging(max_points: int | None, series_format: str) -> None:
+    """Потоковая и постраничная выдача — только точки целиком в формате rows."""
+    if max_points is not None or series_format != SERIES_FORMAT_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail="stream, limit and cursor require format=rows without max_points",
+        )
+
+
+def _encode_cursor(channel_id: int, ts_us: int, point_id: int) -> str:
+    return f"{channel_id}.{ts_us}.{point_id}"
+
+
+def _decode_cursor(cursor: str) -> tuple[int, int, int]:
+    try:
+        channel_id, ts_us, point_id = (int(part) for part in cursor.split("."))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor is invalid")
+    return channel_id, ts_us, point_id
+
+
+class SeriesReader:
+    """Точки series в порядке (канал, время, id), читаемые с курсора кусками.
+
+    Итерация отдаёт пары (канал, точки куска): точки канала идут подряд, возможно
+    несколькими кусками, и в памяти одновременно не больше SERIES_STREAM_CHUNK точек.
+    С limit читается не больше limit точек; после итерации next_cursor — курсор
+    (канал, время, id) последней точки для следующей страницы или None, если точки
+    кончились. Курсор проверяется сразу, до начала чтения.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        experiment_id: int,
+        channels: list[str],
+        start: datetime | None,
+        end: datetime | None,
+        *,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> None:
+        self.channels = list(dict.fromkeys(channels))
+        self.next_cursor: str | None = None
+        self._db = db
+        self._limit = limit
+        self._names: dict[int, str] = {}
+        if self.channels:
+            names = select(Channel.id, Channel.name).where(Channel.name.in_(self.channels))
+            self._names = dict(db.execute(names).all())
+
+        # Порядок (канал, время, id) совпадает с ix_dp_experiment_channel_ts (id — rowid в записи индекса):
+        # и страница с курсора, и поток читаются по индексу без сортировки
+        stmt = (
+            select(DataPoint.channel_id, DataPoint.ts_us, DataPoint.tz_offset, DataPoint.value, DataPoint.id)
+            .where(DataPoint.experiment_id == experiment_id)
+            .where(DataPoint.channel_id.in_(self._names))
+            .order_by(DataPoint.channel_id, DataPoint.ts_us, DataPoint.id)
+        )
+        if start:
+            stmt = stmt.where(DataPoint.ts_us >= to_epoch_us(start))
+        if end:
+            stmt = stmt.where(DataPoint.ts_us <= to_epoch_us(end))
+        if cursor:
+            stmt = stmt.where(tuple_(DataPoint.channel_id, DataPoint.ts_us, DataPoint.id) > _decode_cursor(cursor))
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        self._stmt = stmt
+
+    def __iter__(self) -> Iterator[tuple[str, list[dict]]]:
+        if not self._names:
+            return
+        result = self._db.connection().execution_options(yield_per=SERIES_STREAM_CHUNK).execute(self._stmt)
+        read = 0
+        last = None
+        for rows in result.partitions():
+            read += len(rows)
+            last = rows[-1]
+            channel_id, points = None, []
+            for row_channel, ts_us, tz_offset, value, _ in rows:
+                if row_channel != channel_id:
+                    if points:
+                        yield self._names[channel_id], points
+                    channel_id, points = row_channel, []
+                points.append({"timestamp": format_epoch_us(ts_us, tz_offset), "value": value})
+            yield self._names[channel_id], points
+        if last is not None and read == self._limit:
+            self.next_cursor = _encode_cursor(last.channel_id, last.ts_us, last.id)
+
+    def page(self) -> dict:
+        """Всё прочитанное целиком: {"series": {channel: [...]}, "next": курсор}."""
+        series: dict[str, list[dict]] = {ch: [] for ch in self.channels}
+        for channel, points in self:
+            series[channel].extend(points)
+        return {"series": series, "next": self.next_cursor}
+
+
 def get_summary(db: Session, experiment_id: int) -> dict:
     """Сводка по эксперименту: длительность, количество точек, каналы, качество."""
     stmt = select(
         func.count().label("total_points"),
-        func.count(DataPoint.channel.distinct()).label("channels_count"),
-        func.min(DataPoint.timestamp).label("first_ts"),
-        func.max(DataPoint.timestamp).label("last_ts"),
+        func.count(DataPoint.channel_id.distinct()).label("channels_count"),
+        func.min(DataPoint.ts_us).label("first_ts"),
+        func.max(DataPoint.ts_us).label("last_ts"),
     ).where(DataPoint.experiment_id == experiment_id)
     row = db.execute(stmt).one()
 
     duration_seconds = None
-    if row.first_ts and row.last_ts:
-        duration_seconds = (row.last_ts - row.first_ts).total_seconds()
+    if row.first_ts is not None and row.last_ts is not None:
+        duration_seconds = (row.last_ts - row.first_ts) / 1_000_000
 
     q_stmt = (
         select(DataPoint.quality, func.count().label("count"))
@@ -98,7 +386,7 @@ def get_summary(db: Session, experiment_id: int) -> dict:
         "total_points": row.total_points,
         "channels_count": row.channels_count,
         "duration_seconds": duration_seconds,
-        "first_ts": row.first_ts.isoformat() if row.first_ts else None,
-        "last_ts": row.last_ts.isoformat() if row.last_ts else None,
+        "first_ts": _format_us(row.first_ts),
+        "last_ts": _format_us(row.last_ts),
         "points_by_quality": points_by_quality,
     }
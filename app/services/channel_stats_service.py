@@ -0,0 +1,249 @@
+"""Материализованная статистика каналов (таблицы channel_stats и channel_sketches).
+
+Импорт добавляет статистику каждой записанной пачки в той же транзакции, что и
+сами точки (``add_points``, ``RunSketches``), поэтому зафиксированные точки и
+статистика всегда согласованы. После удаления точек импорта статистика
+пересчитывается по data_points (``forget_run``).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+from sqlalchemy import Insert, delete, func, insert, select
+from sqlalchemy.engine import Connection, Dialect
+from sqlalchemy.orm import Session
+
+from app.models import ChannelSketch, ChannelStats, DataPoint
+from app.services import rollup_service
+from app.services.sketches import Moments, TDigest
+
+_STATS = ChannelStats.__table__
+_SKETCHES = ChannelSketch.__table__
+
+# Квантили, которые отдаёт GET /experiments/{id}/channels
+QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+def _aggregate(
+    channel_ids: Iterable[int],
+    timestamps: Iterable[int],
+    values: Iterable[float],
+) -> dict[int, list]:
+    """[count, min, max, sum, first_ts, last_ts] по каждому каналу пачки."""
+    stats: dict[int, list] = {}
+    for channel_id, ts, value in zip(channel_ids, timestamps, values):
+        item = stats.get(channel_id)
+        if item is None:
+            stats[channel_id] = [1, value, value, value, ts, ts]
+            continue
+        item[0] += 1
+        if value < item[1]:
+            item[1] = value
+        elif value > item[2]:
+            item[2] = value
+        item[3] += value
+        if ts < item[4]:
+            item[4] = ts
+        elif ts > item[5]:
+            item[5] = ts
+    return stats
+
+
+def _upsert(dialect: Dialect) -> Insert | None:
+    """INSERT ... ON CONFLICT, складывающий статистику пачки с уже накопленной."""
+    if dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        least, greatest = func.min, func.max
+    elif dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        least, greatest = func.least, func.greatest
+    else:
+        return None
+
+    stmt = dialect_insert(_STATS)
+    new, old = stmt.excluded, _STATS.c
+    return stmt.on_conflict_do_update(
+        index_elements=["experiment_id", "channel_id"],
+        set_={
+            "count": old["count"] + new["count"],
+            "min": least(old["min"], new["min"]),
+            "max": greatest(old["max"], new["max"]),
+            "sum": old["sum"] + new["sum"],
+            "first_ts": least(old.first_ts, new.first_ts),
+            "last_ts": greatest(old.last_ts, new.last_ts),
+        },
+    )
+
+
+def add_points(
+    conn: Connection,
+    experiment_id: int,
+    channel_ids: Sequence[int],
+    timestamps: Sequence[int],
+    values: Sequence[float],
+) -> None:
+    """Учитывает в статистике только что записанную пачку точек (в транзакции conn)."""
+    stats = _aggregate(channel_ids, timestamps, values)
+    if not stats:
+        return
+    stmt = _upsert(conn.dialect)
+    if stmt is None:
+        # Без upsert каналы пачки пересчитываются по data_points
+        _rebuild(conn, experiment_id, list(stats))
+        return
+    conn.execute(
+        stmt,
+        [
+            {
+                "experiment_id": experiment_id,
+                "channel_id": channel_id,
+                "count": count,
+                "min": min_value,
+                "max": max_value,
+                "sum": total,
+                "first_ts": first_ts,
+                "last_ts": last_ts,
+            }
+            for channel_id, (count, min_value, max_value, total, first_ts, last_ts) in stats.items()
+        ],
+    )
+
+
+def _rebuild(conn: Connection, experiment_id: int, channel_ids: list[int] | None) -> None:
+    stale = delete(_STATS).where(_STATS.c.experiment_id == experiment_id)
+    points = (
+        select(
+            DataPoint.experiment_id,
+            DataPoint.channel_id,
+            func.count(),
+            func.min(DataPoint.value),
+            func.max(DataPoint.value),
+            func.sum(DataPoint.value),
+            func.min(DataPoint.ts_us),
+            func.max(DataPoint.ts_us),
+        )
+        .where(DataPoint.experiment_id == experiment_id)
+        .group_by(DataPoint.experiment_id, DataPoint.channel_id)
+    )
+    if channel_ids is not None:
+        stale = stale.where(_STATS.c.channel_id.in_(channel_ids))
+        points = points.where(DataPoint.channel_id.in_(channel_ids))
+
+    conn.execute(stale)
+    columns = ["experiment_id", "channel_id", "count", "min", "max", "sum", "first_ts", "last_ts"]
+    conn.execute(insert(_STATS).from_select(columns, points))
+
+
+def rebuild(db: Session, experiment_id: int, channel_ids: Iterable[int] | None = None) -> None:
+    """Пересчитывает статистику эксперимента (или только указанных каналов) по data_points."""
+    _rebuild(db.connection(), experiment_id, list(channel_ids) if channel_ids is not None else None)
+
+
+def forget_run(db: Session, experiment_id: int, run_id: int, channel_ids: Iterable[int]) -> None:
+    """Убирает из статистики и агрегатов импорт, точки которого уже удалены (channel_ids — его каналы)."""
+    db.execute(delete(_SKETCHES).where(_SKETCHES.c.import_run_id == run_id))
+    channel_ids = list(channel_ids)
+    if channel_ids:
+        _rebuild(db.connection(), experiment_id, channel_ids)
+        rollup_service.rebuild(db, experiment_id, channel_ids)
+
+
+# ---------------------------------------------------------------------------
+# Сводки распределения (stddev, квантили)
+# ---------------------------------------------------------------------------
+
+def _split_by_channel(channel_ids: Sequence[int], values: Sequence[float]) -> Iterable[tuple[int, np.ndarray]]:
+    channels = np.fromiter(channel_ids, dtype=np.int64, count=len(channel_ids))
+    # Порядок значений внутри канала для сводок не важен — устойчивая сортировка не нужна
+    order = np.argsort(channels)
+    channels, ordered = channels[order], np.fromiter(values, dtype=np.float64, count=len(values))[order]
+    starts = np.flatnonzero(np.r_[True, channels[1:] != channels[:-1]])
+    return zip(channels[starts].tolist(), np.split(ordered, starts[1:]))
+
+
+class RunSketches:
+    """Сводки распределения каналов одного импорта.
+
+    Сводки копятся в памяти на время импорта, а после каждой пачки строки
+    затронутых каналов переписываются целиком — импорт единственный их писатель.
+    """
+
+    def __init__(self, experiment_id: int, run_id: int) -> None:
+        self._experiment_id = experiment_id
+        self._run_id = run_id
+        self._sketches: dict[int, tuple[Moments, TDigest]] = {}
+
+    def add_points(self, conn: Connection, channel_ids: Sequence[int], values: Sequence[float]) -> None:
+        if not len(channel_ids):
+            return
+        rows = []
+        for channel_id, part in _split_by_channel(channel_ids, values):
+            moments, digest = self._sketches.setdefault(channel_id, (Moments(), TDigest()))
+            moments.add(part)
+            digest.add(part)
+            rows.append({
+                "experiment_id": self._experiment_id,
+                "channel_id": channel_id,
+                "import_run_id": self._run_id,
+                "count": moments.count,
+                "mean": moments.mean,
+                "m2": moments.m2,
+                "digest": digest.to_bytes(),
+            })
+        conn.execute(
+            delete(_SKETCHES)
+            .where(_SKETCHES.c.import_run_id == self._run_id)
+            .where(_SKETCHES.c.channel_id.in_([row["channel_id"] for row in rows]))
+        )
+        conn.execute(insert(_SKETCHES), rows)
+
+
+def _describe(moments: Moments, digest: TDigest) -> dict[str, float | None]:
+    result: dict[str, float | None] = {"stddev": moments.stddev}
+    for name, q in QUANTILES.items():
+        result[name] = digest.quantile(q)
+    return result
+
+
+def get_distributions(db: Session, experiment_id: int) -> dict[int, dict[str, float | None]]:
+    """stddev и квантили по каналам: объединение сводок всех импортов эксперимента."""
+    stmt = (
+        select(_SKETCHES.c.channel_id, _SKETCHES.c["count"], _SKETCHES.c.mean, _SKETCHES.c.m2, _SKETCHES.c.digest)
+        .where(_SKETCHES.c.experiment_id == experiment_id)
+        .order_by(_SKETCHES.c.channel_id)
+    )
+    merged: dict[int, tuple[Moments, list[TDigest]]] = {}
+    for row in db.execute(stmt):
+        moments, digests = merged.setdefault(row.channel_id, (Moments(), []))
+        moments.merge(Moments(row[1], row.mean, row.m2))
+        digests.append(TDigest.from_bytes(row.digest))
+
+    result = {}
+    for channel_id, (moments, digests) in merged.items():
+        digest = TDigest()
+        digest.merge(digests)
+        result[channel_id] = _describe(moments, digest)
+    return result
+
+
+def get_exact_distributions(
+    db: Session,
+    experiment_id: int,
+    channel_ids: Iterable[int],
+) -> dict[int, dict[str, float | None]]:
+    """Точные stddev и квантили по точкам; значения каждого канала читаются целиком."""
+    result = {}
+    for channel_id in channel_ids:
+        stmt = select(DataPoint.value).where(
+            DataPoint.experiment_id == experiment_id, DataPoint.channel_id == channel_id
+        )
+        values = np.fromiter(db.scalars(stmt), dtype=np.float64)
+        result[channel_id] = {
+            "stddev": float(values.std(ddof=1)) if len(values) > 1 else None,
+            **{name: float(np.quantile(values, q)) if len(values) else None for name, q in QUANTILES.items()},
+        }
+    return result
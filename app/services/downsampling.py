@@ -0,0 +1,85 @@
+"""Прореживание временного ряда до заданного числа точек с сохранением формы графика.
+
+Функции принимают массивы времени и значений одного канала (в порядке времени)
+и возвращают отсортированные индексы оставляемых точек; первая и последняя
+точки ряда сохраняются всегда.
+
+- ``lttb`` — Largest-Triangle-Three-Buckets (Steinarsson, 2013): из каждой корзины
+  берётся точка, образующая наибольший треугольник с выбранной точкой предыдущей
+  корзины и средним следующей. Хорошо передаёт форму линии.
+- ``minmax`` — минимум и максимум каждой корзины: сохраняет все пики и провалы,
+  т.е. огибающую шумного сигнала.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+METHOD_LTTB = "lttb"
+METHOD_MINMAX = "minmax"
+METHODS = (METHOD_LTTB, METHOD_MINMAX)
+
+
+def _bucket_edges(length: int, buckets: int) -> np.ndarray:
+    """Границы корзин для точек 1..length-2 (первая и последняя точки — отдельно)."""
+    return np.linspace(1, length - 1, buckets + 1).astype(np.int64)
+
+
+def lttb(t: np.ndarray, v: np.ndarray, max_points: int) -> np.ndarray:
+    length = len(v)
+    if max_points >= length or length < 3:
+        return np.arange(length)
+    if max_points < 3:
+        return np.array([0, length - 1])
+
+    t = t.astype(np.float64)
+    edges = _bucket_edges(length, max_points - 2)
+    starts, ends = edges[:-1], edges[1:]
+    # Среднее каждой корзины (для последней "следующей" корзиной служит последняя точка)
+    sizes = ends - starts
+    avg_t = np.add.reduceat(t[1 : length - 1], starts - 1) / sizes
+    avg_v = np.add.reduceat(v[1 : length - 1], starts - 1) / sizes
+    avg_t = np.append(avg_t[1:], t[-1])
+    avg_v = np.append(avg_v[1:], v[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+    a = 0
+    # Выбор в корзине зависит от точки, выбранной в предыдущей, поэтому цикл по корзинам;
+    # внутри корзины площади считаются векторно
+    for i in range(len(starts)):
+        lo, hi = starts[i], ends[i]
+        ta, va = t[a], v[a]
+        area = np.abs((ta - avg_t[i]) * (v[lo:hi] - va) - (ta - t[lo:hi]) * (avg_v[i] - va))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(t: np.ndarray, v: np.ndarray, max_points: int) -> np.ndarray:
+    length = len(v)
+    if max_points >= length or length < 3:
+        return np.arange(length)
+
+    buckets = max(1, (max_points - 2) // 2)
+    size = -(-(length - 2) // buckets)  # ceil
+    # Внутренние точки раскладываются в матрицу buckets x size; хвост добивается NaN
+    inner = np.full(buckets * size, np.nan)
+    inner[: length - 2] = v[1 : length - 1]
+    inner = inner.reshape(buckets, size)
+    filled = ~np.isnan(inner).all(axis=1)
+    offsets = np.arange(buckets)[filled] * size + 1
+    inner = inner[filled]
+    indices = np.concatenate([
+        [0],
+        offsets + np.nanargmin(inner, axis=1),
+        offsets + np.nanargmax(inner, axis=1),
+        [length - 1],
+    ])
+    return np.unique(indices)
+
+
+def downsample(t: np.ndarray, v: np.ndarray, max_points: int, method: str = METHOD_LTTB) -> np.ndarray:
+    if method == METHOD_MINMAX:
+        return minmax(t, v, max_points)
+    return lttb(t, v, max_points)
@@ -3,7 +3,8 @@ from __future__ import annotations
 from datetime import datetime
 
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
 from app.models import Experiment
@@ -45,6 +46,24 @@ def get_experiment_or_404(db: Session, experiment_id: int) -> Experiment:
     return experiment
 
 
+def get_data_version_or_404(db: Session, experiment_id: int) -> int:
+    """Версия данных эксперимента для ETag и ключей кэша ответов.
+
+    Вместе с id однозначно задаёт состояние точек: id удалённых экспериментов
+    не переиспользуются, а их точки и сводки удаляются каскадом.
+    """
+    version = db.scalar(select(Experiment.data_version).where(Experiment.id == experiment_id))
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Experiment {experiment_id} not found")
+    return version
+
+
+def bump_data_version(conn: Connection | Session, experiment_id: int) -> None:
+    """Отмечает изменение точек эксперимента; фиксируется тем же commit, что и сами точки."""
+    stmt = update(Experiment).where(Experiment.id == experiment_id).values(data_version=Experiment.data_version + 1)
+    conn.execute(stmt)
+
+
 def delete_experiment(db: Session, experiment_id: int) -> bool:
     experiment = db.get(Experiment, experiment_id)
     if experiment is None:
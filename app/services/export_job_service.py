@@ -0,0 +1,416 @@
+"""Фоновые выгрузки (POST /experiments/{id}/export-jobs).
+
+Воркер пишет файл в EXPORT_SPOOL_DIR теми же генераторами, что и GET export
+(``export_service.iter_export``), а скачивание поддерживает Range: оборванную загрузку
+можно продолжить, не повторяя выгрузку. Готовый файл переиспользуется: задача с теми же
+параметрами при том же состоянии данных эксперимента (params_hash) возвращается сразу.
+Файлы вытесняются через EXPORT_CACHE_TTL_SECONDS после последнего обращения и, если спул
+больше EXPORT_CACHE_MAX_BYTES, начиная с давно не скачанных.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import Channel, ChannelStats, ExportJob
+from app.services import experiment_service, export_service
+from app.services.import_service import (
+    RUN_ACTIVE_STATUSES,
+    RUN_CANCELLED,
+    RUN_DONE,
+    RUN_FAILED,
+    RUN_QUEUED,
+    RUN_RUNNING,
+)
+
+logger = logging.getLogger(__name__)
+
+# Каталог готовых файлов выгрузки
+EXPORT_SPOOL_DIR = Path(os.getenv("EXPORT_SPOOL_DIR", "./spool/exports"))
+
+# Число одновременно выполняемых фоновых выгрузок
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "1"))
+
+# Сколько хранится готовый файл после последнего обращения и сколько места занимают все файлы
+EXPORT_CACHE_TTL_SECONDS = int(os.getenv("EXPORT_CACHE_TTL_SECONDS", "86400"))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(10 * 1024**3)))
+
+# Файл вытеснен из спула, выгрузку нужно запросить заново
+JOB_EXPIRED = "expired"
+
+_executor: ThreadPoolExecutor | None = None
+_cancel_events: dict[int, threading.Event] = {}
+_lock = threading.Lock()
+
+
+class ExportCancelled(Exception):
+    """Выгрузка остановлена по запросу пользователя."""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+        return _executor
+
+
+def _now() -> datetime:
+    return datetime.now().astimezone()
+
+
+# ---------------------------------------------------------------------------
+# Параметры и файл задачи
+# ---------------------------------------------------------------------------
+
+def _dump_params(options: dict[str, object]) -> str:
+    """Параметры iter_export -> JSON для export_jobs.params (время — ISO)."""
+    stored = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in options.items()
+    }
+    return json.dumps(stored, ensure_ascii=False, sort_keys=True)
+
+
+def _load_params(params: str) -> dict[str, object]:
+    options = json.loads(params)
+    for key in ("start", "end"):
+        if options.get(key):
+            options[key] = datetime.fromisoformat(options[key])
+    return options
+
+
+def _params_hash(experiment_id: int, params: str, data_version: int) -> str:
+    key = json.dumps([experiment_id, data_version, params])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _rows_estimate(db: Session, experiment_id: int, options: dict[str, object]) -> int:
+    # Точек каналов по channel_stats — верхняя граница: фильтры времени и качества её уменьшают
+    stmt = select(func.sum(ChannelStats.count)).where(ChannelStats.experiment_id == experiment_id)
+    if options["channels"]:
+        stmt = stmt.join(Channel, Channel.id == ChannelStats.channel_id).where(Channel.name.in_(options["channels"]))
+    points = db.scalar(stmt) or 0
+    limit = options["limit"]
+    return points if limit is None else min(points, limit)
+
+
+def artifact_path(job: ExportJob) -> Path:
+    """Путь готового файла задачи в спуле."""
+    suffix = export_service.EXPORT_FORMATS[json.loads(job.params)["export_format"]][1]
+    return EXPORT_SPOOL_DIR / f"export_{job.id}{suffix}"
+
+
+def job_to_dict(job: ExportJob) -> dict[str, object]:
+    if job.status == RUN_DONE:
+        fraction = 1.0
+    elif job.rows_estimate:
+        fraction = min(job.rows_written / job.rows_estimate, 1.0)
+    else:
+        fraction = None
+    return {
+        "id": job.id,
+        "experiment_id": job.experiment_id,
+        "status": job.status,
+        "params": json.loads(job.params),
+        "filename": job.filename,
+        "rows_written": job.rows_written,
+        "rows_estimate": job.rows_estimate,
+        "bytes_written": job.bytes_written,
+        "progress": fraction,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "error_message": job.error_message,
+        "download_url": f"/export-jobs/{job.id}/download" if job.status == RUN_DONE else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Выполнение задачи в воркере
+# ---------------------------------------------------------------------------
+
+def _close_job(db: Session, job_id: int, status: str, message: str | None) -> None:
+    db.rollback()
+    job = db.get(ExportJob, job_id)
+    if job is None:
+        # Эксперимент удалён вместе с задачей
+        return
+    job.status = status
+    job.error_message = message
+    job.finished_at = _now()
+    db.commit()
+
+
+def _checkpoint(db: Session, job_id: int, rows_written: int, bytes_written: int) -> bool:
+    """Фиксирует прогресс в строке задачи; возвращает, запрошена ли отмена через БД.
+
+    Прогресс и запрос отмены видны всем процессам, а не только выполняющему задачу.
+    """
+    db.execute(
+        update(ExportJob)
+        .where(ExportJob.id == job_id)
+        .values(rows_written=rows_written, bytes_written=bytes_written)
+    )
+    db.commit()
+    return bool(db.scalar(select(ExportJob.cancel_requested).where(ExportJob.id == job_id)))
+
+
+def _run_job(session_factory: sessionmaker, job_id: int) -> None:
+    cancel_event = _cancel_events[job_id]
+    try:
+        with session_factory() as db:
+            job = db.get(ExportJob, job_id)
+            if job is None:
+                return
+            if cancel_event.is_set() or job.cancel_requested:
+                _close_job(db, job_id, RUN_CANCELLED, None)
+                return
+
+            job.status = RUN_RUNNING
+            job.started_at = _now()
+            db.commit()
+
+            experiment_id, options = job.experiment_id, _load_params(job.params)
+            path = artifact_path(job)
+            partial = path.with_name(path.name + ".part")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            progress = [0, 0]
+
+            # Прогресс фиксируется, а отмена срабатывает между кусками выгрузки. Точки читает
+            # другое соединение: в WAL его курсор не мешает фиксировать запись
+            def on_rows(count: int) -> None:
+                if _checkpoint(db, job_id, *progress) or cancel_event.is_set():
+                    raise ExportCancelled
+                progress[0] += count
+
+            status, message = RUN_DONE, None
+            try:
+                # Точки читаются отдельной сессией: её транзакция закрывается до записи статуса
+                with session_factory() as read_db, partial.open("wb") as out:
+                    for chunk in export_service.iter_export(read_db, experiment_id, **options, on_rows=on_rows):
+                        out.write(chunk)
+                        progress[1] += len(chunk)
+                # Под итоговым именем файл появляется только целиком
+                partial.replace(path)
+            except ExportCancelled:
+                logger.info("Export job %d cancelled", job_id)
+                status = RUN_CANCELLED
+            except HTTPException as exc:
+                status, message = RUN_FAILED, str(exc.detail)
+            except Exception:
+                logger.exception("Export job %d failed", job_id)
+                status, message = RUN_FAILED, "Export failed"
+            # Статус пишется после обработки исключения: его traceback держит генераторы
+            # выгрузки, а с ними — незакрытый курсор, который в SQLite не даст зафиксировать запись
+            if status != RUN_DONE:
+                partial.unlink(missing_ok=True)
+                _close_job(db, job_id, status, message)
+                return
+
+            # Статус done ставится только задаче без запроса отмены (как у импорта)
+            finished = db.execute(
+                update(ExportJob)
+                .where(ExportJob.id == job_id, ExportJob.cancel_requested.is_(False))
+                .values(status=RUN_DONE)
+            )
+            job = db.get(ExportJob, job_id)
+            if job is None or not finished.rowcount:
+                path.unlink(missing_ok=True)
+                if job is not None:
+                    logger.info("Export job %d cancelled", job_id)
+                    _close_job(db, job_id, RUN_CANCELLED, None)
+                return
+            job.rows_written, job.bytes_written = progress
+            job.finished_at = job.accessed_at = _now()
+            db.commit()
+            logger.info(
+                "Export job %d for experiment %d: rows=%d bytes=%d",
+                job_id, experiment_id, job.rows_written, job.bytes_written,
+            )
+            evict_artifacts(db)
+    finally:
+        with _lock:
+            _cancel_events.pop(job_id, None)
+
+
+# ---------------------------------------------------------------------------
+# Кэш готовых файлов
+# ---------------------------------------------------------------------------
+
+def _expire(job: ExportJob) -> None:
+    artifact_path(job).unlink(missing_ok=True)
+    job.status = JOB_EXPIRED
+
+
+def evict_artifacts(db: Session) -> int:
+    """Удаляет файлы старше EXPORT_CACHE_TTL_SECONDS с последнего обращения, затем — давно
+    не скачанные, пока спул больше EXPORT_CACHE_MAX_BYTES. Возвращает число вытесненных."""
+    cutoff = _now() - timedelta(seconds=EXPORT_CACHE_TTL_SECONDS)
+    done = list(db.scalars(
+        select(ExportJob).where(ExportJob.status == RUN_DONE).order_by(ExportJob.accessed_at, ExportJob.id)
+    ).all())
+    stale = set(db.scalars(
+        select(ExportJob.id).where(ExportJob.status == RUN_DONE, ExportJob.accessed_at < cutoff)
+    ).all())
+    total = sum(job.bytes_written for job in done if job.id not in stale)
+    evicted = 0
+    for job in done:
+        if job.id not in stale:
+            if total <= EXPORT_CACHE_MAX_BYTES:
+                continue
+            total -= job.bytes_written
+        _expire(job)
+        evicted += 1
+    if evicted:
+        db.commit()
+    return evicted
+
+
+# ---------------------------------------------------------------------------
+# Публичный интерфейс
+# ---------------------------------------------------------------------------
+
+def submit_export(db: Session, experiment_id: int, options: dict[str, object]) -> tuple[dict[str, object], bool]:
+    """Ставит выгрузку в очередь или возвращает такую же уже готовую (или выполняемую).
+
+    options — параметры ``export_service.iter_export``. Второе значение — создана ли задача.
+    """
+    export_service.check_export_options(
+        options["export_format"], options["layout"], options["tolerance"], options["interval"], options["fill"]
+    )
+    evict_artifacts(db)
+
+    params = _dump_params(options)
+    data_version = experiment_service.get_data_version_or_404(db, experiment_id)
+    params_hash = _params_hash(experiment_id, params, data_version)
+    stmt = (
+        select(ExportJob)
+        .where(ExportJob.params_hash == params_hash, ExportJob.status.in_((*RUN_ACTIVE_STATUSES, RUN_DONE)))
+        .order_by(ExportJob.id.desc())
+    )
+    existing = db.scalars(stmt).first()
+    if existing is not None:
+        if existing.status != RUN_DONE:
+            return job_to_dict(existing), False
+        if artifact_path(existing).exists():
+            existing.accessed_at = _now()
+            db.commit()
+            return job_to_dict(existing), False
+        # Файл удалён мимо кэша — выгрузка выполняется заново
+        existing.status = JOB_EXPIRED
+
+    suffix = export_service.EXPORT_FORMATS[options["export_format"]][1]
+    job = ExportJob(
+        experiment_id=experiment_id,
+        status=RUN_QUEUED,
+        params=params,
+        params_hash=params_hash,
+        filename=f"experiment_{experiment_id}{suffix}",
+        rows_estimate=_rows_estimate(db, experiment_id, options),
+        created_at=_now(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # Воркер работает в собственной сессии на том же engine, что и запрос
+    session_factory = sessionmaker(bind=db.get_bind(), autoflush=False, autocommit=False, future=True)
+    with _lock:
+        _cancel_events[job.id] = threading.Event()
+    _get_executor().submit(_run_job, session_factory, job.id)
+    return job_to_dict(job), True
+
+
+def get_export_job(db: Session, job_id: int) -> ExportJob:
+    job = db.get(ExportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Export job {job_id} not found")
+    return job
+
+
+def open_artifact(db: Session, job_id: int) -> tuple[Path, ExportJob]:
+    """Путь готового файла для скачивания; обращение продлевает его срок в кэше."""
+    job = get_export_job(db, job_id)
+    if job.status == JOB_EXPIRED:
+        raise HTTPException(status_code=410, detail=f"Export job {job_id} has expired")
+    if job.status != RUN_DONE:
+        raise HTTPException(status_code=409, detail=f"Export job {job_id} is {job.status}")
+    path = artifact_path(job)
+    if not path.exists():
+        job.status = JOB_EXPIRED
+        db.commit()
+        raise HTTPException(status_code=410, detail=f"Export job {job_id} has expired")
+    job.accessed_at = _now()
+    db.commit()
+    return path, job
+
+
+def cancel_export(db: Session, job_id: int) -> dict[str, object]:
+    """Запрашивает остановку выгрузки; воркер удаляет недописанный файл на границе куска.
+
+    Запрос записывается в БД, поэтому доходит до воркера в любом процессе.
+    """
+    job = get_export_job(db, job_id)
+    requested = db.execute(
+        update(ExportJob)
+        .where(ExportJob.id == job_id, ExportJob.status.in_(RUN_ACTIVE_STATUSES))
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    if not requested.rowcount:
+        raise HTTPException(status_code=409, detail=f"Export job {job_id} is already {job.status}")
+
+    with _lock:
+        event = _cancel_events.get(job_id)
+    if event is None:
+        # Задачи нет в пуле этого процесса (идёт в другом или прервана перезапуском) — запись
+        # закрывается сразу, воркер другого процесса удалит свой файл на границе куска
+        _close_job(db, job_id, RUN_CANCELLED, None)
+    else:
+        event.set()
+    return job_to_dict(job)
+
+
+def recover_interrupted_jobs(db: Session) -> int:
+    """Помечает failed выгрузки, прерванные остановкой процесса, и удаляет из спула
+    всё, кроме готовых файлов (недописанные и оставшиеся от удалённых экспериментов)."""
+    jobs = list(db.scalars(select(ExportJob).where(ExportJob.status.in_(RUN_ACTIVE_STATUSES))).all())
+    for job in jobs:
+        job.status = RUN_FAILED
+        job.error_message = "Interrupted by server restart"
+        job.finished_at = _now()
+    db.commit()
+
+    if EXPORT_SPOOL_DIR.is_dir():
+        done = db.scalars(select(ExportJob).where(ExportJob.status == RUN_DONE)).all()
+        keep = {artifact_path(job).name for job in done}
+        for path in EXPORT_SPOOL_DIR.iterdir():
+            if path.is_file() and path.name not in keep:
+                path.unlink(missing_ok=True)
+    return len(jobs)
+
+
+def shutdown() -> None:
+    """Останавливает пул: активные выгрузки отменяются, дожидаемся их завершения."""
+    global _executor
+    with _lock:
+        for event in _cancel_events.values():
+            event.set()
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=False)
@@ -2,53 +2,413 @@ from __future__ import annotations
 
 import csv
 import io
+import json
+import os
+import zlib
+from collections.abc import Callable, Iterator
 from datetime import datetime
 
-from sqlalchemy import select
+from fastapi import HTTPException
+from sqlalchemy import Select, SmallInteger, select, type_coerce
 from sqlalchemy.orm import Session
 
-from app.models import DataPoint
+from app.models import QUALITY_NAMES, Channel, DataPoint, Tag, Unit
+from app.services import export_wide
+from app.services.timestamps import format_epoch_us, to_epoch_us
 
-MAX_EXPORT_ROWS = 5000
+# Сколько строк выгрузки читается из курсора и пишется за раз: память не зависит от размера выгрузки
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
 
+# Строк в группе Parquet: группа собирается в памяти и уходит клиенту целиком
+EXPORT_ROW_GROUP_ROWS = int(os.getenv("EXPORT_ROW_GROUP_ROWS", "100000"))
+# Степень сжатия csv.gz (1 — быстрее, 9 — меньше)
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
 
-def export_csv(
-    db: Session,
+EXPORT_HEADER = ["timestamp", "channel", "value", "unit", "quality", "tag"]
+
+EXPORT_FORMAT_CSV = "csv"
+EXPORT_FORMAT_CSV_GZ = "csv.gz"
+EXPORT_FORMAT_JSONL = "jsonl"
+EXPORT_FORMAT_PARQUET = "parquet"
+EXPORT_FORMAT_ARROW = "arrow"
+# Формат -> (media type, расширение файла)
+EXPORT_FORMATS = {
+    EXPORT_FORMAT_CSV: ("text/csv", ".csv"),
+    EXPORT_FORMAT_CSV_GZ: ("application/gzip", ".csv.gz"),
+    EXPORT_FORMAT_JSONL: ("application/x-ndjson", ".jsonl"),
+    EXPORT_FORMAT_PARQUET: ("application/vnd.apache.parquet", ".parquet"),
+    EXPORT_FORMAT_ARROW: ("application/vnd.apache.arrow.stream", ".arrows"),
+}
+
+EXPORT_LAYOUT_LONG = "long"
+EXPORT_LAYOUT_WIDE = "wide"
+EXPORT_LAYOUTS = (EXPORT_LAYOUT_LONG, EXPORT_LAYOUT_WIDE)
+
+# Parquet и Arrow пишутся пакетом pyarrow (в requirements.txt; без него — 400).
+_ARROW_FORMATS = (EXPORT_FORMAT_PARQUET, EXPORT_FORMAT_ARROW)
+
+# JSONL пишется стандартным json: NaN и Infinity остаются числами, которые читает импорт
+# (orjson записал бы их как null, и импорт пропустил бы такие точки)
+_JSONL_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def export_stmt(
     experiment_id: int,
     channels: list[str] | None,
     start: datetime | None,
     end: datetime | None,
     quality: str | None,
-) -> str:
-    """Генерирует CSV-выгрузку DataPoints эксперимента с поддержкой фильтров."""
+    limit: int | None = None,
+) -> Select:
+    """Выборка точек эксперимента для выгрузки с фильтрами, в порядке времени."""
+    # Имена канала, единицы и тега берутся из справочников
     stmt = (
-        select(DataPoint)
+        select(
+            DataPoint.ts_us,
+            DataPoint.tz_offset,
+            Channel.name.label("channel"),
+            DataPoint.value,
+            Unit.name.label("unit"),
+            # Код качества без TypeDecorator: в имя переводится словарём при записи, без вызова на строку
+            type_coerce(DataPoint.quality, SmallInteger).label("quality"),
+            Tag.name.label("tag"),
+        )
+        .join(Channel, Channel.id == DataPoint.channel_id)
+        .outerjoin(Unit, Unit.id == DataPoint.unit_id)
+        .outerjoin(Tag, Tag.id == DataPoint.tag_id)
         .where(DataPoint.experiment_id == experiment_id)
-        .order_by(DataPoint.timestamp, DataPoint.channel)
-        .limit(MAX_EXPORT_ROWS)
+        .order_by(DataPoint.ts_us, Channel.name)
     )
 
     if channels:
-        stmt = stmt.where(DataPoint.channel.in_(channels))
+        stmt = stmt.where(Channel.name.in_(channels))
     if start:
-        stmt = stmt.where(DataPoint.timestamp >= start)
+        stmt = stmt.where(DataPoint.ts_us >= to_epoch_us(start))
     if end:
-        stmt = stmt.where(DataPoint.timestamp <= end)
+        stmt = stmt.where(DataPoint.ts_us <= to_epoch_us(end))
     if quality:
         stmt = stmt.where(DataPoint.quality == quality.upper())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _iter_partitions(db: Session, stmt: Select) -> Iterator:
+    # yield_per читает курсор частями (в PostgreSQL — серверным курсором), а не весь результат сразу
+    with db.connection().execution_options(yield_per=EXPORT_CHUNK_ROWS).execute(stmt) as result:
+        yield from result.partitions()
+
+
+def _counted(chunks: Iterator[list], on_rows: Callable[[int], None]) -> Iterator[list]:
+    for rows in chunks:
+        on_rows(len(rows))
+        yield rows
+
+
+def _text_rows(partitions: Iterator) -> Iterator[list[tuple]]:
+    # Точки идут по времени, и у каналов одного опроса время общее: ISO-строка
+    # строится один раз на метку времени
+    last_time, timestamp = None, ""
+    for rows in partitions:
+        chunk = []
+        for ts_us, tz_offset, channel, value, unit, quality, tag in rows:
+            if (ts_us, tz_offset) != last_time:
+                last_time, timestamp = (ts_us, tz_offset), format_epoch_us(ts_us, tz_offset)
+            chunk.append((timestamp, channel, value, unit, QUALITY_NAMES.get(quality), tag))
+        yield chunk
+
+
+def iter_export_rows(db: Session, stmt: Select) -> Iterator[list[tuple]]:
+    """Строки выгрузки кусками по EXPORT_CHUNK_ROWS: (timestamp ISO, channel, value, unit, quality, tag)."""
+    return _text_rows(_iter_partitions(db, stmt))
+
+
+def _wide_text_rows(chunks: Iterator[list[tuple]]) -> Iterator[list[tuple]]:
+    # (ts_us, tz_offset, значения...) -> (timestamp ISO, значения...)
+    for rows in chunks:
+        yield [(format_epoch_us(ts_us, tz_offset), *values) for ts_us, tz_offset, *values in rows]
 
-    data_points = db.scalars(stmt).all()
 
+def _iter_csv(header: list[str], row_chunks: Iterator[list[tuple]]) -> Iterator[str]:
     output = io.StringIO()
     writer = csv.writer(output)
-    writer.writerow(["timestamp", "channel", "value", "unit", "quality", "tag"])
-    for dp in data_points:
-        writer.writerow([
-            dp.timestamp.isoformat(),
-            dp.channel,
-            dp.value,
-            dp.unit or "",
-            dp.quality or "",
-            dp.tag or "",
-        ])
-    return output.getvalue()
+    writer.writerow(header)
+    yield output.getvalue()
+    for rows in row_chunks:
+        output.seek(0)
+        output.truncate()
+        # None (нет единицы, качества, тега, значения канала) csv пишет пустой строкой
+        writer.writerows(rows)
+        yield output.getvalue()
+
+
+def iter_export_csv(
+    db: Session,
+    experiment_id: int,
+    channels: list[str] | None,
+    start: datetime | None,
+    end: datetime | None,
+    quality: str | None,
+    *,
+    limit: int | None = None,
+) -> Iterator[str]:
+    """CSV-выгрузка DataPoints эксперимента с фильтрами — частями, для StreamingResponse."""
+    stmt = export_stmt(experiment_id, channels, start, end, quality, limit)
+    return _iter_csv(EXPORT_HEADER, iter_export_rows(db, stmt))
+
+
+def export_csv(
+    db: Session,
+    experiment_id: int,
+    channels: list[str] | None,
+    start: datetime | None,
+    end: datetime | None,
+    quality: str | None,
+    *,
+    limit: int | None = None,
+) -> str:
+    """Генерирует CSV-выгрузку DataPoints эксперимента с поддержкой фильтров целиком."""
+    return "".join(iter_export_csv(db, experiment_id, channels, start, end, quality, limit=limit))
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise HTTPException(
+            status_code=400,
+            detail="parquet and arrow export require the 'pyarrow' package",
+        )
+    return pyarrow
+
+
+def check_export_options(
+    export_format: str,
+    layout: str,
+    tolerance: str | None,
+    interval: str | None,
+    fill: str,
+) -> None:
+    """Проверяет параметры до начала ответа: ошибка посреди потока уже не станет статусом 400."""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail="format must be one of: " + ", ".join(EXPORT_FORMATS),
+        )
+    if layout not in EXPORT_LAYOUTS:
+        raise HTTPException(
+            status_code=400,
+            detail="layout must be one of: " + ", ".join(EXPORT_LAYOUTS),
+        )
+    if fill not in export_wide.WIDE_FILLS:
+        raise HTTPException(
+            status_code=400,
+            detail="fill must be one of: " + ", ".join(export_wide.WIDE_FILLS),
+        )
+    if layout == EXPORT_LAYOUT_LONG and (tolerance or interval or fill != export_wide.WIDE_FILL_EMPTY):
+        raise HTTPException(status_code=400, detail="tolerance, interval and fill require layout=wide")
+    if tolerance and interval:
+        raise HTTPException(status_code=400, detail="tolerance and interval are mutually exclusive")
+    if tolerance:
+        export_wide.parse_duration(tolerance, "tolerance")
+    if interval:
+        export_wide.parse_duration(interval, "interval")
+    if export_format in _ARROW_FORMATS:
+        _pyarrow()
+
+
+def _iter_csv_gz(csv_chunks: Iterator[str]) -> Iterator[bytes]:
+    # wbits=31 — поток в формате gzip (заголовок и CRC), а не голый deflate
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in csv_chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _iter_jsonl(header: list[str], row_chunks: Iterator[list[tuple]]) -> Iterator[bytes]:
+    # Длинная выгрузка — поля и ISO-время те же, что в CSV: файл загружается обратно через импорт .jsonl
+    encode = _JSONL_ENCODER.encode
+    for rows in row_chunks:
+        lines = [encode(dict(zip(header, row))) for row in rows]
+        lines.append("")
+        yield "\n".join(lines).encode("utf-8")
+
+
+class _ChunkSink:
+    """Файл только для записи: pyarrow пишет в него, а накопленные байты забираются drain()."""
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _arrow_schema(pa):
+    # Время — UTC, исходное смещение (минуты) — отдельной колонкой, как в data_points
+    return pa.schema([
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("tz_offset", pa.int16()),
+        ("channel", pa.string()),
+        ("value", pa.float64()),
+        ("unit", pa.string()),
+        ("quality", pa.string()),
+        ("tag", pa.string()),
+    ])
+
+
+def _wide_arrow_schema(pa, names: list[str]):
+    return pa.schema([
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("tz_offset", pa.int16()),
+        *((name, pa.float64()) for name in names),
+    ])
+
+
+def _iter_record_batches(pa, schema, partitions: Iterator) -> Iterator:
+    for rows in partitions:
+        ts_us, tz_offset, channel, value, unit, quality, tag = zip(*rows)
+        yield pa.record_batch(
+            [
+                pa.array(ts_us, type=schema.field("timestamp").type),
+                pa.array(tz_offset, type=pa.int16()),
+                pa.array(channel, type=pa.string()),
+                pa.array(value, type=pa.float64()),
+                pa.array(unit, type=pa.string()),
+                pa.array([QUALITY_NAMES.get(code) for code in quality], type=pa.string()),
+                pa.array(tag, type=pa.string()),
+            ],
+            schema=schema,
+        )
+
+
+def _iter_wide_record_batches(pa, schema, chunks: Iterator[list[tuple]]) -> Iterator:
+    for rows in chunks:
+        columns = list(zip(*rows))
+        yield pa.record_batch(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+
+def _iter_parquet(pa, schema, batches: Iterator) -> Iterator[bytes]:
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    group, rows = [], 0
+    for batch in batches:
+        group.append(batch)
+        rows += batch.num_rows
+        if rows >= EXPORT_ROW_GROUP_ROWS:
+            # Одна группа строк на накопленные куски: её байты можно отдать сразу
+            writer.write_table(pa.Table.from_batches(group, schema), row_group_size=rows)
+            group, rows = [], 0
+            yield sink.drain()
+    if group:
+        writer.write_table(pa.Table.from_batches(group, schema), row_group_size=rows)
+    # Метаданные (footer) пишутся при закрытии
+    writer.close()
+    yield sink.drain()
+
+
+def _iter_arrow(pa, schema, batches: Iterator) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    # Arrow IPC streaming format: схема, затем батчи по мере чтения
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_export(
+    db: Session,
+    experiment_id: int,
+    channels: list[str] | None,
+    start: datetime | None,
+    end: datetime | None,
+    quality: str | None,
+    *,
+    export_format: str = EXPORT_FORMAT_CSV,
+    layout: str = EXPORT_LAYOUT_LONG,
+    tolerance: str | None = None,
+    interval: str | None = None,
+    fill: str = export_wide.WIDE_FILL_EMPTY,
+    limit: int | None = None,
+    on_rows: Callable[[int], None] | None = None,
+) -> Iterator[bytes]:
+    """Выгрузка в формате export_format (EXPORT_FORMATS) — частями, для StreamingResponse.
+
+    layout=long — строка на точку из выборки export_stmt, layout=wide — строка на момент
+    времени, каналы колонками (export_wide). Все форматы пишутся по мере чтения курсоров.
+    on_rows получает число строк каждого прочитанного куска (прогресс фоновой выгрузки).
+    """
+    check_export_options(export_format, layout, tolerance, interval, fill)
+    if layout == EXPORT_LAYOUT_WIDE:
+        columns = export_wide.wide_columns(db, experiment_id, channels)
+        names = [name for _, name in columns]
+        header = ["timestamp", *names]
+        chunks = export_wide.iter_wide_rows(
+            db,
+            experiment_id,
+            columns,
+            to_epoch_us(start) if start else None,
+            to_epoch_us(end) if end else None,
+            quality,
+            tolerance_us=export_wide.parse_duration(tolerance, "tolerance") if tolerance else 0,
+            interval_us=export_wide.parse_duration(interval, "interval") if interval else None,
+            fill=fill,
+            limit=limit,
+            chunk_rows=EXPORT_CHUNK_ROWS,
+        )
+        if on_rows is not None:
+            chunks = _counted(chunks, on_rows)
+        if export_format in _ARROW_FORMATS:
+            pa = _pyarrow()
+            schema = _wide_arrow_schema(pa, names)
+            batches = _iter_wide_record_batches(pa, schema, chunks)
+        else:
+            text_rows = _wide_text_rows(chunks)
+    else:
+        partitions = _iter_partitions(db, export_stmt(experiment_id, channels, start, end, quality, limit))
+        if on_rows is not None:
+            partitions = _counted(partitions, on_rows)
+        header = EXPORT_HEADER
+        if export_format in _ARROW_FORMATS:
+            pa = _pyarrow()
+            schema = _arrow_schema(pa)
+            batches = _iter_record_batches(pa, schema, partitions)
+        else:
+            text_rows = _text_rows(partitions)
+
+    if export_format == EXPORT_FORMAT_PARQUET:
+        return _iter_parquet(pa, schema, batches)
+    if export_format == EXPORT_FORMAT_ARROW:
+        return _iter_arrow(pa, schema, batches)
+    if export_format == EXPORT_FORMAT_JSONL:
+        return _iter_jsonl(header, text_rows)
+    csv_chunks = _iter_csv(header, text_rows)
+    if export_format == EXPORT_FORMAT_CSV_GZ:
+        return _iter_csv_gz(csv_chunks)
+    return (chunk.encode("utf-8") for chunk in csv_chunks)
@@ -0,0 +1,187 @@
+"""Широкая выгрузка (GET export?layout=wide): строка на момент времени, каналы — колонками.
+
+Точки каждого канала читаются своим курсором в порядке времени (по ix_dp_experiment_channel_ts,
+без сортировки), потоки сливаются по времени за один проход через кучу. В памяти — кусок
+курсора на канал и по одной ожидающей точке, а не вся выборка.
+
+Как собирается строка:
+- по умолчанию — точки с одинаковым временем, по одной от канала;
+- tolerance — к самой ранней ожидающей точке присоединяются ближайшие точки остальных
+  каналов, отстающие от неё не больше чем на tolerance; время строки — время этой точки;
+- interval — точки группируются по интервалам от эпохи (UTC), значение канала — среднее
+  за интервал; строки только для интервалов с точками, время строки — начало интервала.
+
+Пропуски заполняются по fill: empty — пусто, ffill — последнее значение канала,
+interpolate — линейно между последним значением канала и его следующей точкой по их
+собственному времени (в interval — между средними соседних интервалов канала по их началам;
+до первой и после последней точки канала — пусто).
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+from collections.abc import Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Channel, ChannelStats, DataPoint
+
+WIDE_FILL_EMPTY = "empty"
+WIDE_FILL_FFILL = "ffill"
+WIDE_FILL_INTERPOLATE = "interpolate"
+WIDE_FILLS = (WIDE_FILL_EMPTY, WIDE_FILL_FFILL, WIDE_FILL_INTERPOLATE)
+
+# Курсор канала читает не меньше стольких строк за раз, сколько бы каналов ни было
+_MIN_CHANNEL_CHUNK = 256
+
+_DURATION_UNITS = {"ms": 1_000, "s": 1_000_000, "m": 60_000_000, "h": 3_600_000_000, "d": 86_400_000_000}
+_DURATION_RE = re.compile(r"(\d+)(ms|s|m|h|d)")
+
+
+def parse_duration(value: str, name: str) -> int:
+    """'500ms' -> 500000: длительность в микросекундах (ms, s, m, h, d)."""
+    match = _DURATION_RE.fullmatch(value.strip())
+    if match is None or int(match[1]) == 0:
+        raise HTTPException(status_code=400, detail=f"{name} must be a positive number with unit: ms, s, m, h, d")
+    return int(match[1]) * _DURATION_UNITS[match[2]]
+
+
+def wide_columns(db: Session, experiment_id: int, channels: list[str] | None) -> list[tuple[int | None, str]]:
+    """Колонки выгрузки (ключ канала, имя): запрошенные каналы в порядке запроса,
+    без фильтра — каналы с точками в эксперименте по имени. Ключ None — канала нет в справочнике."""
+    if not channels:
+        stmt = (
+            select(Channel.id, Channel.name)
+            .join(ChannelStats, ChannelStats.channel_id == Channel.id)
+            .where(ChannelStats.experiment_id == experiment_id)
+            .order_by(Channel.name)
+        )
+        return [(channel_id, name) for channel_id, name in db.execute(stmt).all()]
+    names = list(dict.fromkeys(channels))
+    known = select(Channel.id, Channel.name).where(Channel.name.in_(names))
+    ids = {name: channel_id for channel_id, name in db.execute(known)}
+    return [(ids.get(name), name) for name in names]
+
+
+def _channel_points(
+    db: Session,
+    experiment_id: int,
+    channel_id: int,
+    start_us: int | None,
+    end_us: int | None,
+    quality: str | None,
+    chunk_rows: int,
+) -> Iterator[tuple[int, int, float]]:
+    stmt = (
+        select(DataPoint.ts_us, DataPoint.tz_offset, DataPoint.value)
+        .where(DataPoint.experiment_id == experiment_id, DataPoint.channel_id == channel_id)
+        .order_by(DataPoint.ts_us)
+    )
+    # Те же фильтры, что у export_stmt
+    if start_us is not None:
+        stmt = stmt.where(DataPoint.ts_us >= start_us)
+    if end_us is not None:
+        stmt = stmt.where(DataPoint.ts_us <= end_us)
+    if quality:
+        stmt = stmt.where(DataPoint.quality == quality.upper())
+    with db.connection().execution_options(yield_per=chunk_rows).execute(stmt) as result:
+        for rows in result.partitions():
+            yield from rows
+
+
+def _interval_means(points: Iterator[tuple[int, int, float]], interval_us: int) -> Iterator[tuple]:
+    """Точки канала -> (начало интервала, tz_offset и время первой точки, среднее) по интервалам с точками."""
+    start, first_offset, first_ts, total, count = None, 0, 0, 0.0, 0
+    for ts_us, tz_offset, value in points:
+        bucket = ts_us - ts_us % interval_us
+        if bucket != start:
+            if count:
+                yield start, first_offset, total / count, first_ts
+            start, first_offset, first_ts, total, count = bucket, tz_offset, ts_us, 0.0, 0
+        total += value
+        count += 1
+    if count:
+        yield start, first_offset, total / count, first_ts
+
+
+def iter_wide_rows(
+    db: Session,
+    experiment_id: int,
+    columns: list[tuple[int | None, str]],
+    start_us: int | None,
+    end_us: int | None,
+    quality: str | None,
+    *,
+    tolerance_us: int = 0,
+    interval_us: int | None = None,
+    fill: str = WIDE_FILL_EMPTY,
+    limit: int | None = None,
+    chunk_rows: int = 10_000,
+) -> Iterator[list[tuple]]:
+    """Строки (ts_us, tz_offset, значение по каждой колонке...) кусками по chunk_rows.
+
+    tz_offset — исходное смещение точки, с которой началась строка.
+    """
+    width = len(columns)
+    channel_chunk = max(_MIN_CHANNEL_CHUNK, chunk_rows // max(width, 1))
+    streams = [
+        _channel_points(db, experiment_id, channel_id, start_us, end_us, quality, channel_chunk)
+        if channel_id is not None
+        else iter(())
+        for channel_id, _ in columns
+    ]
+    if interval_us:
+        # Интервал канала — одна «точка» со временем его начала: строки собираются как без допуска
+        streams = [_interval_means(stream, interval_us) for stream in streams]
+    heads = [next(stream, None) for stream in streams]
+    heap = [(head[0], i) for i, head in enumerate(heads) if head is not None]
+    heapq.heapify(heap)
+    # (время, значение) последней взятой точки канала — для interpolate, сами значения — для ffill
+    last: list[tuple[int, float] | None] = [None] * width
+    filled: list[float | None] = [None] * width
+
+    chunk: list[tuple] = []
+    emitted = 0
+    while heap and (limit is None or emitted < limit):
+        row_ts, anchor = heap[0]
+        tz_offset = heads[anchor][1]
+        row_end = row_ts + tolerance_us + 1
+        # В interval смещение строки — у самой ранней точки интервала среди каналов
+        first_ts = heads[anchor][3] if interval_us else row_ts
+
+        values: list[float | None] = [None] * width
+        taken = []
+        while heap and heap[0][0] < row_end:
+            i = heapq.heappop(heap)[1]
+            taken.append(i)
+            # Одна точка канала на строку: следующая с тем же временем попадёт в следующую строку
+            head = heads[i]
+            values[i] = head[2]
+            last[i] = (head[0], head[2])
+            if interval_us and head[3] < first_ts:
+                first_ts, tz_offset = head[3], head[1]
+            heads[i] = next(streams[i], None)
+        for i in taken:
+            if heads[i] is not None:
+                heapq.heappush(heap, (heads[i][0], i))
+
+        if fill == WIDE_FILL_FFILL:
+            for i in taken:
+                filled[i] = values[i]
+            values = filled.copy()
+        elif fill == WIDE_FILL_INTERPOLATE and len(taken) < width:
+            for i, value in enumerate(values):
+                if value is None and last[i] is not None and heads[i] is not None:
+                    (t0, v0), (t1, _, v1, *_) = last[i], heads[i]
+                    values[i] = v0 + (v1 - v0) * (row_ts - t0) / (t1 - t0)
+
+        chunk.append((row_ts, tz_offset, *values))
+        emitted += 1
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
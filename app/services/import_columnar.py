@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import csv
+import logging
+import os
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice, repeat
+from typing import Any
+
+import numpy as np
+from fastapi import HTTPException
+
+from app.services.import_service import (
+    ALLOWED_QUALITY,
+    CSV_HEADER,
+    ImportCounters,
+    _BatchWriter,
+    _process_datapoint_rows,
+)
+from app.services.timestamps import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк файла разбирается одной векторной операцией
+COLUMNAR_BLOCK_LINES = int(os.getenv("COLUMNAR_BLOCK_LINES", "65536"))
+
+_ALLOWED_QUALITY = np.array(sorted(ALLOWED_QUALITY))
+_CANONICAL_QUALITY = np.array(["", *sorted(ALLOWED_QUALITY)])
+
+# Позиции символов в "YYYY-MM-DDTHH:MM:SS±HH:MM"
+_TS_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+_OFFSET_DIGITS = [20, 21, 23, 24]
+_TS_WIDTH = 25
+
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+# ---------------------------------------------------------------------------
+# Векторные парсеры колонок
+# ---------------------------------------------------------------------------
+
+def _codepoints(column: np.ndarray, width: int) -> np.ndarray:
+    """Матрица кодов символов (n, width); короткие строки дополнены нулями."""
+    padded = column.astype(f"U{max(width, column.dtype.itemsize // 4)}")
+    return padded.view(np.uint32).reshape(len(column), -1)[:, :width].astype(np.int32)
+
+
+def _digits(codes: np.ndarray, pos: int, count: int) -> np.ndarray:
+    result = np.zeros(len(codes), dtype=np.int64)
+    for i in range(pos, pos + count):
+        result = result * 10 + (codes[:, i] - 48)
+    return result
+
+
+def _civil_to_days(year: np.ndarray, month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """Число дней от 1970-01-01 для пролептического григорианского календаря."""
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _parse_timestamps(ts: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Разбирает колонку ISO 8601 timestamp.
+
+    Возвращает (локальное время без смещения, смещение в минутах, маска ошибок).
+    Строки вида ``YYYY-MM-DDTHH:MM:SS`` с суффиксом ``Z``/``±HH:MM`` или без него
+    разбираются арифметикой над кодами символов; остальные (дробные секунды, другие
+    формы ISO, несуществующие даты) — построчно через ``parse_timestamp``, поэтому результат
+    совпадает со строковым движком.
+    """
+    n = len(ts)
+    wall = np.zeros(n, dtype="datetime64[us]")
+    offset = np.zeros(n, dtype=np.int32)
+    bad = np.zeros(n, dtype=bool)
+    if n == 0:
+        return wall, offset, bad
+
+    codes = _codepoints(ts, _TS_WIDTH)
+    lengths = np.char.str_len(ts)
+
+    digits = codes[:, _TS_DIGITS]
+    fast = ((digits >= 48) & (digits <= 57)).all(axis=1)
+    fast &= (codes[:, 4] == ord("-")) & (codes[:, 7] == ord("-"))
+    fast &= (codes[:, 10] == ord("T")) | (codes[:, 10] == ord(" "))
+    fast &= (codes[:, 13] == ord(":")) & (codes[:, 16] == ord(":"))
+
+    year, month, day = _digits(codes, 0, 4), _digits(codes, 5, 2), _digits(codes, 8, 2)
+    hour, minute, second = _digits(codes, 11, 2), _digits(codes, 14, 2), _digits(codes, 17, 2)
+    month_index = np.clip(month - 1, 0, 11)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days_in_month = _DAYS_IN_MONTH[month_index] + ((month == 2) & leap)
+    fast &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= days_in_month)
+    fast &= (hour <= 23) & (minute <= 59) & (second <= 59)
+
+    off_hours, off_minutes = _digits(codes, 20, 2), _digits(codes, 23, 2)
+    off_digits = codes[:, _OFFSET_DIGITS]
+    is_offset = (
+        (lengths == _TS_WIDTH)
+        & ((codes[:, 19] == ord("+")) | (codes[:, 19] == ord("-")))
+        & (codes[:, 22] == ord(":"))
+        & ((off_digits >= 48) & (off_digits <= 57)).all(axis=1)
+        & (off_hours <= 23)
+        & (off_minutes <= 59)
+    )
+    fast &= (lengths == 19) | ((lengths == 20) & (codes[:, 19] == ord("Z"))) | is_offset
+
+    seconds = _civil_to_days(year, month, day) * 86400 + hour * 3600 + minute * 60 + second
+    wall[fast] = (seconds[fast] * 1_000_000).astype("datetime64[us]")
+    sign = np.where(codes[:, 19] == ord("-"), -1, 1)
+    offset[fast] = np.where(is_offset, sign * (off_hours * 60 + off_minutes), 0)[fast]
+
+    for i in np.flatnonzero(~fast):
+        try:
+            dt = parse_timestamp(str(ts[i]))
+        except ValueError:
+            bad[i] = True
+            continue
+        wall[i] = np.datetime64(dt.replace(tzinfo=None), "us")
+        offset[i] = int(dt.utcoffset().total_seconds() // 60)
+
+    return wall, offset, bad
+
+
+def _parse_values(raw: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Колонка value -> (float64, маска ошибок, маска пустых значений).
+
+    Разбор идёт через float(), как в строковом движке: для коротких строк это быстрее
+    numpy-преобразования строкового массива. Построчный проход с обработкой
+    исключений нужен, только если в блоке есть пустые или ошибочные значения.
+    """
+    n = len(raw)
+    bad = np.zeros(n, dtype=bool)
+    empty = np.zeros(n, dtype=bool)
+    try:
+        return np.fromiter(map(float, raw), dtype=np.float64, count=n), bad, empty
+    except ValueError:
+        pass
+
+    parsed = np.zeros(n, dtype=np.float64)
+    for i, text in enumerate(raw):
+        try:
+            parsed[i] = float(text)
+        except ValueError:
+            if text.strip():
+                bad[i] = True
+            else:
+                empty[i] = True
+    return parsed, bad, empty
+
+
+def _optional(column: np.ndarray) -> list[str | None]:
+    return np.where(column == "", None, column).tolist()
+
+
+# ---------------------------------------------------------------------------
+# Обработка блока строк
+# ---------------------------------------------------------------------------
+
+def _split_block(lines: list[str]) -> tuple[list[str], list[int], list[int], list[str]]:
+    """Делит блок на простые строки и строки, которым нужен модуль csv.
+
+    Простая строка — ровно шесть полей без кавычек. Строки с кавычками, лишними или
+    недостающими полями и пустые строки разбираются модулем csv. Возвращает плоский
+    список полей простых строк, их индексы в блоке, индексы и текст остальных строк.
+    """
+    text = "".join(lines)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n")
+    parts = text.split("\n")
+    if text.endswith("\n"):
+        parts.pop()
+
+    commas = list(map(str.count, parts, repeat(",")))
+    if '"' not in text and "\r" not in text and commas.count(5) == len(parts):
+        # Частый случай — весь блок однородный
+        body = text.removesuffix("\n")
+        return body.replace("\n", ",").split(","), list(range(len(parts))), [], []
+
+    simple: list[int] = []
+    irregular: list[int] = []
+    for i, (part, count) in enumerate(zip(parts, commas)):
+        if count == 5 and '"' not in part and "\r" not in part:
+            simple.append(i)
+        else:
+            irregular.append(i)
+    fields = ",".join(parts[i] for i in simple).split(",") if simple else []
+    return fields, simple, irregular, [parts[i] for i in irregular]
+
+
+def _process_block(
+    lines: list[str],
+    first_line: int,
+    safe_filename: str,
+    writer: _BatchWriter,
+    counters: ImportCounters,
+    report: Callable[[int, str], None],
+) -> None:
+    fields, simple, irregular, irregular_lines = _split_block(lines)
+
+    if simple:
+        ts = np.char.strip(np.array(fields[0::6]))
+        channel = np.char.strip(np.array(fields[1::6]))
+        raw_value = fields[2::6]
+        value, bad_value, empty_value = _parse_values(raw_value)
+
+        missing = (ts == "") | (channel == "") | empty_value
+        candidates = np.flatnonzero(~missing)
+
+        n = len(simple)
+        wall = np.zeros(n, dtype="datetime64[us]")
+        offset = np.zeros(n, dtype=np.int32)
+        bad_ts = np.zeros(n, dtype=bool)
+        wall[candidates], offset[candidates], bad_ts[candidates] = _parse_timestamps(ts[candidates])
+
+        # Обычно quality уже в каноническом виде; strip/upper только для остальных значений
+        raw_quality = np.array(fields[4::6])
+        quality = np.where(raw_quality == "", None, raw_quality)
+        bad_quality = np.zeros(n, dtype=bool)
+        other = np.flatnonzero(~np.isin(raw_quality, _CANONICAL_QUALITY))
+        if len(other):
+            normalized = np.char.upper(np.char.strip(raw_quality[other]))
+            allowed = np.isin(normalized, _ALLOWED_QUALITY)
+            bad_quality[other] = ~allowed
+            quality[other[allowed]] = normalized[allowed]
+
+        # Порядок проверок тот же, что в _process_datapoint_rows:
+        # пустые поля -> skipped, timestamp/value -> errors, quality -> skipped
+        error = ~missing & (bad_ts | bad_value)
+        ok = ~missing & ~error & ~bad_quality
+
+        counters.skipped += int(missing.sum() + (~missing & ~error & bad_quality).sum())
+        counters.errors += int(error.sum())
+        counters.inserted += int(ok.sum())
+
+        # Сообщение берём у тех же функций, что и строковый движок
+        for i in np.flatnonzero(error):
+            try:
+                parse_timestamp(str(ts[i]))
+                float(raw_value[i].strip())
+            except ValueError as exc:
+                report(first_line + simple[i], f"parse error: {exc}")
+
+        idx = np.flatnonzero(ok)
+        # Локальное время минус смещение — микросекунды UTC от эпохи
+        ts_us = wall[idx].astype(np.int64) - offset[idx].astype(np.int64) * 60_000_000
+        writer.extend_columns(
+            ts_us.tolist(),
+            offset[idx].tolist(),
+            channel[idx].tolist(),
+            value[idx].tolist(),
+            _optional(np.char.strip(np.array(fields[3::6])[idx])),
+            quality[idx].tolist(),
+            _optional(np.char.strip(np.array(fields[5::6])[idx])),
+        )
+
+    if irregular:
+        rows: list[tuple[int, dict[str, Any]]] = []
+        for i, row in zip(irregular, csv.reader(line + "\n" for line in irregular_lines)):
+            if row:
+                rows.append((first_line + i, dict(zip(CSV_HEADER, row))))
+        _process_datapoint_rows(rows, safe_filename, writer, counters, report)
+
+
+# ---------------------------------------------------------------------------
+# Публичный интерфейс
+# ---------------------------------------------------------------------------
+
+def open_csv(lines: Iterable[str]) -> Iterator[str]:
+    """Проверяет header и возвращает итератор по строкам данных."""
+    it = iter(lines)
+    header = next(csv.reader([next(it, "")]), [])
+    if header != CSV_HEADER:
+        raise HTTPException(
+            status_code=400,
+            detail="CSV header must be exactly: " + ",".join(CSV_HEADER),
+        )
+    return it
+
+
+def process_csv(
+    lines: Iterable[str],
+    safe_filename: str,
+    writer: _BatchWriter,
+    counters: ImportCounters | None = None,
+    report: Callable[[int, str], None] | None = None,
+    *,
+    first_line: int = 2,
+) -> ImportCounters:
+    """Колоночный движок импорта CSV.
+
+    Строки читаются блоками по COLUMNAR_BLOCK_LINES, каждый блок разбивается на колонки,
+    timestamp/value/quality проверяются векторно, а маски пропусков и ошибок строятся
+    сразу для всего блока. Корректные строки передаются в writer колонками.
+    Счётчики и номера строк совпадают со строковым движком; многострочные поля
+    в кавычках не поддерживаются — одна запись занимает одну строку.
+    """
+    counters = counters if counters is not None else ImportCounters()
+    if report is None:
+        def report(line_num: int, message: str) -> None:
+            logger.warning("Import %s, line %d: %s", safe_filename, line_num, message)
+
+    it = iter(lines)
+    while block := list(islice(it, COLUMNAR_BLOCK_LINES)):
+        _process_block(block, first_line, safe_filename, writer, counters, report)
+        first_line += len(block)
+
+    writer.flush()
+    return counters
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.models import DataPoint, ImportRun
+from app.services import (
+    channel_stats_service,
+    experiment_service,
+    import_parallel,
+    import_service,
+)
+from app.services.import_service import (
+    ENGINE_ROWS,
+    RUN_ACTIVE_STATUSES,
+    RUN_CANCELLED,
+    RUN_DONE,
+    RUN_FAILED,
+    RUN_QUEUED,
+    RUN_RUNNING,
+    SOURCE_LIVE,
+    ImportCounters,
+    _apply_counters,
+    _BatchWriter,
+    _check_engine,
+    _check_upload,
+    _consume,
+    _finish_run,
+    _new_run,
+    _open_upload,
+    _record_sizes,
+    run_to_dict,
+)
+
+logger = logging.getLogger(__name__)
+
+# Каталог, куда загрузки сохраняются до обработки фоновым воркером
+IMPORT_SPOOL_DIR = Path(os.getenv("IMPORT_SPOOL_DIR", "./spool/imports"))
+
+# Число одновременно выполняемых фоновых импортов
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+
+_executor: ThreadPoolExecutor | None = None
+_cancel_events: dict[int, threading.Event] = {}
+_lock = threading.Lock()
+
+
+class ImportCancelled(Exception):
+    """Импорт остановлен по запросу пользователя."""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+        return _executor
+
+
+# ---------------------------------------------------------------------------
+# Спулинг загрузки на диск
+# ---------------------------------------------------------------------------
+
+def _spool_upload(src: BinaryIO, dest: Path) -> int:
+    """Копирует загрузку в файл блоками; возвращает число записанных байт."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    try:
+        with dest.open("wb") as out:
+            while chunk := src.read(import_service.READ_CHUNK_BYTES):
+                written += len(chunk)
+                if written > import_service.MAX_UPLOAD_BYTES:
+                    raise import_service._too_large()
+                out.write(chunk)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+    return written
+
+
+def _spool_path(run_id: int, safe_filename: str) -> Path:
+    return IMPORT_SPOOL_DIR / f"run_{run_id}_{safe_filename}"
+
+
+# ---------------------------------------------------------------------------
+# Выполнение задачи в воркере
+# ---------------------------------------------------------------------------
+
+def _fail_run(db: Session, run_id: int, status: str, message: str | None) -> None:
+    """Откатывает частично записанные точки и фиксирует итоговый статус."""
+    db.rollback()
+    run = db.get(ImportRun, run_id)
+    if run is None:
+        # Эксперимент удалён: запись импорта и точки удалены каскадом
+        return
+    points = select(DataPoint.channel_id).where(DataPoint.import_run_id == run_id).distinct()
+    channel_ids = db.scalars(points).all()
+    db.execute(delete(DataPoint).where(DataPoint.import_run_id == run_id))
+    channel_stats_service.forget_run(db, run.experiment_id, run_id, channel_ids)
+    experiment_service.bump_data_version(db, run.experiment_id)
+    run.status = status
+    run.inserted = 0
+    run.error_message = message
+    run.finished_at = datetime.now().astimezone()
+    db.commit()
+
+
+def _cancel_requested(db: Session, run_id: int) -> bool:
+    """Запрошена ли отмена через БД — в том числе запросом, пришедшим в другой процесс."""
+    return bool(db.scalar(select(ImportRun.cancel_requested).where(ImportRun.id == run_id)))
+
+
+def _run_job(session_factory: sessionmaker, run_id: int, path: Path, engine: str = ENGINE_ROWS) -> None:
+    cancel_event = _cancel_events[run_id]
+    try:
+        with session_factory() as db:
+            run = db.get(ImportRun, run_id)
+            if run is None:
+                return
+            if cancel_event.is_set() or run.cancel_requested:
+                _fail_run(db, run_id, RUN_CANCELLED, None)
+                return
+
+            run.status = RUN_RUNNING
+            db.commit()
+
+            experiment_id, safe_filename = run.experiment_id, run.filename
+            counters = ImportCounters()
+
+            with ExitStack() as stack:
+                if import_parallel.is_enabled(path):
+                    source = raw = import_parallel.ParallelParser(path, safe_filename, engine=engine)
+                else:
+                    source, raw = _open_upload(stack.enter_context(path.open("rb")), safe_filename)
+
+                # Каждая пачка фиксируется отдельной транзакцией вместе со счётчиками,
+                # поэтому прогресс виден другим соединениям, а отмена срабатывает между пачками.
+                # Прогресс считается по байтам исходного (для архивов — сжатого) файла.
+                def checkpoint() -> None:
+                    run = db.get(ImportRun, run_id)
+                    _apply_counters(run, counters, raw.bytes_read)
+                    _record_sizes(run, source, raw)
+                    db.commit()
+                    if cancel_event.is_set() or _cancel_requested(db, run_id):
+                        raise ImportCancelled
+
+                writer = _BatchWriter(db, experiment_id, run_id, on_flush=checkpoint)
+                started = time.perf_counter()
+                try:
+                    if isinstance(source, import_parallel.ParallelParser):
+                        source.run(writer, counters)
+                    else:
+                        _consume(source, safe_filename, writer, counters, engine=engine)
+                except ImportCancelled:
+                    logger.info("Import run %d cancelled", run_id)
+                    _fail_run(db, run_id, RUN_CANCELLED, None)
+                    return
+                except HTTPException as exc:
+                    _fail_run(db, run_id, RUN_FAILED, str(exc.detail))
+                    return
+                except Exception:
+                    logger.exception("Background import run %d failed", run_id)
+                    _fail_run(db, run_id, RUN_FAILED, "Database error during import")
+                    return
+
+                # Статус done ставится только строке без запроса отмены: отмена, успевшая
+                # до этого UPDATE, откатывает импорт, а пришедшая после — получает 409
+                finished = db.execute(
+                    update(ImportRun)
+                    .where(ImportRun.id == run_id, ImportRun.cancel_requested.is_(False))
+                    .values(status=RUN_DONE)
+                )
+                run = db.get(ImportRun, run_id)
+                if run is None:
+                    return
+                if not finished.rowcount:
+                    logger.info("Import run %d cancelled", run_id)
+                    _fail_run(db, run_id, RUN_CANCELLED, None)
+                    return
+                _finish_run(run, counters, raw.bytes_read, time.perf_counter() - started)
+                _record_sizes(run, source, raw)
+                db.commit()
+
+            logger.info(
+                "Background import '%s' into experiment %d: inserted=%d skipped=%d errors=%d",
+                safe_filename, experiment_id, counters.inserted, counters.skipped, counters.errors,
+            )
+    finally:
+        path.unlink(missing_ok=True)
+        with _lock:
+            _cancel_events.pop(run_id, None)
+
+
+def _create_queued_run(db: Session, experiment_id: int, safe_filename: str, size: int) -> dict[str, object]:
+    run = _new_run(experiment_id, safe_filename, status=RUN_QUEUED)
+    run.bytes_total = size
+    db.add(run)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return run_to_dict(run)
+
+
+# ---------------------------------------------------------------------------
+# Публичный интерфейс
+# ---------------------------------------------------------------------------
+
+async def submit_import(
+    file: UploadFile,
+    experiment_id: int,
+    db: Session,
+    *,
+    engine: str = ENGINE_ROWS,
+) -> dict[str, object]:
+    """Сохраняет загрузку на диск, создаёт ImportRun в статусе queued и ставит задачу в пул."""
+    safe_filename = _check_upload(file)
+    _check_engine(engine)
+
+    await file.seek(0)
+    upload = IMPORT_SPOOL_DIR / f"upload_{uuid.uuid4().hex}_{safe_filename}"
+    size = await run_in_threadpool(_spool_upload, file.file, upload)
+
+    try:
+        run = await run_in_threadpool(_create_queued_run, db, experiment_id, safe_filename, size)
+    except Exception:
+        upload.unlink(missing_ok=True)
+        raise
+    # Файл задачи узнаётся по id: восстановление после перезапуска удаляет только файлы своих задач
+    path = upload.rename(_spool_path(run["id"], safe_filename))
+
+    # Воркер работает в собственной сессии на том же engine, что и запрос
+    session_factory = sessionmaker(bind=db.get_bind(), autoflush=False, autocommit=False, future=True)
+    with _lock:
+        _cancel_events[run["id"]] = threading.Event()
+    _get_executor().submit(_run_job, session_factory, run["id"], path, engine)
+
+    return run
+
+
+def cancel_import(db: Session, run_id: int) -> dict[str, object]:
+    """Запрашивает остановку импорта; воркер откатывает данные на ближайшей границе пачки.
+
+    Запрос записывается в БД: воркер проверяет его после каждой пачки, в каком бы
+    процессе ни выполнялась задача, и не ставит отменённому импорту статус done.
+    """
+    run = db.get(ImportRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Import run {run_id} not found")
+    requested = db.execute(
+        update(ImportRun)
+        .where(ImportRun.id == run_id, ImportRun.status.in_(RUN_ACTIVE_STATUSES))
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    if not requested.rowcount:
+        raise HTTPException(status_code=409, detail=f"Import run {run_id} is already {run.status}")
+
+    with _lock:
+        event = _cancel_events.get(run_id)
+    if event is not None:
+        event.set()
+    elif run.source == SOURCE_LIVE:
+        # Точки live-сессии уже зафиксированы и видны: запись только закрывается
+        run.status = RUN_CANCELLED
+        run.finished_at = datetime.now().astimezone()
+        db.commit()
+    else:
+        # Задачи нет в пуле этого процесса: она прервана перезапуском или идёт в другом
+        # процессе. Зафиксированные пачки откатываются сразу; воркер другого процесса
+        # увидит запрос после ближайшей пачки и откатит и то, что успеет записать
+        _fail_run(db, run_id, RUN_CANCELLED, None)
+    return run_to_dict(run)
+
+
+def recover_interrupted_runs(db: Session) -> int:
+    """Помечает failed импорты, прерванные остановкой процесса, чистит их точки и файлы в спуле.
+
+    Считает прерванными все незавершённые импорты в БД, поэтому вызывается только там,
+    где других процессов с фоновыми задачами нет (``RECOVER_INTERRUPTED_JOBS``).
+    Точки live-сессий не удаляются: каждая микропачка уже была зафиксирована и видна.
+    """
+    stmt = select(ImportRun).where(ImportRun.status.in_(RUN_ACTIVE_STATUSES))
+    runs = list(db.scalars(stmt).all())
+    for run in runs:
+        if run.source == SOURCE_LIVE:
+            run.status = RUN_FAILED
+            run.error_message = "Interrupted by server restart"
+            run.finished_at = datetime.now().astimezone()
+            db.commit()
+        else:
+            _fail_run(db, run.id, RUN_FAILED, "Interrupted by server restart")
+            _spool_path(run.id, run.filename).unlink(missing_ok=True)
+    return len(runs)
+
+
+def shutdown() -> None:
+    """Останавливает пул: активные задачи отменяются, дожидаемся их завершения."""
+    global _executor
+    with _lock:
+        for event in _cancel_events.values():
+            event.set()
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=False)
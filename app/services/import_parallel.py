@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import csv
+import logging
+import multiprocessing
+import os
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi import HTTPException
+
+from app.services import import_columnar
+from app.services.import_service import (
+    CSV_HEADER,
+    ENGINE_COLUMNAR,
+    ENGINE_ROWS,
+    ImportCounters,
+    _BatchWriter,
+    _csv_rows,
+    _parse_jsonl,
+    _process_datapoint_rows,
+    _split_compression,
+)
+
+logger = logging.getLogger(__name__)
+
+# Число процессов для разбора; 0 — параллельный режим выключен
+IMPORT_PARSE_PROCESSES = int(os.getenv("IMPORT_PARSE_PROCESSES", "0"))
+
+# Файлы меньше этого размера разбираются в одном потоке: запуск процессов дороже выигрыша
+PARALLEL_MIN_BYTES = int(os.getenv("PARALLEL_MIN_BYTES", str(64 * 1024 * 1024)))
+
+# Размер диапазона байт, который обрабатывает один процесс за раз
+PARALLEL_CHUNK_BYTES = int(os.getenv("PARALLEL_CHUNK_BYTES", str(16 * 1024 * 1024)))
+
+
+def is_enabled(path: Path) -> bool:
+    # Сжатый поток нельзя разрезать по смещениям байт — архивы разбираются последовательно
+    if _split_compression(path.name)[1] is not None:
+        return False
+    return IMPORT_PARSE_PROCESSES > 0 and path.stat().st_size >= PARALLEL_MIN_BYTES
+
+
+# ---------------------------------------------------------------------------
+# Разбиение файла
+# ---------------------------------------------------------------------------
+
+def _split_ranges(path: Path, data_start: int, chunk_bytes: int) -> list[tuple[int, int]]:
+    """Делит файл на диапазоны [start, end), каждый из которых начинается и заканчивается
+    на границе строки. Строки не разрезаются, поэтому диапазоны независимы."""
+    size = path.stat().st_size
+    ranges: list[tuple[int, int]] = []
+    start = data_start
+    with path.open("rb") as f:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                # Дочитываем строку, в которую попала граница
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+# ---------------------------------------------------------------------------
+# Работа в дочернем процессе
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _ColumnBatch:
+    """Результат разбора диапазона: колонки провалидированных строк и счётчики.
+
+    Номера строк в warnings — локальные (первая строка диапазона = 1); родитель
+    переводит их в номера строк файла.
+    """
+
+    timestamps: array = field(default_factory=lambda: array("q"))
+    offsets: array = field(default_factory=lambda: array("h"))
+    channels: list[str] = field(default_factory=list)
+    values: array = field(default_factory=lambda: array("d"))
+    units: list[str | None] = field(default_factory=list)
+    qualities: list[str | None] = field(default_factory=list)
+    tags: list[str | None] = field(default_factory=list)
+    counters: ImportCounters = field(default_factory=ImportCounters)
+    warnings: list[tuple[int, str]] = field(default_factory=list)
+    lines: int = 0
+
+    # Интерфейс writer для _process_datapoint_rows и колоночного движка
+    def add(
+        self,
+        ts_us: int,
+        tz_offset: int,
+        channel: str,
+        value: float,
+        unit: str | None,
+        quality: str | None,
+        tag: str | None,
+    ) -> None:
+        self.timestamps.append(ts_us)
+        self.offsets.append(tz_offset)
+        self.channels.append(channel)
+        self.values.append(value)
+        self.units.append(unit)
+        self.qualities.append(quality)
+        self.tags.append(tag)
+
+    def extend_columns(
+        self,
+        timestamps: list[int],
+        offsets: list[int],
+        channels: list[str],
+        values: list[float],
+        units: list[str | None],
+        qualities: list[str | None],
+        tags: list[str | None],
+    ) -> None:
+        self.timestamps.extend(timestamps)
+        self.offsets.extend(offsets)
+        self.channels.extend(channels)
+        self.values.extend(values)
+        self.units.extend(units)
+        self.qualities.extend(qualities)
+        self.tags.extend(tags)
+
+    def flush(self) -> None:
+        pass
+
+
+def _parse_range(path: str, start: int, end: int, is_csv: bool, engine: str = ENGINE_ROWS) -> _ColumnBatch:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    text = data.decode("utf-8", errors="replace")
+
+    batch = _ColumnBatch()
+    batch.lines = text.count("\n") + (0 if not text or text.endswith("\n") else 1)
+
+    parts = text.split("\n")
+    if parts and not parts[-1]:
+        parts.pop()
+    lines = [part + "\n" for part in parts]
+
+    def report(line_num: int, message: str) -> None:
+        batch.warnings.append((line_num, message))
+
+    if is_csv and engine == ENGINE_COLUMNAR:
+        import_columnar.process_csv(lines, path, batch, batch.counters, report, first_line=1)
+        return batch
+
+    if is_csv:
+        rows = _csv_rows(csv.DictReader(lines, fieldnames=CSV_HEADER, delimiter=","))
+    else:
+        rows = _parse_jsonl(lines)
+    _process_datapoint_rows(rows, path, batch, batch.counters, report)
+    return batch
+
+
+# ---------------------------------------------------------------------------
+# Родительский процесс
+# ---------------------------------------------------------------------------
+
+class ParallelParser:
+    """Разбирает файл на диске в пуле процессов и передаёт строки единственному writer.
+
+    Диапазоны обрабатываются параллельно, но результаты потребляются строго по порядку,
+    поэтому счётчики точные, а номера строк в логе совпадают с последовательным режимом.
+    В работе одновременно не больше ``2 * processes`` диапазонов — память ограничена.
+
+    Предполагается, что одна запись занимает одну строку (CSV без многострочных полей в кавычках).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        safe_filename: str,
+        *,
+        processes: int | None = None,
+        engine: str = ENGINE_ROWS,
+    ) -> None:
+        self._path = path
+        self._engine = engine
+        self._safe_filename = safe_filename
+        self._processes = processes or IMPORT_PARSE_PROCESSES
+        self._is_csv = safe_filename.lower().endswith(".csv")
+        self.bytes_read = 0
+
+    def _read_header(self) -> int:
+        """Проверяет header CSV; возвращает смещение начала данных."""
+        if not self._is_csv:
+            return 0
+        with self._path.open("rb") as f:
+            first = f.readline()
+        header = next(csv.reader([first.decode("utf-8", errors="replace")]), [])
+        if header != CSV_HEADER:
+            raise HTTPException(
+                status_code=400,
+                detail="CSV header must be exactly: " + ",".join(CSV_HEADER),
+            )
+        return len(first)
+
+    def run(self, writer: _BatchWriter, counters: ImportCounters) -> ImportCounters:
+        data_start = self._read_header()
+        ranges = _split_ranges(self._path, data_start, PARALLEL_CHUNK_BYTES)
+        line_offset = 1 if self._is_csv else 0
+        self.bytes_read = data_start
+
+        # spawn: процесс-родитель многопоточный, fork в нём небезопасен
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self._processes, mp_context=context) as pool:
+            pending: deque[tuple[Future[_ColumnBatch], int]] = deque()
+            queue = iter(ranges)
+
+            def submit_next() -> None:
+                next_range = next(queue, None)
+                if next_range is not None:
+                    start, end = next_range
+                    future = pool.submit(_parse_range, str(self._path), start, end, self._is_csv, self._engine)
+                    pending.append((future, end))
+
+            for _ in range(self._processes * 2):
+                submit_next()
+
+            try:
+                while pending:
+                    future, end = pending.popleft()
+                    batch = future.result()
+                    submit_next()
+
+                    for line_num, message in batch.warnings:
+                        logger.warning("Import %s, line %d: %s", self._safe_filename, line_offset + line_num, message)
+                    line_offset += batch.lines
+
+                    counters.inserted += batch.counters.inserted
+                    counters.skipped += batch.counters.skipped
+                    counters.errors += batch.counters.errors
+                    self.bytes_read = end
+                    writer.extend_columns(
+                        batch.timestamps, batch.offsets, batch.channels, batch.values,
+                        batch.units, batch.qualities, batch.tags,
+                    )
+            except BaseException:
+                for future, _ in pending:
+                    future.cancel()
+                raise
+
+        writer.flush()
+        return counters
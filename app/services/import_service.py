@@ -1,105 +1,610 @@
 from __future__ import annotations
 
+import asyncio
+import bz2
+import codecs
 import csv
-import io
+import gzip
 import json
 import logging
-from collections.abc import Iterable
-from datetime import datetime, timezone
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice, repeat
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO
 
 from fastapi import HTTPException, UploadFile
+from sqlalchemy import Table, insert, select
+from sqlalchemy.engine import Dialect
 from sqlalchemy.orm import Session
 
-from sqlalchemy import select
-
-from app.models import DataPoint, ImportRun
+from app.models import Channel, DataPoint, ImportRun, Tag, Unit
+from app.services import channel_stats_service, experiment_service, rollup_service
+from app.services.timestamps import TimestampParser
 
 logger = logging.getLogger(__name__)
 
 CSV_HEADER = ["timestamp", "channel", "value", "unit", "quality", "tag"]
 ALLOWED_QUALITY = {"OK", "WARN", "BAD"}
 
-# 10 MB — достаточно для CSV/JSONL с десятками тысяч строк
-MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# Файл читается потоково, поэтому лимит ограничивает только объём на диске,
+# а не потребление памяти. По умолчанию — 4 GB, переопределяется через окружение.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(4 * 1024 * 1024 * 1024)))
+
+# Предел объёма данных после распаковки сжатой загрузки — защита от «zip-бомб»
+MAX_UNCOMPRESSED_BYTES = int(os.getenv("MAX_UNCOMPRESSED_BYTES", str(64 * 1024 * 1024 * 1024)))
+
+# Размер блока, которым читается загруженный файл
+READ_CHUNK_BYTES = 1024 * 1024
+
+# Поддерживаемые форматы и сжатие (суффикс файла -> алгоритм).
+# zstd читается пакетом zstandard (в requirements.txt; без него .zst отклоняется с 400).
+DATA_SUFFIXES = (".csv", ".jsonl")
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".bz2": "bz2", ".zst": "zstd"}
+
+# Сколько строк DataPoint накапливается перед одним executemany-insert
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "10000"))
+
+# Сколько синхронных импортов может одновременно разбираться и писаться в БД.
+# Работа идёт в отдельных потоках, чтобы не блокировать event loop.
+IMPORT_THREADS = int(os.getenv("IMPORT_THREADS", "4"))
+
+# Статусы ImportRun
+RUN_QUEUED = "queued"
+RUN_RUNNING = "running"
+RUN_DONE = "done"
+RUN_FAILED = "failed"
+RUN_CANCELLED = "cancelled"
+RUN_ACTIVE_STATUSES = (RUN_QUEUED, RUN_RUNNING)
+
+# Источник данных ImportRun: загруженный файл или live-сессия (см. live_ingest_service)
+SOURCE_FILE = "file"
+SOURCE_LIVE = "live"
+
+# Движки разбора: rows — построчная валидация (по умолчанию),
+# columnar — векторная обработка блоков CSV (см. import_columnar)
+ENGINE_ROWS = "rows"
+ENGINE_COLUMNAR = "columnar"
+IMPORT_ENGINES = (ENGINE_ROWS, ENGINE_COLUMNAR)
 
 
 # ---------------------------------------------------------------------------
 # Утилиты
 # ---------------------------------------------------------------------------
 
-def _parse_ts(raw: str) -> datetime:
-    """Парсит ISO 8601 timestamp; поднимает ValueError при ошибке."""
+def _format_size(num_bytes: int) -> str:
+    if num_bytes >= 1024 * 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024 * 1024):g} GB"
+    return f"{num_bytes // (1024 * 1024)} MB"
+
+
+def _too_large(limit: int | None = None, *, what: str = "File") -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"{what} too large (max {_format_size(limit or MAX_UPLOAD_BYTES)})",
+    )
+
+
+def _split_compression(filename: str) -> tuple[str, str | None]:
+    """'data.csv.gz' -> ('data.csv', 'gzip'); для несжатых файлов алгоритм — None."""
+    lower = filename.lower()
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if lower.endswith(suffix):
+            return filename[: -len(suffix)], compression
+    return filename, None
+
+
+def _is_csv(filename: str) -> bool:
+    return _split_compression(filename)[0].lower().endswith(".csv")
+
+
+def _zstandard():
     try:
-        dt = datetime.fromisoformat(raw)
-    except ValueError as exc:
-        raise ValueError(f"Cannot parse timestamp: {raw!r}") from exc
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    return dt
+        import zstandard
+    except ImportError:
+        raise HTTPException(
+            status_code=400,
+            detail="zstd support requires the 'zstandard' package",
+        )
+    return zstandard
+
+
+class _LineReader:
+    """Читает бинарный поток блоками фиксированного размера и отдаёт текстовые строки.
+
+    UTF-8 декодируется инкрементально, поэтому многобайтовые символы на границе
+    блоков не ломаются. В памяти одновременно находится не больше одного блока.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        *,
+        chunk_size: int | None = None,
+        max_bytes: int | None = None,
+        limit_name: str = "File",
+    ) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size or READ_CHUNK_BYTES
+        self._max_bytes = max_bytes
+        self._limit_name = limit_name
+        self.bytes_read = 0
+
+    def __iter__(self) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        tail = ""
+        while True:
+            chunk = self._stream.read(self._chunk_size)
+            if not chunk:
+                break
+            self.bytes_read += len(chunk)
+            if self._max_bytes is not None and self.bytes_read > self._max_bytes:
+                raise _too_large(self._max_bytes, what=self._limit_name)
+
+            parts = (tail + decoder.decode(chunk)).split("\n")
+            # Последняя строка блока может быть неполной — дочитываем её со следующим блоком
+            tail = parts.pop()
+            for part in parts:
+                yield part + "\n"
+
+        tail += decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+class _CountingReader:
+    """Обёртка над сжатым потоком: считает прочитанные байты и ограничивает их объём."""
+
+    def __init__(self, stream: BinaryIO, *, max_bytes: int | None = None) -> None:
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        if self._max_bytes is not None and self.bytes_read > self._max_bytes:
+            raise _too_large(self._max_bytes)
+        return data
+
+
+_ZSTD_MAGIC = 0xFD2FB528
+_ZSTD_SKIPPABLE_MAGIC = 0x184D2A50  # младшие 4 бита — любые
+_ZSTD_DICT_ID_SIZES = (0, 1, 2, 4)
+_ZSTD_CONTENT_SIZE_SIZES = (0, 2, 4, 8)
+
+
+class _ZstdFrameReader:
+    """Сжатый поток zstd для stream_reader с проверкой, что он кончается на границе кадра.
+
+    stream_reader молча останавливается на обрезанном кадре. Здесь заголовки кадров
+    и блоков (RFC 8878) читаются по мере передачи байтов декомпрессору, содержимое блоков
+    пропускается; обрезанный поток — EOFError на последнем чтении.
+    """
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self._stream = stream
+        self._header = bytearray()  # неполный заголовок кадра или блока
+        self._skip = 0  # байты содержимого текущего блока (и контрольной суммы)
+        self._in_frame = False
+        self._checksum = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        if data:
+            self._scan(memoryview(data))
+        elif self._in_frame or self._header or self._skip:
+            raise EOFError("zstd frame is truncated")
+        return data
+
+    def _scan(self, data: memoryview) -> None:
+        pos = 0
+        while pos < len(data):
+            if self._skip:
+                step = min(self._skip, len(data) - pos)
+                self._skip -= step
+                pos += step
+                continue
+            need = self._header_size()
+            take = min(need - len(self._header), len(data) - pos)
+            self._header += data[pos:pos + take]
+            pos += take
+            if len(self._header) == self._header_size():
+                self._parse_header()
+
+    def _header_size(self) -> int:
+        header = self._header
+        if self._in_frame:
+            return 3
+        if len(header) < 4:
+            return 4
+        magic = int.from_bytes(header[:4], "little")
+        if magic & 0xFFFFFFF0 == _ZSTD_SKIPPABLE_MAGIC:
+            return 8
+        if magic != _ZSTD_MAGIC:
+            raise OSError("not a zstd frame")
+        if len(header) < 5:
+            return 5
+        descriptor = header[4]
+        single_segment = descriptor >> 5 & 1
+        content_size = _ZSTD_CONTENT_SIZE_SIZES[descriptor >> 6] or single_segment
+        return 5 + (not single_segment) + _ZSTD_DICT_ID_SIZES[descriptor & 3] + content_size
+
+    def _parse_header(self) -> None:
+        header, self._header = bytes(self._header), bytearray()
+        if self._in_frame:
+            block = int.from_bytes(header, "little")
+            block_type, block_size = block >> 1 & 3, block >> 3
+            if block_type == 3:
+                raise OSError("reserved zstd block type")
+            self._skip = 1 if block_type == 1 else block_size
+            if block & 1:
+                self._skip += self._checksum
+                self._in_frame = False
+        elif len(header) == 8:
+            self._skip = int.from_bytes(header[4:], "little")
+        else:
+            self._in_frame = True
+            self._checksum = 4 if header[4] & 4 else 0
+
+
+class _DecompressingReader:
+    """Потоково распаковывает gzip/bz2/zstd: в памяти только внутренние буферы декомпрессора.
+
+    Повреждённые или обрезанные данные превращаются в 400.
+    """
+
+    def __init__(self, stream: BinaryIO, compression: str) -> None:
+        self._compression = compression
+        self._errors: tuple[type[BaseException], ...] = (OSError, EOFError)
+        if compression == "gzip":
+            self._inner = gzip.GzipFile(fileobj=stream, mode="rb")
+        elif compression == "bz2":
+            self._inner = bz2.BZ2File(stream, mode="rb")
+        else:
+            zstandard = _zstandard()
+            self._inner = zstandard.ZstdDecompressor().stream_reader(
+                _ZstdFrameReader(stream), read_across_frames=True
+            )
+            self._errors += (zstandard.ZstdError,)
+
+    def read(self, size: int = -1) -> bytes:
+        try:
+            return self._inner.read(size)
+        except self._errors as exc:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Corrupted or truncated {self._compression} data: {exc}",
+            ) from exc
+
+
+def _open_upload(stream: BinaryIO, safe_filename: str) -> tuple[_LineReader, _LineReader | _CountingReader]:
+    """Открывает загрузку как поток строк.
+
+    Возвращает (строки, счётчик байт исходного файла). Для сжатых файлов второй
+    объект считает сжатые байты, а _LineReader — распакованные.
+    """
+    _, compression = _split_compression(safe_filename)
+    if compression is None:
+        lines = _LineReader(stream, max_bytes=MAX_UPLOAD_BYTES)
+        return lines, lines
+
+    raw = _CountingReader(stream, max_bytes=MAX_UPLOAD_BYTES)
+    lines = _LineReader(
+        _DecompressingReader(raw, compression),
+        max_bytes=MAX_UNCOMPRESSED_BYTES,
+        limit_name="Decompressed data",
+    )
+    return lines, raw
 
 
 # ---------------------------------------------------------------------------
 # Парсеры форматов файлов
 # ---------------------------------------------------------------------------
 
-def _parse_csv(text: str) -> csv.DictReader:
-    reader = csv.DictReader(io.StringIO(text), delimiter=",")
+def _csv_rows(reader: csv.DictReader) -> Iterator[tuple[int, dict[str, Any]]]:
+    # line_num — номер физической строки, на которой закончилась запись
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _parse_csv(lines: Iterable[str]) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Проверяет header и отдаёт пары (номер строки в файле, словарь полей)."""
+    reader = csv.DictReader(lines, delimiter=",")
     actual_header = list(reader.fieldnames or [])
     if actual_header != CSV_HEADER:
         raise HTTPException(
             status_code=400,
             detail="CSV header must be exactly: " + ",".join(CSV_HEADER),
         )
-    return reader
+    return _csv_rows(reader)
 
 
-def _parse_jsonl(text: str) -> list[dict[str, Any]]:
+def _parse_jsonl(lines: Iterable[str], *, first_line: int = 1) -> Iterator[tuple[int, dict[str, Any]]]:
     """Парсит JSONL: 1 JSON-объект на строку, пустые строки игнорируются.
-    Возвращает список словарей; строки с ошибкой разбора помечены флагом _parse_error.
+    Отдаёт пары (номер строки, словарь); строки с ошибкой разбора помечены флагом _parse_error.
     """
-    rows: list[dict[str, Any]] = []
-    for line_num, line in enumerate(text.splitlines(), start=1):
+    for line_num, line in enumerate(lines, start=first_line):
         stripped = line.strip()
         if not stripped:
             continue
         try:
             obj = json.loads(stripped)
         except json.JSONDecodeError:
-            rows.append({"_parse_error": True, "_line": line_num})
+            yield line_num, {"_parse_error": True}
             continue
         if not isinstance(obj, dict):
-            rows.append({"_parse_error": True, "_line": line_num})
+            yield line_num, {"_parse_error": True}
             continue
-        rows.append(obj)
-    return rows
+        yield line_num, obj
+
+
+# ---------------------------------------------------------------------------
+# Пакетная запись
+# ---------------------------------------------------------------------------
+
+_DATAPOINT_COLUMNS = (
+    "experiment_id", "import_run_id", "ts_us", "tz_offset", "channel_id", "value", "unit_id", "quality", "tag_id",
+)
+
+# Колонка data_points -> справочник, в который она ссылается
+_DIMENSIONS: dict[str, Table] = {
+    "channel_id": Channel.__table__,
+    "unit_id": Unit.__table__,
+    "tag_id": Tag.__table__,
+}
+
+
+def _insert_missing(table: Table, dialect: Dialect):
+    """INSERT, пропускающий уже существующие имена (параллельные импорты создают одни и те же каналы)."""
+    if dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing(index_elements=["name"])
+
+
+class _DimensionIds:
+    """Ключи справочников (channels, units, tags) по именам, с кэшем на время импорта.
+
+    Новые имена добавляются в справочник в той же транзакции, что и точки.
+    """
+
+    def __init__(self, db: Session) -> None:
+        self._db = db
+        self._ids: dict[str, dict[str, int]] = {table.name: {} for table in _DIMENSIONS.values()}
+
+    def encode(self, table: Table, names: Sequence[str | None]) -> Iterable[int | None]:
+        ids = self._ids[table.name]
+        missing = set(names) - ids.keys()
+        missing.discard(None)
+        if missing:
+            self._load(table, ids, missing)
+        return map(ids.get, names)
+
+    def _load(self, table: Table, ids: dict[str, int], names: set[str]) -> None:
+        conn = self._db.connection()
+        known = dict(conn.execute(select(table.c.name, table.c.id).where(table.c.name.in_(names))).all())
+        new = names - known.keys()
+        if new:
+            conn.execute(_insert_missing(table, conn.dialect), [{"name": name} for name in sorted(new)])
+            stmt = select(table.c.name, table.c.id).where(table.c.name.in_(new))
+            known.update(conn.execute(stmt).all())
+        ids.update(known)
+
+
+class _BatchWriter:
+    """Копит провалидированные строки простыми кортежами и пишет их пачками.
+
+    Запись идёт executemany драйвера — без ORM-объектов, identity map и
+    unit-of-work, поэтому память не растёт с числом строк. Имена каналов,
+    единиц и тегов заменяются ключами справочников перед записью.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        experiment_id: int,
+        run_id: int,
+        *,
+        batch_size: int | None = None,
+        on_flush: Callable[[], None] | None = None,
+    ) -> None:
+        self._db = db
+        self._experiment_id = experiment_id
+        self._run_id = run_id
+        self._batch_size = batch_size or IMPORT_BATCH_SIZE
+        self._on_flush = on_flush
+        self._stmt = insert(DataPoint.__table__)
+        self._dimensions = _DimensionIds(db)
+        self._sketches = channel_stats_service.RunSketches(experiment_id, run_id)
+        self._rows: list[tuple] = []
+        self._driver_sql: tuple[str, list[str], dict[str, Callable[[Any], Any]]] | None = None
+        self.written = 0
+
+    @property
+    def pending(self) -> int:
+        """Сколько строк накоплено и ещё не записано."""
+        return len(self._rows)
+
+    def add(
+        self,
+        ts_us: int,
+        tz_offset: int,
+        channel: str,
+        value: float,
+        unit: str | None,
+        quality: str | None,
+        tag: str | None,
+    ) -> None:
+        """ts_us — микросекунды UTC от эпохи, tz_offset — исходное смещение в минутах."""
+        self._rows.append((ts_us, tz_offset, channel, value, unit, quality, tag))
+        if len(self._rows) >= self._batch_size:
+            self.flush()
+
+    def extend(self, rows: Iterable[tuple]) -> None:
+        """Добавляет уже провалидированные строки (ts_us, tz_offset, channel, value, unit, quality, tag)."""
+        for row in rows:
+            self._rows.append(row)
+            if len(self._rows) >= self._batch_size:
+                self.flush()
+
+    def extend_columns(
+        self,
+        timestamps: Sequence[int],
+        offsets: Sequence[int],
+        channels: Sequence[str],
+        values: Sequence[float],
+        units: Sequence[str | None],
+        qualities: Sequence[str | None],
+        tags: Sequence[str | None],
+    ) -> None:
+        """Пишет уже провалидированные колонки одинаковой длины."""
+        self.flush()
+        self._write(timestamps, offsets, channels, values, units, qualities, tags)
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        self._write(*zip(*rows))
+
+    def _write(
+        self,
+        timestamps: Sequence[int],
+        offsets: Sequence[int],
+        channels: Sequence[str],
+        values: Sequence[float],
+        units: Sequence[str | None],
+        qualities: Sequence[str | None],
+        tags: Sequence[str | None],
+    ) -> None:
+        """Параметры собираются по колонкам и уходят прямо в executemany драйвера:
+        bind-обработчики типов применяются к колонке целиком, а построчная
+        сборка параметров SQLAlchemy не выполняется.
+        """
+        conn = self._db.connection()
+        sql, keys, processors = self._driver_insert(conn.dialect)
+
+        columns: dict[str, Iterable[Any]] = {
+            "experiment_id": repeat(self._experiment_id),
+            "import_run_id": repeat(self._run_id),
+            "ts_us": timestamps,
+            "tz_offset": offsets,
+            "channel_id": channels,
+            "value": values,
+            "unit_id": units,
+            "quality": qualities,
+            "tag_id": tags,
+        }
+        for key, table in _DIMENSIONS.items():
+            columns[key] = self._dimensions.encode(table, columns[key])
+        # Ключи каналов нужны ещё раз — для статистики каналов
+        columns["channel_id"] = channel_ids = list(columns["channel_id"])
+        for key, process in processors.items():
+            columns[key] = map(process, columns[key])
+        rows = zip(*(columns[key] for key in keys))
+        if not conn.dialect.positional:
+            rows = (dict(zip(keys, row)) for row in rows)
+
+        start = 0
+        while batch := list(islice(rows, self._batch_size)):
+            conn.exec_driver_sql(sql, batch)
+            # Статистика, агрегаты и версия данных пачки фиксируются тем же commit, что и её точки
+            end = start + len(batch)
+            channel_stats_service.add_points(
+                conn, self._experiment_id, channel_ids[start:end], timestamps[start:end], values[start:end]
+            )
+            self._sketches.add_points(conn, channel_ids[start:end], values[start:end])
+            rollup_service.add_points(
+                conn,
+                self._experiment_id,
+                channel_ids[start:end],
+                timestamps[start:end],
+                offsets[start:end],
+                values[start:end],
+            )
+            experiment_service.bump_data_version(conn, self._experiment_id)
+            start = end
+            self.written += len(batch)
+            if self._on_flush is not None:
+                self._on_flush()
+
+    def _driver_insert(self, dialect: Dialect) -> tuple[str, list[str], dict[str, Callable[[Any], Any]]]:
+        """SQL-строка INSERT для драйвера, порядок параметров и bind-обработчики колонок."""
+        if self._driver_sql is None:
+            compiled = self._stmt.compile(dialect=dialect, column_keys=list(_DATAPOINT_COLUMNS))
+            keys = list(compiled.positiontup) if dialect.positional else list(_DATAPOINT_COLUMNS)
+            processors = {}
+            for key in keys:
+                column_type = DataPoint.__table__.c[key].type
+                process = column_type.dialect_impl(dialect).bind_processor(dialect)
+                if process is not None:
+                    processors[key] = process
+            self._driver_sql = (compiled.string, keys, processors)
+        return self._driver_sql
 
 
 # ---------------------------------------------------------------------------
 # Общая обработка строк
 # ---------------------------------------------------------------------------
 
+@dataclass
+class ImportCounters:
+    inserted: int = 0
+    skipped: int = 0
+    errors: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.inserted + self.skipped + self.errors
+
+
 def _process_datapoint_rows(
-    rows: Iterable[Any],
+    rows: Iterable[tuple[int, Any]],
     safe_filename: str,
-    experiment_id: int,
-    run_id: int,
-    db: Session,
-) -> tuple[int, int, int]:
-    inserted = skipped = errors = 0
+    writer: _BatchWriter,
+    counters: ImportCounters | None = None,
+    report: Callable[[int, str], None] | None = None,
+) -> ImportCounters:
+    """Валидирует пары (номер строки, запись) и передаёт корректные строки в writer.
+
+    Счётчики обновляются по ходу обработки, поэтому их можно читать из колбэка
+    writer (например, для отображения прогресса фонового импорта). Ошибочные строки
+    передаются в report; по умолчанию они пишутся в лог.
+    """
+    counters = counters if counters is not None else ImportCounters()
+    if report is None:
+        def report(line_num: int, message: str) -> None:
+            logger.warning("Import %s, line %d: %s", safe_filename, line_num, message)
+
+    # Один парсер на файл: формат определяется один раз, повторы берутся из кэша
+    parse_ts = TimestampParser().parse_epoch_us
 
-    for line_num, row in enumerate(rows, start=2):
+    for line_num, row in rows:
         try:
             if not isinstance(row, dict):
-                logger.warning("Import %s, row %d: expected dict, got %s", safe_filename, line_num, type(row).__name__)
-                errors += 1
+                report(line_num, f"expected dict, got {type(row).__name__}")
+                counters.errors += 1
                 continue
 
             # Parse error marker from JSONL parser
             if row.get("_parse_error"):
-                logger.warning("Import %s, line %s: invalid JSON", safe_filename, row.get("_line", line_num))
-                errors += 1
+                report(line_num, "invalid JSON")
+                counters.errors += 1
                 continue
 
             # Required fields: timestamp, channel, value
@@ -108,14 +613,14 @@ def _process_datapoint_rows(
             raw_value = row.get("value")
 
             if not raw_ts or not channel:
-                skipped += 1
+                counters.skipped += 1
                 continue
 
             if raw_value is None or (isinstance(raw_value, str) and not raw_value.strip()):
-                skipped += 1
+                counters.skipped += 1
                 continue
 
-            timestamp = _parse_ts(raw_ts)
+            ts_us, tz_offset = parse_ts(raw_ts)
 
             # Parse value
             if isinstance(raw_value, (int, float)):
@@ -131,7 +636,7 @@ def _process_datapoint_rows(
             if raw_quality not in (None, ""):
                 quality_upper = str(raw_quality).strip().upper()
                 if quality_upper not in ALLOWED_QUALITY:
-                    skipped += 1
+                    counters.skipped += 1
                     continue
                 quality = quality_upper
             else:
@@ -140,70 +645,186 @@ def _process_datapoint_rows(
             raw_tag = row.get("tag")
             tag = str(raw_tag).strip() or None if raw_tag not in (None, "") else None
 
-            db.add(
-                DataPoint(
-                    experiment_id=experiment_id,
-                    import_run_id=run_id,
-                    timestamp=timestamp,
-                    channel=channel,
-                    value=value,
-                    unit=unit,
-                    quality=quality,
-                    tag=tag,
-                )
-            )
-            inserted += 1
+            writer.add(ts_us, tz_offset, channel, value, unit, quality, tag)
+            counters.inserted += 1
 
         except ValueError as exc:
-            logger.warning("Import %s, row %d: parse error: %s", safe_filename, line_num, exc)
-            errors += 1
+            report(line_num, f"parse error: {exc}")
+            counters.errors += 1
 
-    return inserted, skipped, errors
+    writer.flush()
+    return counters
 
 
 # ---------------------------------------------------------------------------
-# Публичный интерфейс
+# Общие шаги импорта (используются и синхронным, и фоновым режимом)
 # ---------------------------------------------------------------------------
 
-async def import_file(file: UploadFile, experiment_id: int, db: Session) -> dict[str, object]:
-    """Принимает .csv или .jsonl, валидирует и записывает DataPoints в БД."""
+def _check_engine(engine: str) -> str:
+    if engine not in IMPORT_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail="engine must be one of: " + ", ".join(IMPORT_ENGINES),
+        )
+    return engine
+
+
+def _check_upload(file: UploadFile) -> str:
+    """Проверяет имя и размер загрузки; возвращает безопасное имя файла."""
     if not file.filename:
         raise HTTPException(status_code=400, detail="Filename required")
 
     safe_filename = Path(file.filename).name
-    lower = safe_filename.lower()
-
-    if not (lower.endswith(".csv") or lower.endswith(".jsonl")):
-        raise HTTPException(status_code=400, detail="Only .csv and .jsonl files are supported")
-
-    content = await file.read()
+    base, compression = _split_compression(safe_filename)
 
-    if len(content) > MAX_UPLOAD_BYTES:
+    if not base.lower().endswith(DATA_SUFFIXES):
         raise HTTPException(
-            status_code=413,
-            detail=f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)",
+            status_code=400,
+            detail="Only .csv and .jsonl files are supported (optionally compressed: .gz, .bz2, .zst)",
         )
+    if compression == "zstd":
+        _zstandard()
+
+    # Размер известен заранее, если клиент его передал; иначе лимит проверяется при чтении
+    size = getattr(file, "size", None)
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise _too_large()
+
+    return safe_filename
+
 
-    text = content.decode("utf-8", errors="replace")
+def _open_rows(lines: Iterable[str], safe_filename: str) -> Iterable[Any]:
+    if _is_csv(safe_filename):
+        return _parse_csv(lines)
+    return _parse_jsonl(lines)
 
-    rows: Iterable[Any] = _parse_csv(text) if lower.endswith(".csv") else _parse_jsonl(text)
 
-    run = ImportRun(
+def _consume(
+    lines: Iterable[str],
+    safe_filename: str,
+    writer: _BatchWriter,
+    counters: ImportCounters | None = None,
+    *,
+    engine: str = ENGINE_ROWS,
+) -> ImportCounters:
+    """Разбирает строки файла выбранным движком и передаёт записи в writer.
+
+    Колоночный движок работает только с CSV; JSONL всегда разбирается построчно.
+    """
+    if engine == ENGINE_COLUMNAR and _is_csv(safe_filename):
+        from app.services import import_columnar
+
+        return import_columnar.process_csv(
+            import_columnar.open_csv(lines), safe_filename, writer, counters
+        )
+    return _process_datapoint_rows(_open_rows(lines, safe_filename), safe_filename, writer, counters)
+
+
+def _new_run(experiment_id: int, safe_filename: str, *, status: str, source: str = SOURCE_FILE) -> ImportRun:
+    return ImportRun(
         experiment_id=experiment_id,
         started_at=datetime.now().astimezone(),
         filename=safe_filename,
+        source=source,
+        status=status,
         inserted=0,
         skipped=0,
         errors=0,
     )
+
+
+def _apply_counters(run: ImportRun, counters: ImportCounters, bytes_processed: int) -> None:
+    run.inserted = counters.inserted
+    run.skipped = counters.skipped
+    run.errors = counters.errors
+    run.rows_processed = counters.processed
+    run.bytes_processed = bytes_processed
+
+
+def _record_sizes(run: ImportRun, lines: Any, raw: Any) -> None:
+    """Сохраняет объём исходного файла и данных после распаковки."""
+    run.compression = _split_compression(run.filename)[1]
+    run.uncompressed_bytes = lines.bytes_read
+    run.compressed_bytes = raw.bytes_read if run.compression else None
+
+
+def _finish_run(run: ImportRun, counters: ImportCounters, bytes_processed: int, duration: float) -> None:
+    _apply_counters(run, counters, bytes_processed)
+    run.status = RUN_DONE
+    run.finished_at = datetime.now().astimezone()
+    run.duration_seconds = round(duration, 3)
+    run.rows_per_sec = round(counters.inserted / duration, 1) if duration > 0 else None
+
+
+def run_to_dict(run: ImportRun) -> dict[str, object]:
+    return {
+        "id": run.id,
+        "experiment_id": run.experiment_id,
+        "status": run.status,
+        "started_at": run.started_at.isoformat(),
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "filename": run.filename,
+        "source": run.source,
+        "inserted": run.inserted,
+        "skipped": run.skipped,
+        "errors": run.errors,
+        "rows_processed": run.rows_processed,
+        "bytes_processed": run.bytes_processed,
+        "bytes_total": run.bytes_total,
+        "duration_seconds": run.duration_seconds,
+        "rows_per_sec": run.rows_per_sec,
+        "compression": run.compression,
+        "compressed_bytes": run.compressed_bytes,
+        "uncompressed_bytes": run.uncompressed_bytes,
+        "error_message": run.error_message,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Публичный интерфейс
+# ---------------------------------------------------------------------------
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_THREADS, thread_name_prefix="import-sync")
+        return _executor
+
+
+def _import_stream(
+    stream: BinaryIO,
+    safe_filename: str,
+    experiment_id: int,
+    db: Session,
+    engine: str = ENGINE_ROWS,
+) -> dict[str, object]:
+    """Синхронная часть импорта: разбор, запись и commit. Выполняется вне event loop."""
+    lines, raw = _open_upload(stream, safe_filename)
+
+    run = _new_run(experiment_id, safe_filename, status=RUN_RUNNING)
     db.add(run)
     db.flush()
 
-    inserted, skipped, errors = _process_datapoint_rows(rows, safe_filename, experiment_id, run.id, db)
-
-    run.inserted = inserted
-    run.skipped = skipped
-    run.errors = errors
+    writer = _BatchWriter(db, experiment_id, run.id)
+    started = time.perf_counter()
+    try:
+        counters = _consume(lines, safe_filename, writer, engine=engine)
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception:
+        # Ошибка записи посреди файла (executemany, upsert статистики) — как и ошибка commit
+        db.rollback()
+        logger.exception("Database error during import of '%s'", safe_filename)
+        raise HTTPException(status_code=500, detail="Database error during import")
+    _finish_run(run, counters, raw.bytes_read, time.perf_counter() - started)
+    _record_sizes(run, lines, raw)
+    run.bytes_total = raw.bytes_read
 
     try:
         db.commit()
@@ -213,19 +834,52 @@ async def import_file(file: UploadFile, experiment_id: int, db: Session) -> dict
         raise HTTPException(status_code=500, detail="Database error during import")
 
     logger.info(
-        "Import '%s' into experiment %d: inserted=%d skipped=%d errors=%d",
-        safe_filename, experiment_id, inserted, skipped, errors,
+        "Import '%s' into experiment %d: inserted=%d skipped=%d errors=%d (%.0f rows/s)",
+        safe_filename, experiment_id, counters.inserted, counters.skipped, counters.errors,
+        run.rows_per_sec or 0,
     )
 
     return {
         "import_run_id": run.id,
         "filename": run.filename,
-        "inserted": inserted,
-        "skipped": skipped,
-        "errors": errors,
+        "inserted": counters.inserted,
+        "skipped": counters.skipped,
+        "errors": counters.errors,
+        "duration_seconds": run.duration_seconds,
+        "rows_per_sec": run.rows_per_sec,
+        "compression": run.compression,
+        "compressed_bytes": run.compressed_bytes,
+        "uncompressed_bytes": run.uncompressed_bytes,
     }
 
 
+async def import_file(
+    file: UploadFile,
+    experiment_id: int,
+    db: Session,
+    *,
+    engine: str = ENGINE_ROWS,
+) -> dict[str, object]:
+    """Принимает .csv или .jsonl, валидирует и записывает DataPoints в БД.
+
+    Разбор и работа с БД синхронные, поэтому выполняются в ограниченном пуле потоков
+    (IMPORT_THREADS): пока идёт импорт, event loop продолжает обслуживать другие запросы.
+    """
+    safe_filename = _check_upload(file)
+    _check_engine(engine)
+
+    await file.seek(0)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), _import_stream, file.file, safe_filename, experiment_id, db, engine
+    )
+
+
+def get_import_run(db: Session, run_id: int) -> dict[str, object] | None:
+    run = db.get(ImportRun, run_id)
+    return run_to_dict(run) if run is not None else None
+
+
 def list_import_runs_for_experiment(
     db: Session,
     experiment_id: int,
@@ -239,15 +893,4 @@ def list_import_runs_for_experiment(
         .order_by(ImportRun.started_at.desc())
         .limit(limit)
     )
-    rows = db.scalars(stmt).all()
-    return [
-        {
-            "id": run.id,
-            "started_at": run.started_at.isoformat(),
-            "filename": run.filename,
-            "inserted": run.inserted,
-            "skipped": run.skipped,
-            "errors": run.errors,
-        }
-        for run in rows
-    ]
+    return [run_to_dict(run) for run in db.scalars(stmt).all()]
@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterable, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.models import ImportRun
+from app.services import experiment_service
+from app.services.import_service import (
+    RUN_FAILED,
+    RUN_RUNNING,
+    SOURCE_LIVE,
+    ImportCounters,
+    _apply_counters,
+    _BatchWriter,
+    _finish_run,
+    _LineReader,
+    _new_run,
+    _parse_jsonl,
+    _process_datapoint_rows,
+    run_to_dict,
+)
+
+logger = logging.getLogger(__name__)
+
+# Микропачка пишется в БД, когда набралось LIVE_BATCH_ROWS строк
+# или прошло LIVE_FLUSH_MS с предыдущей записи — что наступит раньше
+LIVE_BATCH_ROWS = int(os.getenv("LIVE_BATCH_ROWS", "5000"))
+LIVE_FLUSH_MS = int(os.getenv("LIVE_FLUSH_MS", "250"))
+
+# Сколько принятых, но ещё не разобранных байт держится в памяти на сессию.
+# Если writer не успевает, приём новых данных приостанавливается (backpressure).
+LIVE_BUFFER_BYTES = int(os.getenv("LIVE_BUFFER_BYTES", str(8 * 1024 * 1024)))
+
+# Максимум одновременных live-сессий (по потоку записи на сессию)
+LIVE_SESSIONS = int(os.getenv("LIVE_SESSIONS", "8"))
+
+# Имя ImportRun по умолчанию
+LIVE_DEFAULT_NAME = "live.ndjson"
+
+_executor: ThreadPoolExecutor | None = None
+_buffers: set[_LiveBuffer] = set()
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=LIVE_SESSIONS, thread_name_prefix="live-ingest")
+        return _executor
+
+
+# ---------------------------------------------------------------------------
+# Буфер между приёмом (event loop) и записью (поток сессии)
+# ---------------------------------------------------------------------------
+
+class _LiveBuffer:
+    """Очередь принятых блоков NDJSON, ограниченная по объёму.
+
+    Event loop кладёт блоки через ``put``, поток записи читает их как бинарный
+    поток (``read``) через ``_LineReader``. Пока поток ждёт данных, он вызывает
+    ``tick`` — так микропачка пишется по времени, даже если новых строк нет.
+    """
+
+    def __init__(self, *, max_bytes: int, tick: Callable[[], float | None] | None = None) -> None:
+        self._chunks: deque[bytes] = deque()
+        self._buffered = 0
+        self._max_bytes = max_bytes
+        self._eof = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self.tick = tick
+
+    def put(self, data: bytes, *, block: bool = True) -> bool:
+        """Добавляет блок. Если буфер полон: при block=False возвращает False, иначе ждёт.
+
+        После закрытия буфера (запись завершилась ошибкой) данные отбрасываются.
+        """
+        with self._cond:
+            while self._buffered >= self._max_bytes and not self._closed:
+                if not block:
+                    return False
+                self._cond.wait()
+            if not self._closed:
+                self._chunks.append(data)
+                self._buffered += len(data)
+                self._cond.notify_all()
+            return True
+
+    def finish(self) -> None:
+        """Конец входных данных: read вернёт b"" после последнего блока."""
+        with self._cond:
+            self._eof = True
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Прекращает приём: буфер очищается, ожидающие put освобождаются."""
+        with self._cond:
+            self._closed = self._eof = True
+            self._chunks.clear()
+            self._buffered = 0
+            self._cond.notify_all()
+
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            timeout = self.tick() if self.tick is not None else None
+            with self._cond:
+                if not self._chunks and not self._eof:
+                    self._cond.wait(timeout)
+                if self._chunks:
+                    data = self._chunks.popleft()
+                    self._buffered -= len(data)
+                    self._cond.notify_all()
+                    return data
+                if self._eof:
+                    return b""
+
+
+# ---------------------------------------------------------------------------
+# Поток записи сессии
+# ---------------------------------------------------------------------------
+
+def _run_session(session_factory: sessionmaker, run_id: int, buffer: _LiveBuffer) -> None:
+    """Разбирает поток NDJSON теми же правилами, что и импорт файла, и пишет микропачками.
+
+    Каждая микропачка фиксируется вместе со счётчиками ImportRun, поэтому
+    GET /imports/{id} и графики видят данные во время сессии.
+    """
+    interval = LIVE_FLUSH_MS / 1000
+    with session_factory() as db:
+        run = db.get(ImportRun, run_id)
+        experiment_id, name = run.experiment_id, run.filename
+        counters = ImportCounters()
+        lines = _LineReader(buffer)
+        committed = 0
+        last_commit = time.monotonic()
+
+        def checkpoint() -> None:
+            nonlocal committed, last_commit
+            _apply_counters(db.get(ImportRun, run_id), counters, lines.bytes_read)
+            db.commit()
+            committed, last_commit = counters.processed, time.monotonic()
+
+        writer = _BatchWriter(db, experiment_id, run_id, batch_size=LIVE_BATCH_ROWS, on_flush=checkpoint)
+
+        def tick() -> float | None:
+            # Вызывается между блоками, когда все строки предыдущего блока уже разобраны
+            if not writer.pending and counters.processed == committed:
+                return None
+            wait = last_commit + interval - time.monotonic()
+            if wait > 0:
+                return wait
+            if writer.pending:
+                writer.flush()
+            else:
+                checkpoint()
+            return None
+
+        buffer.tick = tick
+        started = time.perf_counter()
+        try:
+            _process_datapoint_rows(_parse_jsonl(lines), name, writer, counters)
+        except Exception:
+            # Уже зафиксированные микропачки остаются: их видели читатели во время сессии
+            logger.exception("Live ingest run %d failed", run_id)
+            buffer.close()
+            db.rollback()
+            run = db.get(ImportRun, run_id)
+            run.status = RUN_FAILED
+            run.error_message = "Database error during live ingest"
+            run.finished_at = datetime.now().astimezone()
+            db.commit()
+            return
+
+        run = db.get(ImportRun, run_id)
+        _finish_run(run, counters, lines.bytes_read, time.perf_counter() - started)
+        run.bytes_total = lines.bytes_read
+        db.commit()
+
+        logger.info(
+            "Live ingest '%s' into experiment %d: inserted=%d skipped=%d errors=%d",
+            name, experiment_id, counters.inserted, counters.skipped, counters.errors,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Сессия
+# ---------------------------------------------------------------------------
+
+def _release(buffer: _LiveBuffer) -> None:
+    with _lock:
+        _buffers.discard(buffer)
+
+
+def _create_live_run(db: Session, experiment_id: int, name: str) -> int:
+    run = _new_run(experiment_id, name, status=RUN_RUNNING, source=SOURCE_LIVE)
+    db.add(run)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return run.id
+
+
+def _load_run(db: Session, run_id: int) -> dict[str, object]:
+    # Запись обновлял поток сессии — в identity map запроса она устарела
+    db.expire_all()
+    return run_to_dict(db.get(ImportRun, run_id))
+
+
+class LiveIngestSession:
+    """Открытая live-сессия: принимает блоки NDJSON из event loop и передаёт их потоку записи."""
+
+    def __init__(self, run_id: int, buffer: _LiveBuffer, future: Future) -> None:
+        self.run_id = run_id
+        self._buffer = buffer
+        self._future = future
+
+    @property
+    def stopped(self) -> bool:
+        """Поток записи завершился раньше конца данных (ошибка БД)."""
+        return self._future.done()
+
+    async def feed(self, data: bytes) -> bool:
+        """Передаёт блок на запись; если буфер полон, ждёт, пока writer его разгрузит.
+
+        Пока feed ждёт, следующий блок не читается из сокета — клиент упирается
+        в TCP-окно (backpressure). Возвращает False, если запись уже остановлена.
+        """
+        if self.stopped:
+            return False
+        if not self._buffer.put(data, block=False):
+            await run_in_threadpool(self._buffer.put, data)
+        return not self.stopped
+
+    def finish(self) -> None:
+        """Сообщает о конце данных; поток запишет остаток и закроет ImportRun."""
+        self._buffer.finish()
+
+    async def close(self, db: Session) -> dict[str, object]:
+        self.finish()
+        await asyncio.wrap_future(self._future)
+        return await run_in_threadpool(_load_run, db, self.run_id)
+
+
+async def open_session(db: Session, experiment_id: int, *, name: str | None = None) -> LiveIngestSession:
+    """Создаёт ImportRun (source=live, status=running) и запускает поток записи сессии."""
+    buffer = _LiveBuffer(max_bytes=LIVE_BUFFER_BYTES)
+    with _lock:
+        if len(_buffers) >= LIVE_SESSIONS:
+            raise HTTPException(status_code=503, detail="Too many live ingest sessions")
+        _buffers.add(buffer)
+
+    try:
+        safe_name = Path(name).name if name else LIVE_DEFAULT_NAME
+        run_id = await run_in_threadpool(_create_live_run, db, experiment_id, safe_name or LIVE_DEFAULT_NAME)
+        # Поток сессии работает в собственной сессии БД на том же engine, что и запрос
+        session_factory = sessionmaker(bind=db.get_bind(), autoflush=False, autocommit=False, future=True)
+        future = _get_executor().submit(_run_session, session_factory, run_id, buffer)
+    except BaseException:
+        _release(buffer)
+        raise
+    future.add_done_callback(lambda _future: _release(buffer))
+    return LiveIngestSession(run_id, buffer, future)
+
+
+# ---------------------------------------------------------------------------
+# Публичный интерфейс
+# ---------------------------------------------------------------------------
+
+async def ingest_http(
+    chunks: AsyncIterable[bytes],
+    experiment_id: int,
+    db: Session,
+    *,
+    name: str | None = None,
+) -> dict[str, object]:
+    """Принимает тело запроса как поток NDJSON; ответ — итоговый ImportRun после конца потока.
+
+    Если клиент оборвал соединение, уже принятые строки всё равно дописываются.
+    """
+    session = await open_session(db, experiment_id, name=name)
+    try:
+        async for chunk in chunks:
+            if chunk and not await session.feed(chunk):
+                break
+    finally:
+        session.finish()
+    return await session.close(db)
+
+
+async def ingest_websocket(
+    websocket: WebSocket,
+    experiment_id: int,
+    db: Session,
+    *,
+    name: str | None = None,
+) -> None:
+    """WebSocket-сессия: каждый кадр (text или bytes) содержит одну или несколько строк NDJSON.
+
+    После подключения сервер отправляет {"import_run_id": ...}. Сессия завершается,
+    когда клиент закрывает соединение; итог — в GET /imports/{id}.
+    """
+    try:
+        await run_in_threadpool(experiment_service.get_experiment_or_404, db, experiment_id)
+        session = await open_session(db, experiment_id, name=name)
+    except HTTPException as exc:
+        # 1008 — policy violation (нет эксперимента), 1013 — try again later (нет мест)
+        await websocket.close(code=1013 if exc.status_code == 503 else 1008, reason=str(exc.detail))
+        return
+
+    try:
+        await websocket.accept()
+        await websocket.send_json({"import_run_id": session.run_id})
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("bytes") or (message.get("text") or "").encode("utf-8")
+            if not data:
+                continue
+            # Кадр содержит целые строки: последняя строка не склеивается со следующим кадром
+            if not data.endswith(b"\n"):
+                data += b"\n"
+            if not await session.feed(data):
+                await websocket.close(code=1011, reason="Live ingest stopped")
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.finish()
+    await session.close(db)
+
+
+def shutdown() -> None:
+    """Завершает открытые сессии (принятые строки дописываются) и ждёт потоки записи."""
+    global _executor
+    with _lock:
+        for buffer in _buffers:
+            buffer.finish()
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=False)
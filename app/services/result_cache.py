@@ -0,0 +1,107 @@
+"""Кэш ответов analytics (channels, summary, series) по версии данных эксперимента.
+
+Версия (``experiment_service.get_data_version_or_404``) меняется с каждой записанной
+пачкой точек и с удалением точек импорта; id удалённых экспериментов не переиспользуются,
+поэтому пара (id, версия) не повторяется. Ключ ответа — эндпоинт, эксперимент, версия и
+нормализованные параметры запроса; из ключа строится ETag. Клиент с совпадающим
+If-None-Match получает 304 без чтения точек, остальные — тело из LRU в памяти процесса
+(RESULT_CACHE_MAX_BYTES на все тела). Записи старых версий больше не запрашиваются и
+вытесняются первыми как давно не использованные.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.services.timestamps import to_epoch_us
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Тело больше этой доли бюджета не кэшируется: оно вытеснило бы почти всё остальное
+_MAX_ENTRY_FRACTION = 4
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    media_type: str
+
+
+class ResultCache:
+    """LRU тел ответов с бюджетом по суммарному размеру; потокобезопасен."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_bytes // _MAX_ENTRY_FRACTION:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.body)
+            self._entries[key] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+cache = ResultCache(RESULT_CACHE_MAX_BYTES)
+
+
+def _normalize(value: object) -> object:
+    # Моменты времени с разной записью пояса ('Z', '+00:00', '+05:00') дают один ключ
+    if isinstance(value, datetime):
+        return to_epoch_us(value)
+    return value
+
+
+def cache_key(endpoint: str, experiment_id: int, data_version: int, params: dict[str, object]) -> str:
+    """Ключ ответа. Порядок каналов сохраняется: от него зависит порядок в ответе."""
+    normalized = {name: _normalize(value) for name, value in sorted(params.items())}
+    raw = json.dumps([endpoint, experiment_id, data_version, normalized], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def etag(key: str) -> str:
+    return f'"{key[:32]}"'
+
+
+def not_modified(if_none_match: str | None, current: str) -> bool:
+    """Совпадает ли If-None-Match с ETag ответа (слабое сравнение, как требует RFC 9110 для GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return current in tags
@@ -0,0 +1,239 @@
+"""Пирамида агрегатов по времени (таблица channel_rollups).
+
+Для каждого разрешения из ROLLUP_RESOLUTIONS точки канала раскладываются
+по корзинам [bucket_us, bucket_us + разрешение) и хранятся count/min/max/sum,
+первое/последнее значение корзины и смещение пояса её первой точки. Импорт дописывает агрегаты каждой
+записанной пачки upsert-ом в той же транзакции, что и точки (``add_points``);
+корзины на границе пачек объединяются в БД.
+
+series с max_points читает корзины самого грубого разрешения, которых в
+запрошенном диапазоне ещё не меньше max_points (``pick_resolution``), вместо точек,
+если это разрешение построено для данных каналов (``is_built``).
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+from sqlalchemy import Insert, Table, and_, case, delete, func, select, tuple_
+from sqlalchemy.engine import Connection, Dialect
+from sqlalchemy.orm import Session
+
+from app.models import ChannelRollup, ChannelStats, DataPoint
+
+# Разрешения пирамиды в секундах. Секундных корзин по умолчанию нет: при частоте
+# около 1 Гц их столько же, сколько точек, и они только удваивают объём записи
+ROLLUP_RESOLUTIONS = tuple(
+    sorted(int(r) for r in os.getenv("ROLLUP_RESOLUTIONS", "60,3600,86400").split(",") if r.strip())
+)
+
+# Сколько точек читается за раз при пересчёте агрегатов по data_points
+ROLLUP_REBUILD_CHUNK = 100_000
+
+_ROLLUPS = ChannelRollup.__table__
+_COLUMNS = (
+    "channel_id", "bucket_us", "count", "min", "max", "sum",
+    "first_ts", "first_value", "first_offset", "last_ts", "last_value",
+)
+
+
+def _aggregate(
+    channel_ids: Sequence[int],
+    timestamps: Sequence[int],
+    offsets: Sequence[int],
+    values: Sequence[float],
+    resolutions: Iterable[int],
+) -> Iterable[tuple[int, dict[str, list]]]:
+    """Агрегаты пачки по (канал, корзина) для каждого разрешения — колонками.
+
+    Точки сортируются один раз по (канал, время): внутри канала номер корзины
+    не убывает, поэтому группы любого разрешения идут подряд.
+    """
+    count = len(channel_ids)
+    channels = np.fromiter(channel_ids, dtype=np.int64, count=count)
+    ts = np.fromiter(timestamps, dtype=np.int64, count=count)
+    order = np.lexsort((ts, channels))
+    channels, ts = channels[order], ts[order]
+    v = np.fromiter(values, dtype=np.float64, count=count)[order]
+    offset = np.fromiter(offsets, dtype=np.int64, count=count)[order]
+    new_channel = np.r_[True, channels[1:] != channels[:-1]]
+
+    for resolution in resolutions:
+        # Целочисленное деление numpy округляет вниз и для времени до 1970 года
+        bucket = ts // (resolution * 1_000_000) * (resolution * 1_000_000)
+        starts = np.flatnonzero(new_channel | np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], count]
+        yield resolution, {
+            "channel_id": channels[starts].tolist(),
+            "bucket_us": bucket[starts].tolist(),
+            "count": (ends - starts).tolist(),
+            "min": np.minimum.reduceat(v, starts).tolist(),
+            "max": np.maximum.reduceat(v, starts).tolist(),
+            "sum": np.add.reduceat(v, starts).tolist(),
+            "first_ts": ts[starts].tolist(),
+            "first_value": v[starts].tolist(),
+            "first_offset": offset[starts].tolist(),
+            "last_ts": ts[ends - 1].tolist(),
+            "last_value": v[ends - 1].tolist(),
+        }
+
+
+def _upsert(table: Table, dialect: Dialect) -> Insert:
+    """INSERT ... ON CONFLICT, объединяющий корзину пачки с уже записанной."""
+    if dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        least, greatest = func.min, func.max
+    elif dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        least, greatest = func.least, func.greatest
+    else:
+        raise RuntimeError(f"Rollups are not implemented for {dialect.name}")
+
+    stmt = dialect_insert(table)
+    new, old = stmt.excluded, table.c
+    # В SET все выражения видят значения строки до обновления
+    return stmt.on_conflict_do_update(
+        index_elements=["experiment_id", "channel_id", "resolution", "bucket_us"],
+        set_={
+            "count": old["count"] + new["count"],
+            "min": least(old["min"], new["min"]),
+            "max": greatest(old["max"], new["max"]),
+            "sum": old["sum"] + new["sum"],
+            "first_value": case((new.first_ts < old.first_ts, new.first_value), else_=old.first_value),
+            "first_offset": case((new.first_ts < old.first_ts, new.first_offset), else_=old.first_offset),
+            "first_ts": least(old.first_ts, new.first_ts),
+            "last_value": case((new.last_ts >= old.last_ts, new.last_value), else_=old.last_value),
+            "last_ts": greatest(old.last_ts, new.last_ts),
+        },
+    )
+
+
+def add_points(
+    conn: Connection,
+    experiment_id: int,
+    channel_ids: Sequence[int],
+    timestamps: Sequence[int],
+    offsets: Sequence[int],
+    values: Sequence[float],
+    *,
+    table: Table = _ROLLUPS,
+) -> None:
+    """Добавляет в пирамиду только что записанную пачку точек (в транзакции conn)."""
+    if not len(channel_ids) or not ROLLUP_RESOLUTIONS:
+        return
+    stmt = _upsert(table, conn.dialect)
+    for resolution, columns in _aggregate(channel_ids, timestamps, offsets, values, ROLLUP_RESOLUTIONS):
+        rows = [
+            {"experiment_id": experiment_id, "resolution": resolution, **dict(zip(_COLUMNS, row))}
+            for row in zip(*(columns[name] for name in _COLUMNS))
+        ]
+        conn.execute(stmt, rows)
+
+
+def rebuild(db: Session, experiment_id: int, channel_ids: Iterable[int]) -> None:
+    """Пересчитывает агрегаты каналов эксперимента по data_points (после удаления точек)."""
+    channel_ids = list(channel_ids)
+    if not channel_ids:
+        return
+    conn = db.connection()
+    conn.execute(
+        delete(_ROLLUPS).where(_ROLLUPS.c.experiment_id == experiment_id, _ROLLUPS.c.channel_id.in_(channel_ids))
+    )
+    stmt = select(DataPoint.channel_id, DataPoint.ts_us, DataPoint.tz_offset, DataPoint.value).where(
+        DataPoint.experiment_id == experiment_id, DataPoint.channel_id.in_(channel_ids)
+    )
+    # Куски обрабатываются независимо: корзины на их границе объединяет upsert
+    for chunk in conn.execution_options(yield_per=ROLLUP_REBUILD_CHUNK).execute(stmt).partitions():
+        channels, timestamps, offsets, values = zip(*chunk)
+        add_points(conn, experiment_id, channels, timestamps, offsets, values)
+
+
+# ---------------------------------------------------------------------------
+# Чтение
+# ---------------------------------------------------------------------------
+
+def pick_resolution(span_us: int, max_points: int, points: int) -> int | None:
+    """Самое грубое разрешение, корзин которого на span_us хватает на max_points точек.
+
+    points — оценка числа точек канала в диапазоне: если корзин выходит не меньше,
+    чем точек, агрегаты ничего не экономят. None — ряд строится по точкам.
+    """
+    for resolution in sorted(ROLLUP_RESOLUTIONS, reverse=True):
+        buckets = span_us // (resolution * 1_000_000)
+        if buckets >= max_points:
+            return resolution if buckets < points else None
+    return None
+
+
+def is_built(db: Session, experiment_id: int, channel_ids: Iterable[int], resolution: int) -> bool:
+    """Есть ли у каналов корзины разрешения на обоих концах их точек (по channel_stats).
+
+    Разрешение, добавленное в ROLLUP_RESOLUTIONS после импорта, для уже загруженных
+    точек не построено — такие запросы читают точки.
+    """
+    resolution_us = resolution * 1_000_000
+    stats = select(ChannelStats.channel_id, ChannelStats.first_ts, ChannelStats.last_ts).where(
+        ChannelStats.experiment_id == experiment_id, ChannelStats.channel_id.in_(list(channel_ids))
+    )
+    keys = {
+        (channel_id, ts // resolution_us * resolution_us)
+        for channel_id, first_ts, last_ts in db.execute(stats)
+        for ts in (first_ts, last_ts)
+    }
+    if not keys:
+        return False
+    r = _ROLLUPS.c
+    found = db.execute(
+        select(func.count()).where(
+            r.experiment_id == experiment_id,
+            r.resolution == resolution,
+            tuple_(r.channel_id, r.bucket_us).in_(keys),
+        )
+    ).scalar_one()
+    return found == len(keys)
+
+
+def get_buckets(
+    db: Session,
+    experiment_id: int,
+    channel_ids: Iterable[int],
+    resolution: int,
+    start_us: int | None,
+    end_us: int | None,
+) -> dict[int, dict[str, np.ndarray]]:
+    """Корзины каналов в диапазоне времени: {channel_id: {bucket_us, count, min, max, sum, first_offset}}.
+
+    Корзины на границах диапазона берутся целиком.
+    """
+    r = _ROLLUPS.c
+    conditions = [r.experiment_id == experiment_id, r.channel_id.in_(list(channel_ids)), r.resolution == resolution]
+    if start_us is not None:
+        conditions.append(r.bucket_us > start_us - resolution * 1_000_000)
+    if end_us is not None:
+        conditions.append(r.bucket_us <= end_us)
+    stmt = (
+        select(r.channel_id, r.bucket_us, r["count"], r["min"], r["max"], r["sum"], r.first_offset)
+        .where(and_(*conditions))
+        .order_by(r.channel_id, r.bucket_us)
+    )
+
+    rows = db.execute(stmt).all()
+    result: dict[int, dict[str, np.ndarray]] = {}
+    if not rows:
+        return result
+    channel, bucket, count, min_value, max_value, total, offset = (np.array(column) for column in zip(*rows))
+    starts = np.flatnonzero(np.r_[True, channel[1:] != channel[:-1]])
+    for lo, hi in zip(starts, np.r_[starts[1:], len(channel)]):
+        result[int(channel[lo])] = {
+            "bucket_us": bucket[lo:hi],
+            "count": count[lo:hi],
+            "min": min_value[lo:hi],
+            "max": max_value[lo:hi],
+            "sum": total[lo:hi],
+            "first_offset": offset[lo:hi],
+        }
+    return result
@@ -0,0 +1,76 @@
+"""Двоичный формат ответа series (MEDIA_TYPE), без разбора чисел на стороне клиента.
+
+Раскладка (little-endian):
+
+- 4 байта MAGIC, uint32 — длина заголовка;
+- заголовок — JSON в UTF-8: {"channels": [{"name", "count", ...}, ...]}, где кроме
+  имени и числа точек лежат остальные поля ответа по каналу (total, resolution);
+  дополняется пробелами до границы 8 байт;
+- по каждому каналу в порядке заголовка: int64[count] — время (мкс от эпохи, UTC),
+  затем float64[count] — значения.
+
+Все буферы выровнены на 8 байт: в браузере это BigInt64Array/Float64Array поверх
+ArrayBuffer, в Python — np.frombuffer без копирования (``decode``).
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+
+import numpy as np
+
+MEDIA_TYPE = "application/vnd.experiment-series"
+MAGIC = b"SER1"
+
+_PREFIX = struct.Struct("<4sI")
+_ALIGN = 8
+
+
+def accepts(accept: str | None) -> bool:
+    """Запрошен ли MEDIA_TYPE заголовком Accept (и не с q=0)."""
+    for item in (accept or "").split(","):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        if media_type.lower() != MEDIA_TYPE:
+            continue
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def encode(series: dict[str, dict]) -> bytes:
+    """{channel: {"t": int64 мкс, "v": float64, ...}} -> тело ответа."""
+    channels = []
+    buffers = []
+    for name, columns in series.items():
+        t = np.ascontiguousarray(columns["t"], dtype="<i8")
+        v = np.ascontiguousarray(columns["v"], dtype="<f8")
+        meta = {key: value for key, value in columns.items() if key not in ("t", "v")}
+        channels.append({"name": name, "count": len(t), **meta})
+        buffers += [t.data, v.data]
+
+    header = json.dumps({"channels": channels}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-(_PREFIX.size + len(header)) % _ALIGN)
+    return b"".join([_PREFIX.pack(MAGIC, len(header)), header, *buffers])
+
+
+def decode(body: bytes) -> dict[str, dict]:
+    """Тело ответа -> {channel: {"t": int64 мкс, "v": float64, ...}}; массивы — представления body."""
+    magic, header_size = _PREFIX.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("not a series binary body")
+    offset = _PREFIX.size + header_size
+    result = {}
+    for channel in json.loads(body[_PREFIX.size:offset])["channels"]:
+        name, count = channel.pop("name"), channel.pop("count")
+        t = np.frombuffer(body, dtype="<i8", count=count, offset=offset)
+        v = np.frombuffer(body, dtype="<f8", count=count, offset=offset + count * 8)
+        offset += count * 16
+        result[name] = {"t": t, "v": v, **channel}
+    return result
@@ -0,0 +1,125 @@
+"""Объединяемые сводки распределения значений канала.
+
+- ``Moments`` — count/mean/M2 (Welford, объединение по формуле Chan et al.):
+  дисперсия и стандартное отклонение без повторного чтения точек.
+- ``TDigest`` — t-digest (Dunning): квантили с малой ошибкой на хвостах
+  в объёме порядка ``SKETCH_COMPRESSION / 2`` центроидов.
+
+Обе сводки строятся по пачке значений и объединяются с уже накопленными,
+поэтому их можно вести по импортам и складывать во время запроса.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import struct
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+
+# Параметр сжатия t-digest: больше — точнее квантили и крупнее сводка (~ SKETCH_COMPRESSION / 2 центроидов)
+SKETCH_COMPRESSION = int(os.getenv("SKETCH_COMPRESSION", "200"))
+
+_HEADER = struct.Struct("<dd")  # min, max
+
+
+@dataclass
+class Moments:
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, values: np.ndarray) -> None:
+        if not len(values):
+            return
+        mean = float(values.mean())
+        self.merge(Moments(len(values), mean, float(((values - mean) ** 2).sum())))
+
+    def merge(self, other: Moments) -> None:
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def stddev(self) -> float | None:
+        """Выборочное стандартное отклонение (n - 1)."""
+        if self.count < 2:
+            return None
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+
+class TDigest:
+    """t-digest со слиянием пачками (merging digest, масштаб k1).
+
+    Центроиды хранятся массивами numpy. Новые значения добавляются к центроидам
+    как центроиды единичного веса, после чего всё сжимается одним векторным проходом.
+    """
+
+    def __init__(self, compression: int | None = None) -> None:
+        self.compression = compression or SKETCH_COMPRESSION
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> int:
+        return int(self.weights.sum())
+
+    def add(self, values: np.ndarray) -> None:
+        if not len(values):
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, others: Iterable[TDigest]) -> None:
+        means, weights = [self.means], [self.weights]
+        for other in others:
+            means.append(other.means)
+            weights.append(other.weights)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self._compress(np.concatenate(means), np.concatenate(weights))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        if not len(means):
+            return
+        order = np.argsort(means)
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        q_left = (cumulative - weights) / cumulative[-1]
+        # Центроид занимает не больше единицы шкалы k1(q) = δ/2π · asin(2q − 1):
+        # у краёв распределения центроиды мелкие, в середине — крупные
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q_left - 1)
+        cluster = np.floor(k)
+        starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float) -> float | None:
+        if not len(self.weights):
+            return None
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        # Между центрами центроидов — линейная интерполяция, на краях — точные min и max
+        x = np.r_[0.0, centers, total]
+        y = np.r_[self.min, self.means, self.max]
+        return float(np.interp(q * total, x, y))
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(self.min, self.max) + np.stack([self.means, self.weights]).astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, compression: int | None = None) -> TDigest:
+        digest = cls(compression)
+        digest.min, digest.max = _HEADER.unpack_from(data)
+        centroids = np.frombuffer(data, dtype="<f8", offset=_HEADER.size).reshape(2, -1)
+        digest.means, digest.weights = centroids[0].copy(), centroids[1].copy()
+        return digest
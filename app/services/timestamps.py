@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import os
+from datetime import UTC, datetime, timedelta, timezone
+
+# Сколько разобранных строк timestamp хранит один парсер (на файл)
+TIMESTAMP_MEMO_SIZE = int(os.getenv("TIMESTAMP_MEMO_SIZE", "65536"))
+
+# Если промахов больше этой доли, кэш строк отключается: повторов нет, вставки только тратят время
+MEMO_MAX_MISS_RATIO = 0.75
+_PROBE_SIZE = 1024
+
+# Форматы, которые распознаются по первому значению файла
+FORMAT_OFFSET = "iso-offset"  # 2026-02-28T21:06:00+05:00
+FORMAT_UTC = "iso-utc"  # 2026-02-28T21:06:00Z
+FORMAT_NAIVE = "iso-naive"  # 2026-02-28T21:06:00 — считается UTC
+FORMAT_GENERIC = "iso"  # прочие формы ISO 8601 (дробные секунды, только дата, ...)
+
+_FORMAT_LENGTHS = {FORMAT_OFFSET: 25, FORMAT_UTC: 20, FORMAT_NAIVE: 19}
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=UTC)
+_ONE_SECOND = timedelta(seconds=1)
+_ONE_MINUTE = timedelta(minutes=1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Секунды "00".."59" — поиск в словаре заодно проверяет, что это две цифры
+_SECONDS = {f"{i:02d}": i for i in range(60)}
+
+
+# Фиксированные пояса по смещению в минутах: объект timezone создаётся один раз
+_TIMEZONES: dict[int, timezone] = {0: UTC}
+_LOCAL_EPOCHS: dict[int, tuple[datetime, str]] = {}
+
+
+def to_epoch_us(dt: datetime) -> int:
+    """datetime -> микросекунды UTC от эпохи (формат хранения data_points.ts_us).
+    Значения без смещения считаются UTC."""
+    if dt.tzinfo is None:
+        return (dt - _EPOCH) // _ONE_MICROSECOND
+    return (dt - _EPOCH_UTC) // _ONE_MICROSECOND
+
+
+def from_epoch_us(epoch_us: int, offset_minutes: int = 0) -> datetime:
+    """Микросекунды UTC (+ исходное смещение в минутах) -> aware datetime в исходном поясе."""
+    tz = _TIMEZONES.get(offset_minutes)
+    if tz is None:
+        tz = _TIMEZONES.setdefault(offset_minutes, timezone(offset_minutes * _ONE_MINUTE))
+    return (_EPOCH_UTC + epoch_us * _ONE_MICROSECOND).astimezone(tz)
+
+
+def format_epoch_us(epoch_us: int, offset_minutes: int = 0) -> str:
+    """То же, что ``from_epoch_us(...).isoformat()``, примерно вдвое быстрее.
+
+    Локальное время считается от эпохи, сдвинутой на смещение, без tzinfo:
+    isoformat наивного datetime заметно дешевле, а суффикс пояса готовится один раз.
+    """
+    local = _LOCAL_EPOCHS.get(offset_minutes)
+    if local is None:
+        tz = timezone(offset_minutes * _ONE_MINUTE)
+        local = _LOCAL_EPOCHS.setdefault(
+            offset_minutes, (_EPOCH + offset_minutes * _ONE_MINUTE, datetime(2000, 1, 1, tzinfo=tz).isoformat()[19:])
+        )
+    epoch, suffix = local
+    return (epoch + epoch_us * _ONE_MICROSECOND).isoformat() + suffix
+
+
+def parse_timestamp(raw: str) -> datetime:
+    """Парсит ISO 8601 timestamp; поднимает ValueError при ошибке.
+    Значения без смещения считаются UTC."""
+    try:
+        dt = datetime.fromisoformat(raw)
+    except ValueError as exc:
+        raise ValueError(f"Cannot parse timestamp: {raw!r}") from exc
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return dt
+
+
+def detect_format(raw: str) -> str:
+    """Определяет формат по одному значению (предполагается, что оно корректно)."""
+    if len(raw) >= 19 and raw[10] in "T " and raw[13] == ":" and raw[16] == ":":
+        suffix = raw[19:]
+        if not suffix:
+            return FORMAT_NAIVE
+        if suffix == "Z":
+            return FORMAT_UTC
+        if len(suffix) == 6 and suffix[0] in "+-" and suffix[3] == ":":
+            return FORMAT_OFFSET
+    return FORMAT_GENERIC
+
+
+class TimestampParser:
+    """Разбор timestamp в пределах одного файла.
+
+    Формат определяется по первому корректному значению. Повторяющиеся строки
+    (одна метка времени для нескольких каналов) берутся из ограниченного кэша.
+    Смещения часовых поясов разбираются один раз на суффикс.
+
+    ``parse`` возвращает aware datetime, как ``parse_timestamp``. ``parse_epoch_us``
+    возвращает (микросекунды UTC от эпохи, смещение в минутах) без промежуточных
+    datetime: для файлов фиксированного формата время считается из кэша начала
+    минуты и двух цифр секунд.
+
+    Кэш состоит из двух поколений обычных dict: заполненное текущее поколение
+    становится предыдущим, а старое отбрасывается целиком — вытеснение O(1) и без
+    учёта порядка на каждом попадании. Timestamps файла обычно идут по возрастанию,
+    поэтому недавние значения остаются в кэше. Если метки почти не повторяются
+    (доля промахов выше MEMO_MAX_MISS_RATIO), кэш отключается до конца файла.
+    """
+
+    def __init__(self, *, memo_size: int | None = None) -> None:
+        self.format: str | None = None
+        self._generation_size = max((memo_size or TIMESTAMP_MEMO_SIZE) // 2, 1)
+        # Первое поколение маленькое: по нему быстро видно, повторяются ли метки
+        self._generation = min(_PROBE_SIZE, self._generation_size)
+        self._memo: dict[str, object] = {}
+        self._memo_previous: dict[str, object] = {}
+        self._memo_enabled = True
+        self._hits = 0
+        self._misses = 0
+        self._minutes: dict[str, int] = {}
+        self._offsets: dict[str, int] = {}
+
+    def parse(self, raw: str) -> datetime:
+        dt = self._memo.get(raw)
+        if dt is not None:
+            self._hits += 1
+            return dt
+        if not self._memo_enabled:
+            return self._parse_new(raw)
+        dt = self._memo_previous.get(raw)
+        if dt is None:
+            dt = self._parse_new(raw)
+            self._misses += 1
+        self._store(raw, dt)
+        return dt
+
+    def parse_epoch_us(self, raw: str) -> tuple[int, int]:
+        result = self._memo.get(raw)
+        if result is not None:
+            self._hits += 1
+            return result
+        if not self._memo_enabled:
+            return self._epoch_new(raw)
+        result = self._memo_previous.get(raw)
+        if result is None:
+            result = self._epoch_new(raw)
+            self._misses += 1
+        self._store(raw, result)
+        return result
+
+    # Экземпляром пользуются либо через parse, либо через parse_epoch_us:
+    # кэш общий и хранит результат того метода, которым разбирается файл.
+
+    def _store(self, raw: str, value: object) -> None:
+        self._memo[raw] = value
+        if len(self._memo) < self._generation:
+            return
+        if self._misses > (self._hits + self._misses) * MEMO_MAX_MISS_RATIO:
+            self._memo_enabled = False
+            self._memo, self._memo_previous = {}, {}
+        else:
+            self._memo_previous, self._memo = self._memo, {}
+            self._generation = self._generation_size
+        self._hits = self._misses = 0
+
+    def _parse_new(self, raw: str) -> datetime:
+        if self.format == FORMAT_NAIVE and len(raw) == 19:
+            # Суффикс дешевле, чем datetime.replace(tzinfo=...)
+            try:
+                return datetime.fromisoformat(raw + "+00:00")
+            except ValueError:
+                return parse_timestamp(raw)
+        dt = parse_timestamp(raw)
+        if self.format is None:
+            self.format = detect_format(raw)
+        return dt
+
+    def _epoch_new(self, raw: str) -> tuple[int, int]:
+        if self.format in _FORMAT_LENGTHS:
+            result = self._fixed_epoch(raw)
+            if result is not None:
+                return result
+        dt = self._parse_new(raw)
+        return (dt - _EPOCH_UTC) // _ONE_MICROSECOND, dt.utcoffset() // _ONE_MINUTE
+
+    def _fixed_epoch(self, raw: str) -> tuple[int, int] | None:
+        """Быстрый путь для формата файла; None — строка не в этом формате."""
+        if len(raw) != _FORMAT_LENGTHS[self.format] or raw[16] != ":":
+            return None
+        second = _SECONDS.get(raw[17:19])
+        offset = self._offsets.get(raw[19:])
+        if offset is None:
+            offset = self._offset_minutes(raw[19:])
+        if second is None or offset is None:
+            return None
+
+        prefix = raw[:16]
+        minute = self._minutes.get(prefix)
+        if minute is None:
+            try:
+                minute = (datetime.fromisoformat(prefix) - _EPOCH) // _ONE_SECOND
+            except ValueError:
+                return None
+            if len(self._minutes) >= self._generation_size:
+                self._minutes.clear()
+            self._minutes[prefix] = minute
+
+        return (minute + second - offset * 60) * 1_000_000, offset
+
+    def _offset_minutes(self, suffix: str) -> int | None:
+        # Только суффиксы форматов с фиксированной длиной: та же длина бывает у дробных секунд
+        # с коротким смещением ('.12+05'), и такую строку нужно разбирать целиком
+        if suffix not in ("", "Z") and not (len(suffix) == 6 and suffix[0] in "+-" and suffix[3] == ":"):
+            return None
+        try:
+            dt = datetime.fromisoformat("2000-01-01T00:00:00" + suffix)
+        except ValueError:
+            return None
+        offset = dt.utcoffset() // _ONE_MINUTE if dt.tzinfo is not None else 0
+        self._offsets[suffix] = offset
+        return offset
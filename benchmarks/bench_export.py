@@ -0,0 +1,84 @@
+"""Выгрузка эксперимента целиком: время, пик памяти Python и размер по форматам.
+
+Импортирует сгенерированный CSV тем же _BatchWriter, что и приложение, и выгружает все
+точки: CSV строкой целиком (export_csv) и по частям, как отдаёт StreamingResponse
+(iter_export), во всех форматах GET export. Parquet и Arrow — только если установлен
+pyarrow. Строки wide — широкая выгрузка (layout=wide) в CSV. Пик памяти — tracemalloc,
+отдельным прогоном.
+
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export --rows 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import logging
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models import Base
+from app.services import export_service
+from app.services.import_service import ENGINE_COLUMNAR
+from benchmarks.bench_import import generate_csv, run_engine
+from benchmarks.bench_series_stream import _measure
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        generate_csv(csv_path, args.rows)
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        Base.metadata.create_all(bind=engine)
+
+        with Session(engine) as db:
+            _, counters = run_engine(csv_path, ENGINE_COLUMNAR, db)
+
+            def whole() -> int:
+                return len(export_service.export_csv(db, 1, None, None, None, None))
+
+            def stream(export_format: str, **options) -> Callable[[], int]:
+                def run() -> int:
+                    chunks = export_service.iter_export(
+                        db, 1, None, None, None, None, export_format=export_format, **options
+                    )
+                    return sum(len(chunk) for chunk in chunks)
+
+                return run
+
+            variants = [("csv, whole", whole)]
+            for export_format in export_service.EXPORT_FORMATS:
+                if export_format in ("parquet", "arrow") and importlib.util.find_spec("pyarrow") is None:
+                    continue
+                variants.append((export_format, stream(export_format)))
+            # Широкая выгрузка: слияние 16 потоков каналов по времени
+            variants += [
+                ("wide", stream("csv", layout="wide")),
+                ("wide ffill", stream("csv", layout="wide", fill="ffill")),
+                ("wide 1m", stream("csv", layout="wide", interval="1m")),
+            ]
+
+            print(f"{counters.inserted:,} points")
+            print(f"{'format':>10} {'time s':>8} {'rows/s':>10} {'peak MB':>8} {'body MB':>8}")
+            for name, fn in variants:
+                elapsed, peak, size = _measure(fn)
+                print(
+                    f"{name:>10} {elapsed:8.2f} {counters.inserted / elapsed:10,.0f} {peak:8.1f} "
+                    f"{size / 1024 / 1024:8.1f}"
+                )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
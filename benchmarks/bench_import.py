@@ -0,0 +1,134 @@
+"""Сравнение движков импорта CSV: построчного (rows) и колоночного (columnar).
+
+Генерирует CSV нужного размера и замеряет разбор+валидацию каждым движком.
+По умолчанию строки никуда не пишутся, чтобы измерять только парсер;
+с --db строки пишутся в SQLite тем же _BatchWriter, что и в приложении.
+
+    python -m benchmarks.bench_import                 # 10M строк
+    python -m benchmarks.bench_import --rows 1000000 --db
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models import Base, Experiment, ImportRun
+from app.services import import_service
+from app.services.import_service import (
+    ENGINE_COLUMNAR,
+    ENGINE_ROWS,
+    ImportCounters,
+    _BatchWriter,
+    _consume,
+    _LineReader,
+)
+
+
+class _NullWriter:
+    def __init__(self) -> None:
+        self.written = 0
+
+    def add(self, *row) -> None:
+        self.written += 1
+
+    def extend(self, rows) -> None:
+        for _ in rows:
+            self.written += 1
+
+    def extend_columns(self, timestamps, *columns) -> None:
+        self.written += len(timestamps)
+
+    def flush(self) -> None:
+        pass
+
+
+def generate_csv(path: Path, rows: int, *, bad_ratio: float = 0.001, seed: int = 42) -> None:
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1, 0, 0, 0)
+    channels = [f"ch{i}" for i in range(16)]
+    qualities = ["OK", "OK", "OK", "WARN", ""]
+    with path.open("w", encoding="utf-8", newline="") as f:
+        f.write(",".join(import_service.CSV_HEADER) + "\n")
+        buf = []
+        for i in range(rows):
+            ts = (start + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%S")
+            value = f"{rnd.uniform(-100, 100):.4f}"
+            if rnd.random() < bad_ratio:
+                value = "n/a"
+            buf.append(f"{ts}+03:00,{rnd.choice(channels)},{value},V,{rnd.choice(qualities)},run1\n")
+            if len(buf) >= 100_000:
+                f.writelines(buf)
+                buf.clear()
+        f.writelines(buf)
+
+
+def run_engine(path: Path, engine: str, db: Session | None) -> tuple[float, ImportCounters]:
+    with path.open("rb") as stream:
+        lines = _LineReader(stream)
+        if db is None:
+            writer = _NullWriter()
+        else:
+            experiment = Experiment(name=f"bench-{engine}", created_at=datetime.now().astimezone())
+            db.add(experiment)
+            db.flush()
+            run = ImportRun(
+                experiment_id=experiment.id,
+                started_at=datetime.now().astimezone(),
+                filename=path.name,
+                inserted=0,
+                skipped=0,
+                errors=0,
+            )
+            db.add(run)
+            db.flush()
+            writer = _BatchWriter(db, experiment.id, run.id)
+        started = time.perf_counter()
+        counters = _consume(lines, path.name, writer, engine=engine)
+        elapsed = time.perf_counter() - started
+    if db is not None:
+        db.commit()
+    return elapsed, counters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--db", action="store_true", help="писать строки в SQLite")
+    parser.add_argument("--engines", default=f"{ENGINE_ROWS},{ENGINE_COLUMNAR}")
+    args = parser.parse_args()
+
+    # Ошибочные строки не должны засорять вывод бенчмарка
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        print(f"Generating {args.rows:,} rows ...", flush=True)
+        generate_csv(csv_path, args.rows)
+        print(f"File size: {import_service._format_size(csv_path.stat().st_size)}")
+
+        for engine_name in args.engines.split(","):
+            if args.db:
+                engine = create_engine(f"sqlite:///{Path(tmp) / engine_name}.db", future=True)
+                Base.metadata.create_all(bind=engine)
+                with Session(engine) as db:
+                    elapsed, counters = run_engine(csv_path, engine_name, db)
+                engine.dispose()
+            else:
+                elapsed, counters = run_engine(csv_path, engine_name, None)
+            print(
+                f"{engine_name:>9}: {elapsed:8.2f} s  {counters.processed / elapsed:12,.0f} rows/s  "
+                f"inserted={counters.inserted:,} skipped={counters.skipped:,} errors={counters.errors:,}"
+            )
+
+
+if __name__ == "__main__":
+    main()
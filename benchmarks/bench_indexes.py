@@ -0,0 +1,106 @@
+"""Набор индексов data_points: прежний (индекс на каждую колонку) против текущего.
+
+Для каждого набора создаёт SQLite-БД по моделям, заменяет индексы, импортирует
+сгенерированный CSV тем же _BatchWriter, что и приложение, и замеряет импорт,
+а затем запросы series, channels, summary и export (лучшее из трёх).
+
+    python -m benchmarks.bench_indexes
+    python -m benchmarks.bench_indexes --rows 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.models import Base, DataPoint
+from app.services import analytics_service, export_service
+from app.services.import_service import ENGINE_COLUMNAR
+from benchmarks.bench_import import generate_csv, run_engine
+
+# Индексы до пересмотра (миграция 4 их удаляет)
+LEGACY_INDEXES = {
+    "ix_data_points_experiment_id": "experiment_id",
+    "ix_data_points_import_run_id": "import_run_id",
+    "ix_data_points_ts_us": "ts_us",
+    "ix_data_points_channel_id": "channel_id",
+    "ix_data_points_quality": "quality",
+    "ix_data_points_tag_id": "tag_id",
+    "ix_dp_experiment_ts_channel": "experiment_id, ts_us, channel_id",
+}
+
+
+def _use_legacy_indexes(engine) -> None:
+    with engine.begin() as conn:
+        for index in DataPoint.__table__.indexes:
+            conn.execute(text(f"DROP INDEX {index.name}"))
+        for name, columns in LEGACY_INDEXES.items():
+            conn.execute(text(f"CREATE INDEX {name} ON data_points ({columns})"))
+
+
+def _best(fn: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    # generate_csv пишет по точке в секунду с 2024-01-01 (+03:00); series — средняя треть
+    first = datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=3)))
+    start = first + timedelta(seconds=args.rows // 3)
+    end = start + timedelta(seconds=args.rows // 3)
+    channels = ["ch1", "ch2", "ch3"]
+
+    print(f"{args.rows:,} rows")
+    print(
+        f"{'indexes':>8} {'import rows/s':>14} {'index MB':>9} {'series s':>9} {'channels s':>11} "
+        f"{'summary s':>10} {'export s':>9} {'export ch s':>12}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        generate_csv(csv_path, args.rows)
+
+        for layout in ("legacy", "current"):
+            engine = create_engine(f"sqlite:///{Path(tmp) / layout}.db", future=True)
+            Base.metadata.create_all(bind=engine)
+            if layout == "legacy":
+                _use_legacy_indexes(engine)
+
+            with Session(engine) as db:
+                elapsed, counters = run_engine(csv_path, ENGINE_COLUMNAR, db)
+                index_bytes = db.execute(text(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'data_points')"
+                )).scalar()
+                series = _best(lambda: analytics_service.get_series(db, 1, channels, start, end))
+                channel_stats = _best(lambda: analytics_service.get_channels(db, 1))
+                summary = _best(lambda: analytics_service.get_summary(db, 1))
+                export = _best(lambda: export_service.export_csv(db, 1, None, start, end, None))
+                export_channel = _best(lambda: export_service.export_csv(db, 1, channels[:1], start, end, None))
+            engine.dispose()
+
+            print(
+                f"{layout:>8} {counters.inserted / elapsed:14,.0f} {index_bytes / 1024 / 1024:9.1f} "
+                f"{series:9.3f} {channel_stats:11.3f} {summary:10.3f} {export:9.3f} {export_channel:12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Повторные запросы channels, summary и series: без кэша, из result_cache и 304.
+
+Импортирует сгенерированный CSV тем же _BatchWriter, что и приложение, и через
+TestClient замеряет лучшее время запроса, когда ответ считается заново (кэш очищен),
+когда тело берётся из кэша и когда клиент присылает If-None-Match и получает 304 —
+так опрашивает сервер открытая панель, пока данные не меняются.
+
+    python -m benchmarks.bench_result_cache
+    python -m benchmarks.bench_result_cache --rows 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+from collections.abc import Generator
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.dependencies import get_db
+from app.main import app
+from app.models import Base
+from app.services import result_cache
+from app.services.import_service import ENGINE_COLUMNAR
+from benchmarks.bench_import import generate_csv, run_engine
+from benchmarks.bench_indexes import _best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    requests = {
+        "channels": ("/experiments/1/channels", {}),
+        "channels exact": ("/experiments/1/channels", {"exact": True}),
+        "summary": ("/experiments/1/summary", {}),
+        "series 1000": ("/experiments/1/series", {"channels": ["ch0", "ch1"], "max_points": 1000}),
+        "series page": ("/experiments/1/series", {"channels": ["ch0"], "limit": 10_000}),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        generate_csv(csv_path, args.rows)
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            run_engine(csv_path, ENGINE_COLUMNAR, db)
+
+        def override_get_db() -> Generator[Session, None, None]:
+            with Session(engine) as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        client = TestClient(app)
+        print(f"{args.rows:,} rows, best of {args.repeat}")
+        print(f"{'request':>14} {'cold ms':>9} {'cached ms':>9} {'304 ms':>9} {'body KB':>9}")
+        for name, (url, params) in requests.items():
+
+            def cold() -> None:
+                result_cache.cache.clear()
+                client.get(url, params=params)
+
+            response = client.get(url, params=params)
+            revalidate = {"If-None-Match": response.headers["etag"]}
+            timings = (
+                _best(cold, args.repeat),
+                _best(lambda: client.get(url, params=params), args.repeat),
+                _best(lambda: client.get(url, params=params, headers=revalidate), args.repeat),
+            )
+            cold_ms, cached_ms, not_modified_ms = (seconds * 1000 for seconds in timings)
+            size = len(response.content) / 1024
+            print(f"{name:>14} {cold_ms:9.1f} {cached_ms:9.1f} {not_modified_ms:9.1f} {size:9.1f}")
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Пирамида агрегатов channel_rollups: цена при импорте и выигрыш для series.
+
+Импортирует сгенерированный CSV тем же _BatchWriter, что и приложение, без пирамиды
+и с несколькими наборами разрешений; для каждого варианта замеряет импорт, размер
+channel_rollups, series с max_points по всему диапазону и по его средней трети
+и aggregate по 5 минут (лучшее из трёх).
+
+    python -m benchmarks.bench_rollups
+    python -m benchmarks.bench_rollups --rows 5000000 --max-points 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.models import Base
+from app.services import aggregate_service, analytics_service, rollup_service
+from app.services.import_service import ENGINE_COLUMNAR
+from benchmarks.bench_import import generate_csv, run_engine
+from benchmarks.bench_indexes import _best
+
+VARIANTS = {"none": (), "1,60,3600": (1, 60, 3600), "60,3600,86400": (60, 3600, 86400)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--max-points", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    # generate_csv пишет по точке в секунду с 2024-01-01 (+03:00)
+    first = datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=3)))
+    start = first + timedelta(seconds=args.rows // 3)
+    end = start + timedelta(seconds=args.rows // 3)
+    channels = ["ch1", "ch2", "ch3"]
+
+    print(f"{args.rows:,} rows, max_points={args.max_points}")
+    print(
+        f"{'resolutions':>14} {'import rows/s':>14} {'rollups MB':>11} {'series all s':>13} "
+        f"{'series 1/3 s':>13} {'aggregate s':>12}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        generate_csv(csv_path, args.rows)
+
+        for name, resolutions in VARIANTS.items():
+            rollup_service.ROLLUP_RESOLUTIONS = resolutions
+            engine = create_engine(f"sqlite:///{Path(tmp) / name}.db", future=True)
+            Base.metadata.create_all(bind=engine)
+            with Session(engine) as db:
+                elapsed, counters = run_engine(csv_path, ENGINE_COLUMNAR, db)
+                rollup_bytes = db.execute(text(
+                    "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = 'channel_rollups' "
+                    "OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'channel_rollups')"
+                )).scalar()
+                series_all = _best(lambda: analytics_service.get_series(
+                    db, 1, channels, None, None, max_points=args.max_points
+                ))
+                series_third = _best(lambda: analytics_service.get_series(
+                    db, 1, channels, start, end, max_points=args.max_points
+                ))
+                aggregate = _best(lambda: aggregate_service.get_aggregate(
+                    db, 1, channels, "5m", "avg,min,max,count", None, None
+                ))
+            engine.dispose()
+
+            print(
+                f"{name:>14} {counters.inserted / elapsed:14,.0f} {rollup_bytes / 1024 / 1024:11.1f} "
+                f"{series_all:13.3f} {series_third:13.3f} {aggregate:12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
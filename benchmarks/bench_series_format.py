@@ -0,0 +1,71 @@
+"""Формат ответа series: точки-объекты, колонки JSON (с разностями времени и без), двоичный.
+
+Импортирует сгенерированный CSV тем же _BatchWriter, что и приложение, и для каждого
+формата замеряет полный ответ сервера — выборку и сериализацию (лучшее из трёх) —
+и размер тела. Строка "rows, jsonable" — прежний путь ответа через jsonable_encoder.
+
+    python -m benchmarks.bench_series_format
+    python -m benchmarks.bench_series_format --rows 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models import Base
+from app.responses import FastJSONResponse
+from app.services import analytics_service, series_binary
+from app.services.import_service import ENGINE_COLUMNAR
+from benchmarks.bench_import import generate_csv, run_engine
+from benchmarks.bench_indexes import _best
+
+VARIANTS = {
+    "rows, jsonable": ("rows", False, lambda series: JSONResponse(jsonable_encoder(series))),
+    "rows": ("rows", False, FastJSONResponse),
+    "columnar": ("columnar", False, FastJSONResponse),
+    "columnar, delta": ("columnar", True, FastJSONResponse),
+    "binary": ("binary", False, lambda series: Response(content=series_binary.encode(series))),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    channels = ["ch1", "ch2", "ch3"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        generate_csv(csv_path, args.rows)
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        Base.metadata.create_all(bind=engine)
+
+        with Session(engine) as db:
+            run_engine(csv_path, ENGINE_COLUMNAR, db)
+            points = sum(len(v) for v in analytics_service.get_series(db, 1, channels, None, None).values())
+            print(f"{args.rows:,} rows, {len(channels)} channels, {points:,} points")
+            print(f"{'format':>16} {'response s':>11} {'body MB':>8}")
+            for name, (series_format, delta, response_class) in VARIANTS.items():
+                def respond():
+                    series = analytics_service.get_series(
+                        db, 1, channels, None, None, series_format=series_format, delta=delta
+                    )
+                    return response_class(series).body
+
+                elapsed = _best(respond)
+                print(f"{name:>16} {elapsed:11.3f} {len(respond()) / 1024 / 1024:8.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
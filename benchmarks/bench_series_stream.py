@@ -0,0 +1,88 @@
+"""series целиком против потоковой выдачи (stream=true) и страниц по курсору.
+
+Импортирует сгенерированный CSV тем же _BatchWriter, что и приложение, и для всех
+каналов замеряет время и пик памяти Python (tracemalloc) на построение полного ответа,
+потоковую выдачу всего ряда и чтение всех страниц по limit точек.
+
+    python -m benchmarks.bench_series_stream
+    python -m benchmarks.bench_series_stream --rows 5000000 --limit 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models import Base
+from app.responses import FastJSONResponse
+from app.routers.analytics import _stream_series
+from app.services import analytics_service
+from app.services.import_service import ENGINE_COLUMNAR
+from benchmarks.bench_import import generate_csv, run_engine
+
+
+def _measure(fn: Callable[[], int]) -> tuple[float, float, int]:
+    # tracemalloc замедляет выделения в разы: время — отдельным прогоном без него
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    channels = [f"ch{i}" for i in range(16)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        generate_csv(csv_path, args.rows)
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        Base.metadata.create_all(bind=engine)
+
+        with Session(engine) as db:
+            run_engine(csv_path, ENGINE_COLUMNAR, db)
+
+            def full() -> int:
+                return len(FastJSONResponse(analytics_service.get_series(db, 1, channels, None, None)).body)
+
+            def stream() -> int:
+                reader = analytics_service.SeriesReader(db, 1, channels, None, None)
+                return sum(len(chunk) for chunk in _stream_series(reader, paged=False))
+
+            def pages() -> int:
+                size, cursor = 0, None
+                while True:
+                    reader = analytics_service.SeriesReader(
+                        db, 1, channels, None, None, cursor=cursor, limit=args.limit
+                    )
+                    size += len(FastJSONResponse(reader.page()).body)
+                    if (cursor := reader.next_cursor) is None:
+                        return size
+
+            print(f"{args.rows:,} rows, {len(channels)} channels, limit={args.limit:,}")
+            print(f"{'mode':>8} {'time s':>8} {'peak MB':>8} {'body MB':>8}")
+            for name, fn in (("full", full), ("stream", stream), ("pages", pages)):
+                elapsed, peak, size = _measure(fn)
+                print(f"{name:>8} {elapsed:8.2f} {peak:8.1f} {size / 1024 / 1024:8.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Хранение времени точки: DateTime (ISO-текст в SQLite) против целых микросекунд UTC.
+
+Создаёт две SQLite-БД с одинаковыми точками: в первой время хранится колонкой
+DateTime(timezone=True), как до перехода на ts_us, во второй — BigInteger ts_us
+и tz_offset, как сейчас. Печатает размер таблицы и индексов по времени (dbstat)
+и время типовых запросов: выборка ряда по диапазону времени с сериализацией в ISO
+и min/max времени по каналам.
+
+    python -m benchmarks.bench_storage
+    python -m benchmarks.bench_storage --rows 5000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    SmallInteger,
+    Table,
+    create_engine,
+    func,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection
+
+from app.services.timestamps import format_epoch_us, to_epoch_us
+
+CHANNELS = 50
+OFFSET = timezone(timedelta(hours=5))
+
+
+def _table(layout: str) -> Table:
+    md = MetaData()
+    if layout == "datetime":
+        time_columns = [Column("timestamp", DateTime(timezone=True), nullable=False, index=True)]
+        time_key = "timestamp"
+    else:
+        time_columns = [
+            Column("ts_us", BigInteger, nullable=False, index=True),
+            Column("tz_offset", SmallInteger, nullable=False),
+        ]
+        time_key = "ts_us"
+    return Table(
+        "data_points",
+        md,
+        Column("id", Integer, primary_key=True),
+        Column("experiment_id", Integer, nullable=False),
+        *time_columns,
+        Column("channel_id", Integer, nullable=False),
+        Column("value", Float, nullable=False),
+        Index("ix_dp_experiment_time_channel", "experiment_id", time_key, "channel_id"),
+    )
+
+
+def _rows(layout: str, count: int):
+    start = datetime(2026, 2, 28, 21, 0, 0, tzinfo=OFFSET)
+    for i in range(count):
+        ts = start + timedelta(seconds=i // CHANNELS)
+        if layout == "datetime":
+            yield {"experiment_id": 1, "timestamp": ts, "channel_id": i % CHANNELS, "value": i * 0.5}
+        else:
+            yield {
+                "experiment_id": 1, "ts_us": to_epoch_us(ts), "tz_offset": 300,
+                "channel_id": i % CHANNELS, "value": i * 0.5,
+            }
+
+
+def _fill(conn: Connection, table: Table, layout: str, count: int) -> None:
+    batch = []
+    for row in _rows(layout, count):
+        batch.append(row)
+        if len(batch) == 50_000:
+            conn.execute(insert(table), batch)
+            batch.clear()
+    if batch:
+        conn.execute(insert(table), batch)
+
+
+def _sizes(conn: Connection) -> dict[str, int]:
+    rows = conn.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all()
+    return dict(rows)
+
+
+def _best(fn: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _series(conn: Connection, table: Table, layout: str, count: int) -> Callable[[], object]:
+    # Три канала, средняя треть времени эксперимента
+    seconds = count // CHANNELS
+    start = datetime(2026, 2, 28, 21, 0, 0, tzinfo=OFFSET) + timedelta(seconds=seconds // 3)
+    end = start + timedelta(seconds=seconds // 3)
+    channels = [1, 2, 3]
+
+    if layout == "datetime":
+        stmt = (
+            select(table.c.channel_id, table.c.timestamp, table.c.value)
+            .where(table.c.experiment_id == 1, table.c.channel_id.in_(channels))
+            .where(table.c.timestamp >= start, table.c.timestamp <= end)
+            .order_by(table.c.channel_id, table.c.timestamp)
+        )
+        return lambda: [(r.timestamp.isoformat(), r.value) for r in conn.execute(stmt)]
+
+    stmt = (
+        select(table.c.channel_id, table.c.ts_us, table.c.tz_offset, table.c.value)
+        .where(table.c.experiment_id == 1, table.c.channel_id.in_(channels))
+        .where(table.c.ts_us >= to_epoch_us(start), table.c.ts_us <= to_epoch_us(end))
+        .order_by(table.c.channel_id, table.c.ts_us)
+    )
+    return lambda: [(format_epoch_us(r.ts_us, r.tz_offset), r.value) for r in conn.execute(stmt)]
+
+
+def _min_max(conn: Connection, table: Table, layout: str) -> Callable[[], object]:
+    column = table.c.timestamp if layout == "datetime" else table.c.ts_us
+    stmt = (
+        select(table.c.channel_id, func.min(column), func.max(column))
+        .where(table.c.experiment_id == 1)
+        .group_by(table.c.channel_id)
+    )
+    return lambda: conn.execute(stmt).all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.rows:,} rows, {CHANNELS} channels")
+    print(f"{'layout':>9} {'table MB':>9} {'ts index MB':>12} {'compound MB':>12} {'series s':>9} {'min/max s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout in ("datetime", "epoch"):
+            engine = create_engine(f"sqlite:///{Path(tmp) / layout}.db")
+            table = _table(layout)
+            with engine.begin() as conn:
+                table.metadata.create_all(conn)
+                _fill(conn, table, layout, args.rows)
+            with engine.connect() as conn:
+                sizes = _sizes(conn)
+                time_index = next(name for name in sizes if name.startswith("ix_data_points_"))
+                series = _best(_series(conn, table, layout, args.rows))
+                min_max = _best(_min_max(conn, table, layout))
+            engine.dispose()
+            mb = 1024 * 1024
+            print(
+                f"{layout:>9} {sizes['data_points'] / mb:9.1f} {sizes[time_index] / mb:12.1f} "
+                f"{sizes['ix_dp_experiment_time_channel'] / mb:12.1f} {series:9.3f} {min_max:10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Сравнение разбора timestamp: parse_timestamp (прежний _parse_ts) и TimestampParser.
+
+Строки генерируются как в логах стенда: одна метка времени на --channels каналов,
+смещение одно на файл. Для каждого формата печатается время на строку.
+
+    python -m benchmarks.bench_timestamps
+    python -m benchmarks.bench_timestamps --rows 2000000 --channels 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from app.services.timestamps import TimestampParser, parse_timestamp
+
+SUFFIXES = {"offset": "+05:00", "utc": "Z", "naive": ""}
+
+
+def generate(rows: int, channels: int, suffix: str) -> list[str]:
+    start = datetime(2026, 2, 28, 21, 0, 0)
+    return [
+        (start + timedelta(seconds=i // channels)).strftime("%Y-%m-%dT%H:%M:%S") + suffix
+        for i in range(rows)
+    ]
+
+
+def measure(values: list[str], parse: Callable[[str], object]) -> float:
+    started = time.perf_counter()
+    for raw in values:
+        parse(raw)
+    return (time.perf_counter() - started) / len(values) * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--channels", type=int, default=16, help="строк на одну метку времени")
+    args = parser.parse_args()
+
+    print(f"{args.rows:,} rows, {args.channels} channel(s) per timestamp, ns/row")
+    print(f"{'format':>8} {'parse_timestamp':>16} {'parse':>10} {'parse_epoch_us':>15}")
+    for name, suffix in SUFFIXES.items():
+        values = generate(args.rows, args.channels, suffix)
+        baseline = measure(values, parse_timestamp)
+        cached = measure(values, TimestampParser().parse)
+        epoch = measure(values, TimestampParser().parse_epoch_us)
+        print(f"{name:>8} {baseline:16.0f} {cached:10.0f} {epoch:15.0f}")
+
+
+if __name__ == "__main__":
+    main()
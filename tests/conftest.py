@@ -1,16 +1,19 @@
 from __future__ import annotations
 
 from collections.abc import Generator
+from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from app.db import enable_sqlite_foreign_keys, enable_sqlite_wal
 from app.dependencies import get_db
 from app.main import app
 from app.models import Base
+from app.services import export_job_service, import_job_service, result_cache
 
 
 @pytest.fixture()
@@ -52,6 +55,7 @@ def db_session() -> Generator[Session, None, None]:
         poolclass=StaticPool,
         future=True,
     )
+    event.listen(engine, "connect", enable_sqlite_foreign_keys)
     testing_session_local = sessionmaker(
         bind=engine,
         autoflush=False,
@@ -68,7 +72,12 @@ def db_session() -> Generator[Session, None, None]:
 
 
 @pytest.fixture()
-def client(db_session: Session) -> Generator[TestClient, None, None]:
+def client(
+    db_session: Session, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Generator[TestClient, None, None]:
+    monkeypatch.setattr(import_job_service, "IMPORT_SPOOL_DIR", tmp_path / "spool")
+    monkeypatch.setattr(export_job_service, "EXPORT_SPOOL_DIR", tmp_path / "exports")
+
     def override_get_db() -> Generator[Session, None, None]:
         try:
             yield db_session
@@ -76,6 +85,7 @@ def client(db_session: Session) -> Generator[TestClient, None, None]:
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    result_cache.cache.clear()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -90,3 +100,36 @@ def experiment_id(client: TestClient) -> int:
     )
     assert response.status_code == 201
     return response.json()["id"]
+
+
+@pytest.fixture()
+def file_client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[TestClient, None, None]:
+    """Клиент поверх SQLite-файла: каждая сессия получает своё соединение.
+
+    Нужен там, где запросы и фоновые воркеры работают с БД параллельно.
+    """
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={"check_same_thread": False},
+        future=True,
+    )
+    event.listen(engine, "connect", enable_sqlite_foreign_keys)
+    event.listen(engine, "connect", enable_sqlite_wal)
+    testing_session_local = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(import_job_service, "IMPORT_SPOOL_DIR", tmp_path / "spool")
+    monkeypatch.setattr(export_job_service, "EXPORT_SPOOL_DIR", tmp_path / "exports")
+
+    def override_get_db() -> Generator[Session, None, None]:
+        db = testing_session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    result_cache.cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+    engine.dispose()
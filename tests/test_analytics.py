@@ -1,6 +1,18 @@
 from __future__ import annotations
 
+import numpy as np
 import pytest
+from sqlalchemy import select
+
+from app import responses
+from app.models import ChannelRollup
+from app.services import (
+    analytics_service,
+    channel_stats_service,
+    import_service,
+    rollup_service,
+    series_binary,
+)
 
 
 def test_channels_empty_experiment(client, experiment_id):
@@ -34,6 +46,45 @@ def test_channels_returns_stats(client, experiment_id, sample_csv):
     assert temp_a["last_ts"] is not None
 
 
+def test_channel_stats_accumulate_across_imports(client, experiment_id, sample_csv, sample_jsonl, db_session):
+    """channel_stats, дополняемая каждой пачкой, совпадает с пересчётом по точкам."""
+    client.post(f"/experiments/{experiment_id}/import", files={"file": ("a.csv", sample_csv, "text/csv")})
+    client.post(f"/experiments/{experiment_id}/import", files={"file": ("b.jsonl", sample_jsonl, "text/plain")})
+    extra = "timestamp,channel,value,unit,quality,tag\n2026-02-28T20:00:00+05:00,TEMP_A,-7.5,,,\n"
+    client.post(f"/experiments/{experiment_id}/import", files={"file": ("c.csv", extra, "text/csv")})
+    incremental = client.get(f"/experiments/{experiment_id}/channels").json()
+
+    channel_stats_service.rebuild(db_session, experiment_id)
+    db_session.commit()
+    assert client.get(f"/experiments/{experiment_id}/channels").json() == incremental
+
+    temp_a = next(ch for ch in incremental if ch["channel"] == "TEMP_A")
+    assert temp_a["min"] == pytest.approx(-7.5)
+    assert temp_a["first_ts"] == "2026-02-28T15:00:00+00:00"
+
+
+def test_channel_distribution_sketch_and_exact(client, experiment_id, sample_csv, monkeypatch):
+    # Маленькие пачки: сводки одного импорта накапливаются по нескольким пачкам,
+    # а два импорта объединяются при запросе
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 3)
+    for name in ("a.csv", "b.csv"):
+        client.post(f"/experiments/{experiment_id}/import", files={"file": (name, sample_csv, "text/csv")})
+    values = np.array([3.125, 3.142, 3.450, 3.220] * 2)
+
+    channels = client.get(f"/experiments/{experiment_id}/channels").json()
+    temp_a = next(ch for ch in channels if ch["channel"] == "TEMP_A")
+    assert temp_a["stddev"] == pytest.approx(values.std(ddof=1))
+    assert temp_a["p50"] == pytest.approx(np.median(values))
+    assert values.min() <= temp_a["p95"] <= temp_a["p99"] <= values.max()
+    # Канал с одинаковыми значениями (по точке из каждого импорта)
+    assert next(ch for ch in channels if ch["channel"] == "POWER_1")["stddev"] == pytest.approx(0)
+
+    exact = client.get(f"/experiments/{experiment_id}/channels", params={"exact": "true"}).json()
+    temp_a = next(ch for ch in exact if ch["channel"] == "TEMP_A")
+    assert temp_a["p95"] == pytest.approx(np.quantile(values, 0.95))
+    assert temp_a["stddev"] == pytest.approx(values.std(ddof=1))
+
+
 def test_channels_ordered_alphabetically(client, experiment_id, sample_csv):
     client.post(
         f"/experiments/{experiment_id}/import",
@@ -120,6 +171,169 @@ def test_series_time_filter(client, experiment_id, sample_csv):
     data = response.json()["TEMP_A"]
     # Включает 21:06 и 21:07 → 2 точки
     assert len(data) == 2
+    # Время выдаётся с тем смещением, с которым было загружено
+    assert data[0]["timestamp"] == "2026-02-28T21:06:00+05:00"
+
+
+def test_series_max_points(client, experiment_id, sample_csv):
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    response = client.get(
+        f"/experiments/{experiment_id}/series",
+        params=[("channels", "TEMP_A"), ("channels", "PRESS_1"), ("channels", "NONEXISTENT"), ("max_points", 3)],
+    )
+    assert response.status_code == 200
+    data = response.json()
+    # Первая и последняя точки сохраняются, total — число точек до прореживания
+    assert data["TEMP_A"]["total"] == 4
+    assert [p["value"] for p in data["TEMP_A"]["points"]] == [3.125, 3.450, 3.220]
+    assert data["PRESS_1"] == {
+        "total": 2,
+        "points": [
+            {"timestamp": "2026-02-28T21:06:00+05:00", "value": 1.023},
+            {"timestamp": "2026-02-28T21:08:30+05:00", "value": 1.031},
+        ],
+        "resolution": None,
+    }
+    assert data["NONEXISTENT"] == {"total": 0, "points": [], "resolution": None}
+
+
+def test_series_columnar(client, experiment_id, sample_csv):
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    url = f"/experiments/{experiment_id}/series"
+    channels = [("channels", "TEMP_A"), ("channels", "NONEXISTENT")]
+    t0 = 1_772_294_760_000  # 2026-02-28T21:06:00+05:00
+    data = client.get(url, params=[*channels, ("format", "columnar")]).json()
+    assert data == {
+        "TEMP_A": {"t": [t0, t0 + 60_000, t0 + 120_000, t0 + 270_000], "v": [3.125, 3.142, 3.450, 3.220]},
+        "NONEXISTENT": {"t": [], "v": []},
+    }
+
+    data = client.get(url, params=[*channels, ("format", "columnar"), ("delta", "true"), ("max_points", 3)]).json()
+    assert data["TEMP_A"] == {"t": [t0, 120_000, 150_000], "v": [3.125, 3.450, 3.220], "total": 4, "resolution": None}
+    assert data["NONEXISTENT"] == {"t": [], "v": [], "total": 0, "resolution": None}
+
+
+def test_series_json_without_orjson(client, experiment_id, sample_csv, monkeypatch):
+    pytest.importorskip("orjson")
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    url = f"/experiments/{experiment_id}/series"
+    params = {"channels": "TEMP_A", "format": "columnar", "delta": "true"}
+    with_orjson = client.get(url, params=params).content
+    monkeypatch.setattr(responses, "orjson", None)
+    assert client.get(url, params=params).content == with_orjson
+
+
+def test_series_binary(client, experiment_id, sample_csv):
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    url = f"/experiments/{experiment_id}/series"
+    params = [("channels", "TEMP_A"), ("channels", "NONEXISTENT"), ("max_points", 3)]
+    response = client.get(url, params=params, headers={"Accept": series_binary.MEDIA_TYPE})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == series_binary.MEDIA_TYPE
+    data = series_binary.decode(response.content)
+    t0 = 1_772_294_760_000_000  # 2026-02-28T21:06:00+05:00, мкс
+    assert data["TEMP_A"]["t"].tolist() == [t0, t0 + 120_000_000, t0 + 270_000_000]
+    assert data["TEMP_A"]["v"].tolist() == [3.125, 3.450, 3.220]
+    assert (data["TEMP_A"]["total"], data["TEMP_A"]["resolution"]) == (4, None)
+    assert len(data["NONEXISTENT"]["t"]) == 0
+
+    # То же по format=binary, без заголовка Accept
+    assert client.get(url, params=[*params, ("format", "binary")]).content == response.content
+
+
+def test_series_stream_matches_full_response(client, experiment_id, sample_csv, monkeypatch):
+    monkeypatch.setattr(analytics_service, "SERIES_STREAM_CHUNK", 2)
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    url = f"/experiments/{experiment_id}/series"
+    params = [("channels", ch) for ch in ("NONEXISTENT", "TEMP_A", "PRESS_1", "TEMP_A", "OTHER")]
+    full = client.get(url, params=params).json()
+    response = client.get(url, params=[*params, ("stream", "true")])
+    assert response.status_code == 200
+    assert response.json() == full
+    assert client.get(url, params=[("channels", "NONEXISTENT"), ("stream", "true")]).json() == {"NONEXISTENT": []}
+
+
+def test_series_keyset_pages(client, experiment_id, sample_csv, monkeypatch):
+    monkeypatch.setattr(analytics_service, "SERIES_STREAM_CHUNK", 2)
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    url = f"/experiments/{experiment_id}/series"
+    channels = [("channels", "TEMP_A"), ("channels", "PRESS_1"), ("channels", "NONEXISTENT")]
+    full = client.get(url, params=channels).json()
+
+    collected = {ch: [] for ch in full}
+    pages = 0
+    cursor = None
+    while True:
+        params = [*channels, ("limit", 4)] + ([("cursor", cursor)] if cursor else [])
+        page = client.get(url, params=params).json()
+        # Потоковая выдача той же страницы даёт тот же документ
+        assert client.get(url, params=[*params, ("stream", "true")]).json() == page
+        for channel, points in page["series"].items():
+            collected[channel] += points
+        pages += 1
+        cursor = page["next"]
+        if cursor is None:
+            break
+    # 6 точек по 4 на страницу
+    assert pages == 2
+    assert collected == full
+
+
+def test_series_keyset_pages_through_equal_timestamps(client, experiment_id):
+    lines = ["timestamp,channel,value,unit,quality,tag"]
+    lines += [f"2026-03-01T00:00:0{i // 3}Z,A,{i},,," for i in range(7)]
+    client.post(f"/experiments/{experiment_id}/import", files={"file": ("data.csv", "\n".join(lines), "text/csv")})
+    values, cursor = [], None
+    while True:
+        params = {"channels": "A", "limit": 2} | ({"cursor": cursor} if cursor else {})
+        page = client.get(f"/experiments/{experiment_id}/series", params=params).json()
+        values += [point["value"] for point in page["series"]["A"]]
+        if (cursor := page["next"]) is None:
+            break
+    assert values == list(range(7))
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{"cursor": "abc"}, {"cursor": "1.2"}, {"stream": "true", "max_points": 10}, {"limit": 10, "format": "columnar"}],
+)
+def test_series_paging_invalid_params(client, experiment_id, params):
+    response = client.get(f"/experiments/{experiment_id}/series", params={"channels": "TEMP_A", **params})
+    assert response.status_code == 400
+
+
+def test_series_invalid_format(client, experiment_id):
+    response = client.get(
+        f"/experiments/{experiment_id}/series",
+        params={"channels": "TEMP_A", "format": "csv"},
+    )
+    assert response.status_code == 400
+
+
+def test_series_invalid_downsample_method(client, experiment_id):
+    response = client.get(
+        f"/experiments/{experiment_id}/series",
+        params={"channels": "TEMP_A", "max_points": 10, "downsample": "median"},
+    )
+    assert response.status_code == 400
 
 
 def test_summary_empty_experiment(client, experiment_id):
@@ -165,3 +379,136 @@ def test_summary_points_by_quality(client, experiment_id, sample_csv):
     assert summary["points_by_quality"]["WARN"] == 1
 
 
+
+
+def _rollup_rows(db_session, experiment_id):
+    r = ChannelRollup
+    stmt = (
+        select(
+            r.channel_id, r.resolution, r.bucket_us, r.count, r.min, r.max, r.sum,
+            r.first_value, r.first_offset, r.last_value,
+        )
+        .where(r.experiment_id == experiment_id)
+        .order_by(r.channel_id, r.resolution, r.bucket_us)
+    )
+    return [tuple(row) for row in db_session.execute(stmt).all()]
+
+
+def _import_two_hours(client, experiment_id) -> np.ndarray:
+    """Каналы A и B по точке в секунду с 2026-02-28T21:00:00Z; возвращает значения (2, 7200)."""
+    values = np.round(np.random.default_rng(3).normal(size=(2, 7_200)), 3)
+    lines = ["timestamp,channel,value,unit,quality,tag"]
+    for second in range(7_200):
+        ts = f"2026-03-01T{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}+03:00"
+        lines += [f"{ts},A,{values[0, second]},,,", f"{ts},B,{values[1, second]},,,"]
+    client.post(f"/experiments/{experiment_id}/import", files={"file": ("data.csv", "\n".join(lines), "text/csv")})
+    return values
+
+
+def test_rollups_match_points(client, experiment_id, db_session, monkeypatch):
+    """Агрегаты, дописываемые по пачкам, совпадают с группировкой точек и с пересчётом."""
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 700)
+    values = _import_two_hours(client, experiment_id)
+
+    incremental = _rollup_rows(db_session, experiment_id)
+    assert {row[1] for row in incremental} == set(rollup_service.ROLLUP_RESOLUTIONS)
+    minutes = [row for row in incremental if row[1] == 60]
+    assert len(minutes) == 2 * 120
+    channel_id, _, _, count, low, high, total, first, offset, last = minutes[-1]
+    expected = values[0 if channel_id == minutes[0][0] else 1, -60:]
+    assert count == 60
+    assert (low, high, first, last) == (expected.min(), expected.max(), expected[0], expected[-1])
+    assert offset == 180
+    assert total == pytest.approx(expected.sum())
+
+    channel_ids = {row[0] for row in incremental}
+    rollup_service.rebuild(db_session, experiment_id, channel_ids)
+    db_session.commit()
+    rebuilt = _rollup_rows(db_session, experiment_id)
+    assert [row[:6] + row[7:] for row in rebuilt] == [row[:6] + row[7:] for row in incremental]
+    assert [row[6] for row in rebuilt] == pytest.approx([row[6] for row in incremental])
+
+    # 2 часа: часовых корзин на 50 точек не хватает, минутных (120) — хватает
+    series = client.get(
+        f"/experiments/{experiment_id}/series", params={"channels": "A", "max_points": 50}
+    ).json()["A"]
+    assert series["resolution"] == 60
+    assert series["total"] == 7_200
+    assert len(series["points"]) == 50
+    columnar = client.get(
+        f"/experiments/{experiment_id}/series", params={"channels": "A", "max_points": 50, "format": "columnar"}
+    ).json()["A"]
+    assert columnar["t"][0] == 1_772_312_400_000
+    assert columnar["v"] == [point["value"] for point in series["points"]]
+    # Точка корзины — в поясе её первой точки, как и точки без агрегатов
+    first_minute = {"timestamp": "2026-03-01T00:00:00+03:00", "value": pytest.approx(values[0, :60].mean())}
+    assert series["points"][0] == first_minute
+    # Бюджет больше числа минутных корзин — ряд строится по точкам
+    series = client.get(
+        f"/experiments/{experiment_id}/series", params={"channels": "A", "max_points": 500}
+    ).json()["A"]
+    assert (series["resolution"], series["total"], len(series["points"])) == (None, 7_200, 500)
+
+
+def test_series_falls_back_to_points_without_rollup_level(client, experiment_id, monkeypatch):
+    """Разрешение, добавленное после импорта, не построено: ряд и агрегаты — по точкам."""
+    monkeypatch.setattr(rollup_service, "ROLLUP_RESOLUTIONS", (3600,))
+    values = _import_two_hours(client, experiment_id)
+    monkeypatch.setattr(rollup_service, "ROLLUP_RESOLUTIONS", (60, 3600))
+
+    series = client.get(
+        f"/experiments/{experiment_id}/series", params={"channels": "A", "max_points": 50}
+    ).json()["A"]
+    assert (series["resolution"], series["total"], len(series["points"])) == (None, 7_200, 50)
+    assert series["points"][0] == {"timestamp": "2026-03-01T00:00:00+03:00", "value": values[0, 0]}
+
+    params = {"channels": "A", "bucket": "5m", "fn": "count"}
+    data = client.get(f"/experiments/{experiment_id}/aggregate", params=params).json()
+    assert data["resolution"] is None
+    assert data["channels"]["A"]["count"] == [300] * 24
+
+
+_START_MS = 1_772_312_400_000  # 2026-02-28T21:00:00Z
+
+
+def test_aggregate_from_rollups(client, experiment_id):
+    values = _import_two_hours(client, experiment_id)
+    response = client.get(
+        f"/experiments/{experiment_id}/aggregate",
+        params=[("channels", "A"), ("channels", "NONEXISTENT"), ("bucket", "5m"), ("fn", "avg,min,max,count")],
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["bucket"], data["resolution"]) == (300, 60)
+    a = data["channels"]["A"]
+    buckets = values[0].reshape(24, 300)
+    assert a["t"] == [_START_MS + i * 300_000 for i in range(24)]
+    assert a["avg"] == pytest.approx(buckets.mean(axis=1).tolist())
+    assert a["min"] == buckets.min(axis=1).tolist()
+    assert a["max"] == buckets.max(axis=1).tolist()
+    assert a["count"] == [300] * 24
+    assert data["channels"]["NONEXISTENT"] == {"t": [], "avg": [], "min": [], "max": [], "count": []}
+
+
+def test_aggregate_from_points(client, experiment_id):
+    values = _import_two_hours(client, experiment_id)
+    # 90 s не кратно разрешениям пирамиды, а начало диапазона не выровнено на минуту
+    params = {"channels": "B", "bucket": "90s", "fn": "count,sum", "start": "2026-02-28T21:00:30Z"}
+    data = client.get(f"/experiments/{experiment_id}/aggregate", params=params).json()
+    assert data["resolution"] is None
+    b = data["channels"]["B"]
+    assert b["t"][:2] == [_START_MS, _START_MS + 90_000]
+    assert b["count"][:2] == [60, 90]
+    assert sum(b["count"]) == 7_200 - 30
+    assert b["sum"][1] == pytest.approx(values[1, 90:180].sum())
+
+    params = {"channels": "B", "bucket": "1h", "fn": "count", "end": "2026-02-28T22:00:00Z"}
+    data = client.get(f"/experiments/{experiment_id}/aggregate", params=params).json()
+    assert data["resolution"] == 3600
+    assert data["channels"]["B"] == {"t": [_START_MS], "count": [3600]}
+
+
+@pytest.mark.parametrize("params", [{"bucket": "5x"}, {"bucket": "0m"}, {"bucket": "5m", "fn": "avg,median"}])
+def test_aggregate_invalid_params(client, experiment_id, params):
+    response = client.get(f"/experiments/{experiment_id}/aggregate", params={"channels": "A", **params})
+    assert response.status_code == 400
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.downsampling import lttb, minmax
+
+
+def _reference_lttb(t: np.ndarray, v: np.ndarray, threshold: int) -> list[int]:
+    """Исходный построчный алгоритм LTTB (Steinarsson, 2013)."""
+    length = len(v)
+    every = (length - 2) / (threshold - 2)
+    a, selected = 0, [0]
+    for i in range(threshold - 2):
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, length)
+        if next_start < next_end:
+            avg_t, avg_v = t[next_start:next_end].mean(), v[next_start:next_end].mean()
+        else:
+            avg_t, avg_v = t[-1], v[-1]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((t[a] - avg_t) * (v[j] - v[a]) - (t[a] - t[j]) * (avg_v - v[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(length - 1)
+    return selected
+
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(0)
+    t = np.cumsum(rng.integers(1, 1_000, 5_000))
+    v = np.cumsum(rng.normal(size=5_000))
+    assert lttb(t, v, 100).tolist() == _reference_lttb(t.astype(float), v, 100)
+
+
+@pytest.mark.parametrize("method", [lttb, minmax])
+def test_small_series_returned_as_is(method):
+    t = np.arange(10)
+    v = np.arange(10.0)
+    assert method(t, v, 10).tolist() == list(range(10))
+    assert method(t[:2], v[:2], 3).tolist() == [0, 1]
+
+
+def test_minmax_keeps_extremes():
+    rng = np.random.default_rng(1)
+    v = rng.normal(size=10_001)
+    v[1234], v[8765] = 100.0, -100.0
+    keep = minmax(np.arange(len(v)), v, 200)
+    assert len(keep) <= 200
+    assert {0, 1234, 8765, len(v) - 1} <= set(keep.tolist())
+    assert np.all(np.diff(keep) > 0)
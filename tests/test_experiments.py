@@ -1,6 +1,17 @@
 from __future__ import annotations
 
 from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.dependencies import get_db
+from app.models import (
+    ChannelRollup,
+    ChannelSketch,
+    ChannelStats,
+    DataPoint,
+    ExportJob,
+    ImportRun,
+)
 
 
 def test_create_experiment(client: TestClient):
@@ -95,3 +106,22 @@ def test_delete_experiment_cascades_data(client: TestClient, experiment_id: int,
     # После удаления каналы недоступны (404)
     response = client.get(f"/experiments/{experiment_id}/channels")
     assert response.status_code == 404
+
+
+def test_delete_experiment_cascades_derived_tables(file_client: TestClient, sample_csv: str):
+    """Точки, импорты, статистика, сводки и агрегаты каналов, выгрузки удаляются вместе с экспериментом."""
+    experiment_id = file_client.post("/experiments", json={"name": "Old"}).json()["id"]
+    file_client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("events.csv", sample_csv, "text/csv")},
+    )
+    file_client.post(f"/experiments/{experiment_id}/export-jobs")
+    file_client.delete(f"/experiments/{experiment_id}")
+
+    db = next(file_client.app.dependency_overrides[get_db]())
+    try:
+        for model in (DataPoint, ImportRun, ChannelStats, ChannelSketch, ChannelRollup, ExportJob):
+            count = db.scalar(select(func.count()).select_from(model).where(model.experiment_id == experiment_id))
+            assert count == 0, model.__tablename__
+    finally:
+        db.close()
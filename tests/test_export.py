@@ -1,6 +1,13 @@
 from __future__ import annotations
 
-from app.services.export_service import MAX_EXPORT_ROWS
+import gzip
+import io
+import json
+import sys
+
+import pytest
+
+from app.services import export_service
 
 
 def test_export_csv_returns_csv(client, experiment_id, sample_csv):
@@ -78,5 +85,113 @@ def test_export_csv_content_disposition_header(client, experiment_id, sample_csv
     assert "attachment" in response.headers.get("content-disposition", "")
 
 
-def test_export_max_rows_constant_defined():
-    assert MAX_EXPORT_ROWS == 5000
+def test_export_csv_streams_without_row_cap(client, experiment_id, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_ROWS", 1000)
+    lines = ["timestamp,channel,value,unit,quality,tag"]
+    lines += [f"2026-03-01T00:{i // 60 % 60:02d}:{i % 60:02d}+03:00,A,{i},V,OK,t" for i in range(3_600)]
+    lines += ['2026-03-01T01:00:00+03:00,"B, sensor",1.5,,,']
+    client.post(f"/experiments/{experiment_id}/import", files={"file": ("data.csv", "\n".join(lines), "text/csv")})
+
+    response = client.get(f"/experiments/{experiment_id}/export.csv")
+    assert response.status_code == 200
+    exported = response.text.splitlines()
+    # Больше прежнего потолка в 5000 строк не нужно: все 3601 точка и заголовок
+    assert len(exported) == 3_602
+    assert exported[1] == "2026-03-01T00:00:00+03:00,A,0.0,V,OK,t"
+    assert exported[-1] == '2026-03-01T01:00:00+03:00,"B, sensor",1.5,,,'
+
+
+def test_export_csv_limit(client, experiment_id, sample_csv):
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    response = client.get(f"/experiments/{experiment_id}/export.csv", params={"limit": 3})
+    assert len(response.text.strip().splitlines()) == 4
+    assert client.get(f"/experiments/{experiment_id}/export.csv", params={"limit": 0}).status_code == 422
+
+
+def _import_sample(client, experiment_id, sample_csv):
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+
+
+def test_export_csv_gz_matches_csv(client, experiment_id, sample_csv):
+    _import_sample(client, experiment_id, sample_csv)
+    response = client.get(f"/experiments/{experiment_id}/export", params={"format": "csv.gz"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert response.headers["content-disposition"].endswith(".csv.gz")
+    assert gzip.decompress(response.content).decode() == client.get(f"/experiments/{experiment_id}/export.csv").text
+
+
+def test_export_jsonl_round_trips_through_import(client, experiment_id, sample_csv):
+    _import_sample(client, experiment_id, sample_csv)
+    response = client.get(f"/experiments/{experiment_id}/export", params={"format": "jsonl"})
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 10
+    assert records[0] == {
+        "timestamp": "2026-02-28T21:05:10+05:00",
+        "channel": "STATE",
+        "value": 1.0,
+        "unit": None,
+        "quality": "OK",
+        "tag": "experiment",
+    }
+
+    copy_id = client.post("/experiments", json={"name": "Copy", "stand": "stand-01", "operator": "tester"}).json()["id"]
+    imported = client.post(
+        f"/experiments/{copy_id}/import",
+        files={"file": ("export.jsonl", response.content, "application/x-ndjson")},
+    )
+    assert imported.json()["inserted"] == 10
+    original = client.get(f"/experiments/{experiment_id}/export.csv").text
+    assert client.get(f"/experiments/{copy_id}/export.csv").text == original
+
+
+def test_export_unknown_format(client, experiment_id):
+    response = client.get(f"/experiments/{experiment_id}/export", params={"format": "xlsx"})
+    assert response.status_code == 400
+    assert "format must be one of" in response.json()["detail"]
+
+
+def test_export_arrow_formats_without_pyarrow(client, experiment_id, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    for export_format in ("parquet", "arrow"):
+        response = client.get(f"/experiments/{experiment_id}/export", params={"format": export_format})
+        assert response.status_code == 400
+        assert "pyarrow" in response.json()["detail"]
+
+
+def test_export_parquet_row_groups(client, experiment_id, sample_csv, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_ROWS", 3)
+    monkeypatch.setattr(export_service, "EXPORT_ROW_GROUP_ROWS", 4)
+    _import_sample(client, experiment_id, sample_csv)
+
+    response = client.get(f"/experiments/{experiment_id}/export", params={"format": "parquet"})
+    assert response.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    # Куски по 3 строки копятся до 4+: группы 6 и 4
+    assert [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)] == [6, 4]
+    table = parquet.read()
+    assert table.column_names == ["timestamp", "tz_offset", "channel", "value", "unit", "quality", "tag"]
+    assert table.column("channel").to_pylist()[:2] == ["STATE", "PRESS_1"]
+    assert table.column("tz_offset").to_pylist()[0] == 300
+    assert table.column("quality").to_pylist().count("WARN") == 1
+
+
+def test_export_arrow_stream(client, experiment_id, sample_csv):
+    pa = pytest.importorskip("pyarrow")
+    _import_sample(client, experiment_id, sample_csv)
+    response = client.get(
+        f"/experiments/{experiment_id}/export",
+        params={"format": "arrow", "channels": "TEMP_A"},
+    )
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 4
+    assert table.column("value").to_pylist() == [3.125, 3.142, 3.45, 3.22]
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import gzip
+import threading
+import time
+
+from app.services import export_job_service, export_service
+
+
+def _create_experiment(client, sample_csv) -> int:
+    experiment_id = client.post("/experiments", json={"name": "Export"}).json()["id"]
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    return experiment_id
+
+
+def _wait_finished(client, job_id: int, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/export-jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Export job {job_id} did not finish in {timeout}s")
+
+
+def test_export_job_writes_artifact(file_client, sample_csv):
+    experiment_id = _create_experiment(file_client, sample_csv)
+    response = file_client.post(f"/experiments/{experiment_id}/export-jobs", params={"channels": "TEMP_A"})
+    assert response.status_code == 202
+    queued = response.json()
+    assert queued["status"] == "queued"
+    assert queued["rows_estimate"] == 4
+    assert queued["params"]["channels"] == ["TEMP_A"]
+
+    job = _wait_finished(file_client, queued["id"])
+    assert job["status"] == "done"
+    assert (job["rows_written"], job["progress"]) == (4, 1.0)
+
+    download = file_client.get(job["download_url"])
+    assert download.status_code == 200
+    assert download.headers["accept-ranges"] == "bytes"
+    assert "experiment_" in download.headers["content-disposition"]
+    assert len(download.content) == job["bytes_written"]
+    expected = file_client.get(f"/experiments/{experiment_id}/export.csv", params={"channels": "TEMP_A"})
+    assert download.text == expected.text
+
+
+def test_export_job_download_resumes_with_range(file_client, sample_csv):
+    experiment_id = _create_experiment(file_client, sample_csv)
+    queued = file_client.post(f"/experiments/{experiment_id}/export-jobs", params={"format": "csv.gz"}).json()
+    job = _wait_finished(file_client, queued["id"])
+    full = file_client.get(job["download_url"])
+    assert full.headers["content-type"] == "application/gzip"
+
+    head = file_client.get(job["download_url"], headers={"Range": "bytes=0-99"})
+    assert head.status_code == 206
+    tail = file_client.get(
+        job["download_url"],
+        headers={"Range": f"bytes={len(head.content)}-", "If-Range": full.headers["etag"]},
+    )
+    assert tail.status_code == 206
+    assert tail.headers["content-range"] == f"bytes 100-{len(full.content) - 1}/{len(full.content)}"
+    assert gzip.decompress(head.content + tail.content) == gzip.decompress(full.content)
+
+
+def test_export_job_reuses_finished_artifact(file_client, sample_csv):
+    experiment_id = _create_experiment(file_client, sample_csv)
+    first = _wait_finished(file_client, file_client.post(f"/experiments/{experiment_id}/export-jobs").json()["id"])
+
+    again = file_client.post(f"/experiments/{experiment_id}/export-jobs")
+    assert again.status_code == 200
+    assert again.json()["id"] == first["id"]
+    assert again.json()["status"] == "done"
+
+    # Другие параметры — другая выгрузка
+    other = file_client.post(f"/experiments/{experiment_id}/export-jobs", params={"quality": "OK"})
+    assert other.status_code == 202
+
+    # Новые данные эксперимента — старый файл не подходит
+    file_client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("more.csv", sample_csv, "text/csv")},
+    )
+    fresh = file_client.post(f"/experiments/{experiment_id}/export-jobs")
+    assert fresh.status_code == 202
+    assert _wait_finished(file_client, fresh.json()["id"])["rows_written"] == 20
+
+
+def test_export_job_cache_evicts_by_size_and_ttl(file_client, sample_csv, monkeypatch):
+    experiment_id = _create_experiment(file_client, sample_csv)
+    jobs = []
+    for export_format in ("csv", "jsonl"):
+        queued = file_client.post(f"/experiments/{experiment_id}/export-jobs", params={"format": export_format})
+        jobs.append(_wait_finished(file_client, queued.json()["id"]))
+    # csv скачан позже jsonl: при нехватке места вытесняется jsonl
+    file_client.get(jobs[0]["download_url"])
+
+    monkeypatch.setattr(export_job_service, "EXPORT_CACHE_MAX_BYTES", jobs[0]["bytes_written"])
+    file_client.post(f"/experiments/{experiment_id}/export-jobs", params={"format": "csv"})
+    assert file_client.get(f"/export-jobs/{jobs[1]['id']}").json()["status"] == "expired"
+    assert file_client.get(jobs[1]["download_url"]).status_code == 410
+    assert file_client.get(jobs[0]["download_url"]).status_code == 200
+
+    monkeypatch.setattr(export_job_service, "EXPORT_CACHE_TTL_SECONDS", -1)
+    resubmitted = file_client.post(f"/experiments/{experiment_id}/export-jobs", params={"format": "csv"})
+    assert resubmitted.status_code == 202
+    assert file_client.get(f"/export-jobs/{jobs[0]['id']}").json()["status"] == "expired"
+    assert not list((export_job_service.EXPORT_SPOOL_DIR).glob(f"export_{jobs[0]['id']}.*"))
+
+
+def test_cancel_running_export_job(file_client, sample_csv, monkeypatch):
+    experiment_id = _create_experiment(file_client, sample_csv)
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_ROWS", 2)
+    started, release = threading.Event(), threading.Event()
+    original = export_service._counted
+
+    def slow_counted(chunks, on_rows):
+        def wait_then_count(count):
+            started.set()
+            release.wait(5)
+            on_rows(count)
+
+        return original(chunks, wait_then_count)
+
+    monkeypatch.setattr(export_service, "_counted", slow_counted)
+    queued = file_client.post(f"/experiments/{experiment_id}/export-jobs").json()
+    assert started.wait(5)
+    assert file_client.get(f"/export-jobs/{queued['id']}").json()["status"] == "running"
+
+    assert file_client.post(f"/export-jobs/{queued['id']}/cancel").status_code == 202
+    release.set()
+    job = _wait_finished(file_client, queued["id"])
+    assert job["status"] == "cancelled"
+    assert file_client.get(f"/export-jobs/{queued['id']}/download").status_code == 409
+    assert not list(export_job_service.EXPORT_SPOOL_DIR.iterdir())
+    assert file_client.post(f"/export-jobs/{queued['id']}/cancel").status_code == 409
+
+
+def test_export_job_progress_and_cancel_from_other_process(file_client, sample_csv, monkeypatch):
+    """Прогресс и запрос отмены хранятся в БД: их видит процесс, в пуле которого задачи нет."""
+    experiment_id = _create_experiment(file_client, sample_csv)
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_ROWS", 2)
+    started, release = threading.Event(), threading.Event()
+    original = export_service._counted
+
+    def slow_counted(chunks, on_rows):
+        calls = []
+
+        def wait_then_count(count):
+            calls.append(count)
+            if len(calls) == 3:
+                started.set()
+                release.wait(5)
+            on_rows(count)
+
+        return original(chunks, wait_then_count)
+
+    monkeypatch.setattr(export_service, "_counted", slow_counted)
+    queued = file_client.post(f"/experiments/{experiment_id}/export-jobs").json()
+    assert started.wait(5)
+    running = file_client.get(f"/export-jobs/{queued['id']}").json()
+    assert running["rows_written"] == 2
+    assert running["bytes_written"] > 0
+
+    with export_job_service._lock:
+        export_job_service._cancel_events.pop(queued["id"])
+    assert file_client.post(f"/export-jobs/{queued['id']}/cancel").json()["status"] == "cancelled"
+    release.set()
+    export_job_service.shutdown()
+    assert file_client.get(f"/export-jobs/{queued['id']}").json()["status"] == "cancelled"
+    assert not list(export_job_service.EXPORT_SPOOL_DIR.iterdir())
+
+
+def test_export_job_validation_and_not_found(file_client, sample_csv):
+    experiment_id = _create_experiment(file_client, sample_csv)
+    response = file_client.post(f"/experiments/{experiment_id}/export-jobs", params={"format": "xlsx"})
+    assert response.status_code == 400
+    assert file_client.post("/experiments/9999/export-jobs").status_code == 404
+    assert file_client.get("/export-jobs/9999").status_code == 404
+    assert file_client.get("/export-jobs/9999/download").status_code == 404
+
+
+def test_recover_interrupted_export_jobs(file_client, sample_csv):
+    experiment_id = _create_experiment(file_client, sample_csv)
+    done = _wait_finished(file_client, file_client.post(f"/experiments/{experiment_id}/export-jobs").json()["id"])
+    spool = export_job_service.EXPORT_SPOOL_DIR
+    (spool / "export_999.csv.part").write_bytes(b"partial")
+
+    db = next(iter(file_client.app.dependency_overrides.values()))()
+    session = next(db)
+    try:
+        export_job_service.recover_interrupted_jobs(session)
+    finally:
+        session.close()
+    assert [path.name for path in spool.iterdir()] == [f"export_{done['id']}.csv"]
+    assert file_client.get(done["download_url"]).status_code == 200
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import csv
+import io
+
+import pytest
+
+from app.services import export_service, export_wide
+
+
+def _import(client, experiment_id, text):
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", text, "text/csv")},
+    )
+    assert response.status_code in (200, 201)
+
+
+def _wide(client, experiment_id, **params):
+    response = client.get(f"/experiments/{experiment_id}/export", params={"layout": "wide", **params})
+    assert response.status_code == 200, response.text
+    return list(csv.reader(io.StringIO(response.text)))
+
+
+def _points(*rows):
+    lines = ["timestamp,channel,value,unit,quality,tag"]
+    lines += [f"2026-03-01T00:00:{seconds}Z,{channel},{value},,," for seconds, channel, value in rows]
+    return "\n".join(lines)
+
+
+def test_wide_export_one_row_per_timestamp(client, experiment_id, sample_csv):
+    _import(client, experiment_id, sample_csv)
+    rows = _wide(client, experiment_id)
+    assert rows[0] == ["timestamp", "POWER_1", "PRESS_1", "STATE", "TEMP_A", "TEMP_B"]
+    # 10 точек в 7 различных моментах времени
+    assert len(rows) == 8
+    assert rows[1] == ["2026-02-28T21:05:10+05:00", "", "", "1.0", "", ""]
+    assert rows[2] == ["2026-02-28T21:06:00+05:00", "", "1.023", "", "3.125", "3.081"]
+
+
+def test_wide_export_requested_channels_in_order(client, experiment_id, sample_csv):
+    _import(client, experiment_id, sample_csv)
+    rows = _wide(client, experiment_id, channels=["TEMP_B", "PRESS_1", "MISSING"], quality="OK")
+    assert rows[0] == ["timestamp", "TEMP_B", "PRESS_1", "MISSING"]
+    assert rows[1:] == [
+        ["2026-02-28T21:06:00+05:00", "3.081", "1.023", ""],
+        ["2026-02-28T21:07:00+05:00", "3.09", "", ""],
+        ["2026-02-28T21:08:30+05:00", "", "1.031", ""],
+    ]
+
+
+def test_wide_export_tolerance_aligns_jittered_clocks(client, experiment_id):
+    _import(client, experiment_id, _points(("00", "A", 1), ("00.300", "B", 2), ("10", "A", 3), ("10.400", "B", 4)))
+    assert len(_wide(client, experiment_id)) == 5
+    rows = _wide(client, experiment_id, tolerance="500ms")
+    assert rows[1:] == [
+        ["2026-03-01T00:00:00+00:00", "1.0", "2.0"],
+        ["2026-03-01T00:00:10+00:00", "3.0", "4.0"],
+    ]
+
+
+def test_wide_export_tolerance_keeps_every_point(client, experiment_id):
+    # Две точки канала в пределах допуска не сливаются: вторая открывает следующую строку
+    _import(client, experiment_id, _points(("00", "A", 1), ("00.200", "A", 2), ("00.300", "B", 3)))
+    rows = _wide(client, experiment_id, tolerance="1s")
+    assert rows[1:] == [
+        ["2026-03-01T00:00:00+00:00", "1.0", "3.0"],
+        ["2026-03-01T00:00:00.200000+00:00", "2.0", ""],
+    ]
+
+
+def test_wide_export_interval_averages(client, experiment_id):
+    _import(client, experiment_id, _points(("00", "A", 1), ("20", "A", 3), ("40", "B", 5), ("59", "A", 8)))
+    rows = _wide(client, experiment_id, interval="30s")
+    assert rows[1:] == [
+        ["2026-03-01T00:00:00+00:00", "2.0", ""],
+        ["2026-03-01T00:00:30+00:00", "8.0", "5.0"],
+    ]
+
+
+@pytest.mark.parametrize(
+    ("fill", "expected"),
+    [("empty", ""), ("ffill", "10.0"), ("interpolate", "15.0")],
+)
+def test_wide_export_fill(client, experiment_id, fill, expected):
+    points = _points(("00", "A", 1), ("00", "B", 10), ("10", "A", 2), ("20", "A", 3), ("20", "B", 20))
+    _import(client, experiment_id, points)
+    rows = _wide(client, experiment_id, fill=fill)
+    assert rows[2] == ["2026-03-01T00:00:10+00:00", "2.0", expected]
+    assert rows[3] == ["2026-03-01T00:00:20+00:00", "3.0", "20.0"]
+
+
+def test_wide_export_interpolate_leaves_edges_empty(client, experiment_id):
+    _import(client, experiment_id, _points(("00", "A", 1), ("10", "A", 2), ("10", "B", 5), ("20", "A", 3)))
+    rows = _wide(client, experiment_id, fill="interpolate")
+    assert [row[2] for row in rows[1:]] == ["", "5.0", ""]
+
+
+def test_wide_export_interpolate_uses_channel_times(client, experiment_id):
+    # B отстаёт от A: интерполяция идёт от времени точки B, а не от времени строки
+    points = _points(("00", "A", 1), ("00.400", "B", 0), ("10", "A", 2), ("20", "A", 3), ("20.400", "B", 20))
+    _import(client, experiment_id, points)
+    rows = _wide(client, experiment_id, tolerance="500ms", fill="interpolate")
+    assert rows[2] == ["2026-03-01T00:00:10+00:00", "2.0", "9.6"]
+
+    # В interval — между средними соседних интервалов канала по их началам
+    points = _points(("00", "C", 1), ("05", "D", 0), ("15", "D", 2), ("20", "C", 2), ("41", "D", 5), ("59", "D", 9))
+    _import(client, experiment_id, points)
+    rows = _wide(client, experiment_id, channels=["C", "D"], interval="20s", fill="interpolate")
+    assert rows[1:] == [
+        ["2026-03-01T00:00:00+00:00", "1.0", "1.0"],
+        ["2026-03-01T00:00:20+00:00", "2.0", "4.0"],
+        ["2026-03-01T00:00:40+00:00", "", "7.0"],
+    ]
+
+
+def test_wide_export_merges_in_chunks(client, experiment_id, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_CHUNK_ROWS", 100)
+    monkeypatch.setattr(export_wide, "_MIN_CHANNEL_CHUNK", 7)
+    lines = ["timestamp,channel,value,unit,quality,tag"]
+    for i in range(600):
+        for channel in ("A", "B", "C"):
+            if channel != "C" or i % 2 == 0:
+                lines.append(f"2026-03-01T{i // 60:02d}:{i % 60:02d}:00Z,{channel},{i},,,")
+    _import(client, experiment_id, "\n".join(lines))
+
+    rows = _wide(client, experiment_id, fill="ffill")
+    assert len(rows) == 601
+    assert rows[600] == ["2026-03-01T09:59:00+00:00", "599.0", "599.0", "598.0"]
+    assert len(_wide(client, experiment_id, limit=250)) == 251
+
+
+def test_wide_export_jsonl(client, experiment_id, sample_csv):
+    _import(client, experiment_id, sample_csv)
+    response = client.get(
+        f"/experiments/{experiment_id}/export",
+        params={"layout": "wide", "format": "jsonl", "channels": ["TEMP_A", "TEMP_B"]},
+    )
+    first = response.text.splitlines()[0]
+    assert first == '{"timestamp":"2026-02-28T21:06:00+05:00","TEMP_A":3.125,"TEMP_B":3.081}'
+
+
+def test_wide_export_parquet(client, experiment_id, sample_csv):
+    pq = pytest.importorskip("pyarrow.parquet")
+    _import(client, experiment_id, sample_csv)
+    response = client.get(
+        f"/experiments/{experiment_id}/export",
+        params={"layout": "wide", "format": "parquet", "interval": "1h"},
+    )
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column_names == ["timestamp", "tz_offset", "POWER_1", "PRESS_1", "STATE", "TEMP_A", "TEMP_B"]
+    assert table.num_rows == 1
+    assert table.column("TEMP_A").to_pylist() == [pytest.approx((3.125 + 3.142 + 3.45 + 3.22) / 4)]
+
+
+@pytest.mark.parametrize(
+    ("params", "detail"),
+    [
+        ({"layout": "tall"}, "layout must be one of"),
+        ({"tolerance": "1s"}, "require layout=wide"),
+        ({"layout": "wide", "fill": "zero"}, "fill must be one of"),
+        ({"layout": "wide", "tolerance": "1s", "interval": "1m"}, "mutually exclusive"),
+        ({"layout": "wide", "interval": "0s"}, "interval must be a positive number"),
+        ({"layout": "wide", "tolerance": "1.5s"}, "tolerance must be a positive number"),
+    ],
+)
+def test_wide_export_validation(client, experiment_id, params, detail):
+    response = client.get(f"/experiments/{experiment_id}/export", params=params)
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
@@ -1,6 +1,22 @@
 from __future__ import annotations
 
-from app.services.import_service import MAX_UPLOAD_BYTES
+import asyncio
+import bz2
+import gzip
+import io
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from app.main import app
+from app.models import Channel, DataPoint, Tag, Unit
+from app.services import import_columnar, import_service
+from app.services.import_service import _LineReader
 
 
 def test_import_csv_success(client, experiment_id, sample_csv):
@@ -134,8 +150,9 @@ def test_import_unsupported_extension(client, experiment_id):
     assert "supported" in response.json()["detail"].lower()
 
 
-def test_import_oversized_file(client, experiment_id):
-    oversized = b"x" * (MAX_UPLOAD_BYTES + 1)
+def test_import_oversized_file(client, experiment_id, monkeypatch):
+    monkeypatch.setattr(import_service, "MAX_UPLOAD_BYTES", 1024)
+    oversized = b"x" * 1025
     response = client.post(
         f"/experiments/{experiment_id}/import",
         files={"file": ("data.csv", oversized, "text/csv")},
@@ -215,3 +232,277 @@ def test_import_run_linked_to_experiment(client, experiment_id, sample_csv):
     ch2 = client.get(f"/experiments/{other}/channels").json()
     assert len(ch1) == len(ch2)
     assert r1["import_run_id"] != r2["import_run_id"]
+
+
+def test_line_reader_splits_chunks_on_line_boundaries():
+    """Строки и многобайтовые символы, разрезанные границей блока, собираются целиком."""
+    data = "a,Температура\nb,2\r\nc,3".encode()
+    lines = list(_LineReader(io.BytesIO(data), chunk_size=3))
+    assert lines == ["a,Температура\n", "b,2\r\n", "c,3"]
+
+
+def test_import_csv_spanning_many_chunks(client, experiment_id, monkeypatch):
+    """Файл больше одного блока чтения импортируется без потерь."""
+    monkeypatch.setattr(import_service, "READ_CHUNK_BYTES", 7)
+    rows = "".join(f"2026-02-28T21:{i // 60:02d}:{i % 60:02d}+05:00,TEMP_A,{i},C,OK,temp\n" for i in range(200))
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("big.csv", "timestamp,channel,value,unit,quality,tag\n" + rows, "text/csv")},
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 200
+
+
+def test_import_reports_throughput(client, experiment_id, sample_csv):
+    payload = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    ).json()
+    assert payload["rows_per_sec"] > 0
+    assert payload["duration_seconds"] >= 0
+
+    history = client.get(f"/experiments/{experiment_id}/imports").json()
+    assert history[0]["rows_per_sec"] == payload["rows_per_sec"]
+
+
+def test_import_writes_multiple_batches(client, experiment_id, sample_csv, monkeypatch):
+    """Строки, не кратные размеру пачки, дописываются финальным flush."""
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 3)
+    payload = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    ).json()
+    assert payload["inserted"] == 10
+    summary = client.get(f"/experiments/{experiment_id}/summary").json()
+    assert summary["total_points"] == 10
+
+
+def test_import_does_not_block_concurrent_reads(file_client, sample_csv, monkeypatch):
+    """Пока импорт разбирается и пишется в пуле потоков, /summary отвечает без ожидания."""
+    experiment_id = file_client.post("/experiments", json={"name": "Concurrent"}).json()["id"]
+
+    gate = threading.Event()
+    released_by_gate: list[bool] = []
+    original = import_service._process_datapoint_rows
+
+    def parked_rows(*args, **kwargs):
+        # Импорт «зависает» до тех пор, пока не будет обслужен параллельный запрос.
+        # Если бы импорт шёл в event loop, запрос не смог бы выполниться и ожидание истекло бы.
+        released_by_gate.append(gate.wait(timeout=5))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(import_service, "_process_datapoint_rows", parked_rows)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            started = time.perf_counter()
+            import_task = asyncio.create_task(
+                ac.post(
+                    f"/experiments/{experiment_id}/import",
+                    files={"file": ("data.csv", sample_csv, "text/csv")},
+                )
+            )
+            await asyncio.sleep(0.2)
+            summary = await ac.get(f"/experiments/{experiment_id}/summary")
+            latency = time.perf_counter() - started - 0.2
+            gate.set()
+            imported = await import_task
+        return latency, summary, imported
+
+    latency, summary, imported = asyncio.run(scenario())
+    assert summary.status_code == 200
+    assert latency < 1.0
+    assert released_by_gate == [True]
+    assert imported.status_code == 200
+    assert imported.json()["inserted"] == 10
+
+
+MIXED_CSV = (
+    "timestamp,channel,value,unit,quality,tag\n"
+    "2026-02-28T21:06:00+05:00,TEMP_A,3.125,C,OK,temp\n"
+    "2026-02-28T21:06:01Z, TEMP_A ,4, C ,warn,\n"
+    "2026-02-28T21:06:02.250+05:00,TEMP_A,5,C,,temp\n"
+    "NOT_A_DATE,TEMP_A,1,C,OK,temp\n"
+    "2026-02-30T21:06:00+05:00,TEMP_A,1,C,OK,temp\n"
+    "2026-02-28T21:06:03+05:00,TEMP_A,abc,C,OK,temp\n"
+    "2026-02-28T21:06:04+05:00,,1,C,OK,temp\n"
+    "2026-02-28T21:06:05+05:00,TEMP_A,,C,OK,temp\n"
+    "2026-02-28T21:06:06+05:00,TEMP_A,1,C,GOOD,temp\n"
+    "\n"
+    '"2026-02-28T21:06:07+05:00","TEMP_A","6","C, deg","OK","a,b"\n'
+    "2026-02-28T21:06:08+05:00,TEMP_A,7\n"
+    "2026-02-28T21:06:09+05:00,TEMP_A,8,C,BAD,temp,extra\r\n"
+    "2026-02-28 21:06:10,PRES_B,1e3,bar,OK,p"
+)
+
+
+def test_columnar_engine_matches_rows_engine(client, monkeypatch, caplog):
+    """Колоночный движок даёт те же счётчики, номера ошибочных строк и данные, что и построчный."""
+    monkeypatch.setattr(import_columnar, "COLUMNAR_BLOCK_LINES", 4)
+    results = {}
+    for engine in ("rows", "columnar"):
+        experiment_id = client.post("/experiments", json={"name": engine}).json()["id"]
+        caplog.clear()
+        payload = client.post(
+            f"/experiments/{experiment_id}/import",
+            params={"engine": engine},
+            files={"file": ("mixed.csv", MIXED_CSV, "text/csv")},
+        ).json()
+        series = client.get(
+            f"/experiments/{experiment_id}/series", params={"channels": "TEMP_A,PRES_B"}
+        ).json()
+        errors = sorted(r.getMessage() for r in caplog.records if "line" in r.getMessage())
+        results[engine] = (payload["inserted"], payload["skipped"], payload["errors"], errors, series)
+
+    assert results["rows"][:3] == (7, 3, 3)
+    assert results["columnar"] == results["rows"]
+
+
+@pytest.mark.parametrize("engine", ["rows", "columnar"])
+def test_import_keeps_fractional_seconds_after_offset_rows(client, experiment_id, engine):
+    """Дробные секунды с коротким смещением после строк с '+05:00' не теряются."""
+    text = (
+        "timestamp,channel,value,unit,quality,tag\n"
+        "2026-02-28T21:06:00+05:00,TEMP_A,1,,,\n"
+        "2026-02-28T21:06:00.12+05,TEMP_A,2,,,\n"
+        "2026-02-28T21:06:00.1234Z,TEMP_A,3,,,\n"
+    )
+    client.post(
+        f"/experiments/{experiment_id}/import",
+        params={"engine": engine},
+        files={"file": ("mixed.csv", text, "text/csv")},
+    )
+    series = client.get(f"/experiments/{experiment_id}/series", params={"channels": "TEMP_A"}).json()
+    assert [point["timestamp"] for point in series["TEMP_A"]] == [
+        "2026-02-28T21:06:00+05:00",
+        "2026-02-28T21:06:00.120000+05:00",
+        "2026-02-28T21:06:00.123400+00:00",
+    ]
+
+
+def test_import_write_error_rolls_back(client, experiment_id, sample_csv, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("disk I/O error"))
+
+    monkeypatch.setattr(import_service.channel_stats_service, "add_points", broken)
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Database error during import"
+
+    # Сессия запроса откачена: ни точек, ни записи импорта, следующий импорт проходит
+    monkeypatch.undo()
+    assert client.get(f"/experiments/{experiment_id}/imports").json() == []
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    assert response.json()["inserted"] == 10
+    assert client.get(f"/experiments/{experiment_id}/summary").json()["total_points"] == 10
+
+
+def test_import_unknown_engine_rejected(client, experiment_id, sample_csv):
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        params={"engine": "turbo"},
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    assert response.status_code == 400
+    assert "engine must be one of" in response.json()["detail"]
+
+
+def test_import_gzip_csv(client, experiment_id, sample_csv):
+    compressed = gzip.compress(sample_csv.encode())
+    payload = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv.gz", compressed, "application/gzip")},
+    ).json()
+    assert payload["inserted"] == 10
+    assert payload["compression"] == "gzip"
+    assert payload["compressed_bytes"] == len(compressed)
+    assert payload["uncompressed_bytes"] == len(sample_csv.encode())
+
+    run = client.get(f"/imports/{payload['import_run_id']}").json()
+    assert run["bytes_total"] == len(compressed)
+    assert run["uncompressed_bytes"] == len(sample_csv.encode())
+
+
+def test_import_bz2_jsonl_columnar_engine_falls_back(client, experiment_id, sample_jsonl):
+    payload = client.post(
+        f"/experiments/{experiment_id}/import",
+        params={"engine": "columnar"},
+        files={"file": ("data.jsonl.bz2", bz2.compress(sample_jsonl.encode()), "application/x-bzip2")},
+    ).json()
+    assert payload["inserted"] == 6
+    assert payload["compression"] == "bz2"
+
+
+def test_import_truncated_gzip_rejected(client, experiment_id, sample_csv):
+    compressed = gzip.compress(sample_csv.encode())
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv.gz", compressed[:-10], "application/gzip")},
+    )
+    assert response.status_code == 400
+    assert "gzip" in response.json()["detail"]
+    assert client.get(f"/experiments/{experiment_id}/summary").json()["total_points"] == 0
+
+
+def test_import_decompressed_size_limited(client, experiment_id, monkeypatch):
+    """Маленький архив с большим объёмом после распаковки отклоняется, не раздувая память."""
+    monkeypatch.setattr(import_service, "MAX_UNCOMPRESSED_BYTES", 1024)
+    row = "2026-02-28T21:06:00+05:00,TEMP_A,1,C,OK,temp\n"
+    content = "timestamp,channel,value,unit,quality,tag\n" + row * 1000
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("bomb.csv.gz", gzip.compress(content.encode()), "application/gzip")},
+    )
+    assert response.status_code == 413
+    assert "Decompressed data too large" in response.json()["detail"]
+
+
+def test_import_zstd_jsonl(client, experiment_id, sample_jsonl):
+    zstandard = pytest.importorskip("zstandard")
+    # Два кадра подряд, как у файла, дописанного zstd потоком: читаются оба
+    lines = sample_jsonl.encode().splitlines(keepends=True)
+    compressor = zstandard.ZstdCompressor()
+    compressed = compressor.compress(b"".join(lines[:3])) + compressor.compress(b"".join(lines[3:]))
+    payload = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.jsonl.zst", compressed, "application/zstd")},
+    ).json()
+    assert payload["inserted"] == 6
+    assert payload["compression"] == "zstd"
+    assert (payload["compressed_bytes"], payload["uncompressed_bytes"]) == (len(compressed), len(sample_jsonl.encode()))
+
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.jsonl.zst", compressed[:-4], "application/zstd")},
+    )
+    assert response.status_code == 400
+
+
+def test_import_zstd_without_package(client, experiment_id, monkeypatch):
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.jsonl.zst", b"\x28\xb5\x2f\xfd", "application/zstd")},
+    )
+    assert response.status_code == 400
+    assert "zstandard" in response.json()["detail"]
+
+
+def test_import_reuses_dimension_keys(client, experiment_id, db_session, sample_csv):
+    """Имена каналов/единиц/тегов хранятся в справочниках по одному разу."""
+    for _ in range(2):
+        client.post(
+            f"/experiments/{experiment_id}/import",
+            files={"file": ("data.csv", sample_csv, "text/csv")},
+        )
+    assert db_session.scalar(select(func.count()).select_from(Channel)) == 5
+    assert set(db_session.scalars(select(Unit.name))) == {"C", "bar", "W"}
+    assert db_session.scalar(select(func.count()).select_from(Tag)) == 4
+    assert db_session.scalar(select(func.count()).select_from(DataPoint)) == 20
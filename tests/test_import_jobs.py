@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import gzip
+import logging
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.dependencies import get_db
+from app.main import app
+from app.models import ImportRun
+from app.services import import_job_service, import_parallel, import_service
+
+
+def _create_experiment(client) -> int:
+    return client.post("/experiments", json={"name": "Background"}).json()["id"]
+
+
+def _wait_finished(client, run_id: int, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        run = client.get(f"/imports/{run_id}").json()
+        if run["status"] not in ("queued", "running"):
+            return run
+        time.sleep(0.02)
+    raise AssertionError(f"Import run {run_id} did not finish in {timeout}s")
+
+
+def test_background_import_completes(file_client, sample_csv):
+    experiment_id = _create_experiment(file_client)
+    response = file_client.post(
+        f"/experiments/{experiment_id}/import",
+        params={"background": "true"},
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    assert response.status_code == 202
+    queued = response.json()
+    assert queued["status"] == "queued"
+    assert queued["bytes_total"] == len(sample_csv.encode())
+
+    run = _wait_finished(file_client, queued["id"])
+    assert run["status"] == "done"
+    assert run["inserted"] == 10
+    assert run["rows_processed"] == 10
+    assert run["bytes_processed"] == run["bytes_total"]
+
+    channels = file_client.get(f"/experiments/{experiment_id}/channels").json()
+    assert len(channels) == 5
+
+
+def test_background_import_gzip(file_client, sample_csv):
+    """Архив хранится в спуле сжатым; прогресс считается по сжатым байтам."""
+    compressed = gzip.compress(sample_csv.encode())
+    experiment_id = _create_experiment(file_client)
+    queued = file_client.post(
+        f"/experiments/{experiment_id}/import",
+        params={"background": "true"},
+        files={"file": ("data.csv.gz", compressed, "application/gzip")},
+    ).json()
+    assert queued["bytes_total"] == len(compressed)
+
+    run = _wait_finished(file_client, queued["id"])
+    assert run["status"] == "done"
+    assert run["inserted"] == 10
+    assert run["bytes_processed"] == len(compressed)
+    assert (run["compression"], run["uncompressed_bytes"]) == ("gzip", len(sample_csv.encode()))
+
+
+def test_background_import_invalid_header_fails(file_client):
+    experiment_id = _create_experiment(file_client)
+    queued = file_client.post(
+        f"/experiments/{experiment_id}/import",
+        params={"background": "true"},
+        files={"file": ("data.csv", "channel,timestamp\nTEMP_A,x\n", "text/csv")},
+    ).json()
+
+    run = _wait_finished(file_client, queued["id"])
+    assert run["status"] == "failed"
+    assert "CSV header must be exactly" in run["error_message"]
+
+
+def _gate_cancel_check(monkeypatch, *, seen: bool = True) -> tuple[threading.Event, threading.Event]:
+    """Останавливает воркер после первой зафиксированной пачки, до проверки запроса отмены.
+
+    seen=False — воркер не видит запрос на границах пачек (отмена пришла после последней).
+    """
+    started = threading.Event()
+    release = threading.Event()
+    original = import_job_service._cancel_requested
+
+    def gated(db, run_id):
+        started.set()
+        release.wait(timeout=5)
+        return original(db, run_id) if seen else False
+
+    monkeypatch.setattr(import_job_service, "_cancel_requested", gated)
+    return started, release
+
+
+def _submit(client, experiment_id, text) -> dict:
+    return client.post(
+        f"/experiments/{experiment_id}/import",
+        params={"background": "true"},
+        files={"file": ("data.csv", text, "text/csv")},
+    ).json()
+
+
+def _assert_rolled_back(client, experiment_id, run_id):
+    run = _wait_finished(client, run_id)
+    assert (run["status"], run["inserted"]) == ("cancelled", 0)
+    assert client.get(f"/experiments/{experiment_id}/summary").json()["total_points"] == 0
+    # Статистика уже зафиксированных пачек пересчитана после удаления точек
+    assert client.get(f"/experiments/{experiment_id}/channels").json() == []
+
+
+def test_cancel_running_import_rolls_back(file_client, sample_csv, monkeypatch):
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 2)
+    started, release = _gate_cancel_check(monkeypatch)
+    experiment_id = _create_experiment(file_client)
+    queued = _submit(file_client, experiment_id, sample_csv)
+
+    assert started.wait(timeout=5)
+    response = file_client.post(f"/imports/{queued['id']}/cancel")
+    assert response.status_code == 202
+    release.set()
+    _assert_rolled_back(file_client, experiment_id, queued["id"])
+
+
+@pytest.mark.parametrize("seen", [True, False])
+def test_cancel_from_other_process(file_client, sample_csv, monkeypatch, seen):
+    """Отмена, пришедшая в процесс без задачи, доходит до воркера через БД и не затирается done."""
+    monkeypatch.setattr(import_service, "IMPORT_BATCH_SIZE", 2)
+    started, release = _gate_cancel_check(monkeypatch, seen=seen)
+    experiment_id = _create_experiment(file_client)
+    queued = _submit(file_client, experiment_id, sample_csv)
+
+    assert started.wait(timeout=5)
+    # Событие отмены есть только у процесса, который выполняет задачу
+    with import_job_service._lock:
+        import_job_service._cancel_events.pop(queued["id"])
+    response = file_client.post(f"/imports/{queued['id']}/cancel")
+    assert response.json()["status"] == "cancelled"
+    release.set()
+    # Запись уже закрыта: ждём, пока воркер откатит пачки, записанные после отмены
+    import_job_service.shutdown()
+    _assert_rolled_back(file_client, experiment_id, queued["id"])
+
+
+def test_cancel_interrupted_import_deletes_points(file_client, sample_csv):
+    experiment_id = _create_experiment(file_client)
+    run_id = file_client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    ).json()["import_run_id"]
+    etag = file_client.get(f"/experiments/{experiment_id}/channels").headers["etag"]
+    # Импорт прерван перезапуском: задачи нет ни в одном процессе
+    db = next(app.dependency_overrides[get_db]())
+    try:
+        db.get(ImportRun, run_id).status = import_service.RUN_RUNNING
+        db.commit()
+    finally:
+        db.close()
+
+    assert file_client.post(f"/imports/{run_id}/cancel").json()["status"] == "cancelled"
+    _assert_rolled_back(file_client, experiment_id, run_id)
+    assert file_client.get(f"/experiments/{experiment_id}/channels").headers["etag"] != etag
+
+
+def test_cancel_finished_import_conflict(client, experiment_id, sample_csv):
+    run_id = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    ).json()["import_run_id"]
+    response = client.post(f"/imports/{run_id}/cancel")
+    assert response.status_code == 409
+
+
+def test_import_run_not_found(client):
+    assert client.get("/imports/9999").status_code == 404
+    assert client.post("/imports/9999/cancel").status_code == 404
+
+
+def test_startup_recovery_is_opt_in(file_client, monkeypatch):
+    experiment_id = _create_experiment(file_client)
+    db = next(app.dependency_overrides[get_db]())
+    try:
+        run = import_service._new_run(experiment_id, "data.csv", status=import_service.RUN_QUEUED)
+        db.add(run)
+        db.commit()
+        run_id = run.id
+    finally:
+        db.close()
+    spool = import_job_service.IMPORT_SPOOL_DIR
+    spool.mkdir(parents=True)
+    own = spool / f"run_{run_id}_data.csv"
+    # Загрузка, которую в этот момент сохраняет другой процесс
+    foreign = spool / "upload_0123_other.csv"
+    own.write_text("x")
+    foreign.write_text("x")
+
+    with TestClient(app):
+        pass
+    assert file_client.get(f"/imports/{run_id}").json()["status"] == "queued"
+    assert own.exists()
+
+    monkeypatch.setattr(main, "RECOVER_INTERRUPTED_JOBS", 1)
+    with TestClient(app):
+        pass
+    run = file_client.get(f"/imports/{run_id}").json()
+    assert (run["status"], run["error_message"]) == ("failed", "Interrupted by server restart")
+    assert not own.exists()
+    assert foreign.exists()
+
+
+def test_htmx_background_import_polls_progress(file_client, sample_csv):
+    experiment_id = _create_experiment(file_client)
+    response = file_client.post(
+        f"/ui/experiments/{experiment_id}/import",
+        data={"background": "true"},
+        files={"file": ("data.csv", sample_csv, "text/csv")},
+    )
+    assert response.status_code == 200
+    assert "/progress" in response.text
+
+    run_id = file_client.get(f"/experiments/{experiment_id}/imports").json()[0]["id"]
+    _wait_finished(file_client, run_id)
+    progress = file_client.get(f"/ui/imports/{run_id}/progress")
+    assert "Импортировано" in progress.text
+
+
+def test_split_ranges_are_line_aligned(tmp_path):
+    path = tmp_path / "data.jsonl"
+    path.write_bytes(b"aaaa\nbb\ncccccc\nd\n")
+    ranges = import_parallel._split_ranges(path, 0, 3)
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == path.stat().st_size
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+    data = path.read_bytes()
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges)
+
+
+@pytest.mark.parametrize("engine", ["rows", "columnar"])
+def test_parallel_import_counts_and_line_numbers(file_client, monkeypatch, caplog, engine):
+    """Счётчики и номера строк с ошибками совпадают с последовательным разбором."""
+    monkeypatch.setattr(import_parallel, "IMPORT_PARSE_PROCESSES", 2)
+    monkeypatch.setattr(import_parallel, "PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(import_parallel, "PARALLEL_CHUNK_BYTES", 200)
+
+    lines = ["timestamp,channel,value,unit,quality,tag"]
+    for i in range(60):
+        lines.append(f"2026-02-28T21:{i // 60:02d}:{i % 60:02d}+05:00,TEMP_A,{i},C,OK,temp")
+    lines[17] = "NOT_A_DATE,TEMP_A,1,C,OK,temp"
+    lines[42] = "2026-02-28T21:06:00+05:00,TEMP_A,x,C,OK,temp"
+    lines[50] = "2026-02-28T21:06:00+05:00,,1,C,OK,temp"
+    content = "\n".join(lines) + "\n"
+
+    experiment_id = _create_experiment(file_client)
+    with caplog.at_level(logging.WARNING, logger="app.services.import_parallel"):
+        queued = file_client.post(
+            f"/experiments/{experiment_id}/import",
+            params={"background": "true", "engine": engine},
+            files={"file": ("data.csv", content, "text/csv")},
+        ).json()
+        run = _wait_finished(file_client, queued["id"], timeout=60)
+
+    assert run["status"] == "done"
+    assert (run["inserted"], run["skipped"], run["errors"]) == (57, 1, 2)
+    assert run["bytes_processed"] == len(content)
+
+    messages = [r.getMessage() for r in caplog.records if r.name == "app.services.import_parallel"]
+    assert any("line 18:" in m for m in messages)
+    assert any("line 43:" in m for m in messages)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.dependencies import get_db
+from app.main import app
+from app.models import ImportRun
+from app.services import import_job_service, live_ingest_service
+from app.services.live_ingest_service import _LiveBuffer
+
+
+def _create_experiment(client) -> int:
+    return client.post("/experiments", json={"name": "Live"}).json()["id"]
+
+
+def _wait_run(client, run_id: int, predicate, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        run = client.get(f"/imports/{run_id}").json()
+        if predicate(run):
+            return run
+        time.sleep(0.02)
+    raise AssertionError(f"Import run {run_id} did not reach the expected state in {timeout}s")
+
+
+def test_http_stream_ingest(file_client, sample_jsonl, caplog):
+    experiment_id = _create_experiment(file_client)
+    body = (sample_jsonl + "not json\n" + '{"timestamp":"","channel":"X","value":1}\n').encode()
+
+    def chunks():
+        # Границы блоков не совпадают с границами строк
+        for i in range(0, len(body), 37):
+            yield body[i : i + 37]
+
+    response = file_client.post(
+        f"/experiments/{experiment_id}/ingest", params={"name": "bench.ndjson"}, content=chunks()
+    )
+    assert response.status_code == 200
+    run = response.json()
+    assert (run["inserted"], run["skipped"], run["errors"]) == (6, 1, 1)
+    assert run["status"] == "done"
+    assert run["source"] == "live"
+    assert run["filename"] == "bench.ndjson"
+    assert run["bytes_processed"] == run["bytes_total"] == len(body)
+    assert "line 7: invalid JSON" in caplog.text
+
+    summary = file_client.get(f"/experiments/{experiment_id}/summary").json()
+    assert summary["total_points"] == 6
+
+
+def test_http_stream_unknown_experiment(client):
+    response = client.post("/experiments/999/ingest", content=b"{}\n")
+    assert response.status_code == 404
+
+
+def test_websocket_counters_update_during_session(file_client, sample_jsonl, monkeypatch):
+    """Пачка меньше LIVE_BATCH_ROWS пишется по таймеру, пока сессия ещё открыта."""
+    monkeypatch.setattr(live_ingest_service, "LIVE_BATCH_ROWS", 10_000)
+    monkeypatch.setattr(live_ingest_service, "LIVE_FLUSH_MS", 20)
+    experiment_id = _create_experiment(file_client)
+    lines = sample_jsonl.splitlines()
+
+    with file_client.websocket_connect(f"/experiments/{experiment_id}/ingest/ws") as ws:
+        run_id = ws.receive_json()["import_run_id"]
+        ws.send_text("\n".join(lines[:3]))
+        run = _wait_run(file_client, run_id, lambda r: r["inserted"] == 3)
+        assert run["status"] == "running"
+
+        ws.send_bytes("\n".join(lines[3:]).encode())
+        ws.send_text('{"timestamp":"2026-02-28T21:13:00+05:00","channel":"X","value":"n/a"}')
+
+    run = _wait_run(file_client, run_id, lambda r: r["status"] != "running")
+    assert run["status"] == "done"
+    assert (run["inserted"], run["skipped"], run["errors"]) == (6, 0, 1)
+
+
+def test_websocket_unknown_experiment_closed(file_client):
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with file_client.websocket_connect("/experiments/999/ingest/ws") as ws:
+            ws.receive_json()
+    assert exc_info.value.code == 1008
+
+
+def test_too_many_sessions(file_client, monkeypatch):
+    monkeypatch.setattr(live_ingest_service, "LIVE_SESSIONS", 1)
+    experiment_id = _create_experiment(file_client)
+    with file_client.websocket_connect(f"/experiments/{experiment_id}/ingest/ws") as ws:
+        ws.receive_json()
+        response = file_client.post(f"/experiments/{experiment_id}/ingest", content=b"")
+        assert response.status_code == 503
+
+
+def test_buffer_backpressure():
+    buffer = _LiveBuffer(max_bytes=10)
+    assert buffer.put(b"0123456789", block=False)
+    # Буфер полон: неблокирующая запись отказывает, пока writer не заберёт блок
+    assert not buffer.put(b"x", block=False)
+    assert buffer.read() == b"0123456789"
+    assert buffer.put(b"x", block=False)
+    buffer.finish()
+    assert buffer.read() == b"x"
+    assert buffer.read() == b""
+
+
+def test_restart_keeps_live_points(file_client, sample_jsonl):
+    experiment_id = _create_experiment(file_client)
+    run = file_client.post(f"/experiments/{experiment_id}/ingest", content=sample_jsonl.encode()).json()
+    assert run["inserted"] == 6
+
+    db = next(app.dependency_overrides[get_db]())
+    try:
+        live_run = db.get(ImportRun, run["id"])
+        live_run.status = "running"
+        db.commit()
+        assert import_job_service.recover_interrupted_runs(db) == 1
+    finally:
+        db.close()
+
+    run = file_client.get(f"/imports/{run['id']}").json()
+    assert run["status"] == "failed"
+    assert file_client.get(f"/experiments/{experiment_id}/summary").json()["total_points"] == 6
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import io
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, event, func, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app import migrations
+from app.db import enable_sqlite_foreign_keys
+from app.models import Base, ChannelRollup, DataPoint, Experiment
+from app.services import analytics_service, export_service, import_service
+
+# Схема исходной версии (до миграций) в том виде, в каком её создавал create_all
+BASELINE_SCHEMA = """
+CREATE TABLE experiments (
+    id INTEGER NOT NULL, name VARCHAR(255) NOT NULL, stand VARCHAR(128), operator VARCHAR(128),
+    notes TEXT, created_at DATETIME NOT NULL, PRIMARY KEY (id)
+);
+CREATE TABLE import_runs (
+    id INTEGER NOT NULL, experiment_id INTEGER NOT NULL, started_at DATETIME NOT NULL,
+    filename VARCHAR(255) NOT NULL, inserted INTEGER NOT NULL, skipped INTEGER NOT NULL,
+    errors INTEGER NOT NULL, PRIMARY KEY (id),
+    FOREIGN KEY(experiment_id) REFERENCES experiments (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_import_runs_experiment_id ON import_runs (experiment_id);
+CREATE TABLE data_points (
+    id INTEGER NOT NULL, experiment_id INTEGER NOT NULL, import_run_id INTEGER NOT NULL,
+    timestamp DATETIME NOT NULL, channel VARCHAR(128) NOT NULL, value FLOAT NOT NULL,
+    unit VARCHAR(32), quality VARCHAR(8), tag VARCHAR(64), PRIMARY KEY (id),
+    FOREIGN KEY(experiment_id) REFERENCES experiments (id) ON DELETE CASCADE,
+    FOREIGN KEY(import_run_id) REFERENCES import_runs (id)
+);
+CREATE INDEX ix_dp_experiment_timestamp_channel ON data_points (experiment_id, timestamp, channel);
+CREATE INDEX ix_data_points_channel ON data_points (channel);
+CREATE INDEX ix_data_points_tag ON data_points (tag);
+CREATE INDEX ix_data_points_quality ON data_points (quality);
+CREATE INDEX ix_data_points_timestamp ON data_points (timestamp);
+CREATE INDEX ix_data_points_experiment_id ON data_points (experiment_id);
+CREATE INDEX ix_data_points_import_run_id ON data_points (import_run_id);
+INSERT INTO experiments VALUES (1, 'Old', NULL, NULL, NULL, '2026-02-28 21:00:00.000000');
+INSERT INTO import_runs VALUES (1, 1, '2026-02-28 21:00:00.000000', 'old.csv', 3, 0, 0);
+INSERT INTO data_points VALUES (1, 1, 1, '2026-02-28 16:06:00.000000', 'TEMP_A', 3.125, 'C', 'OK', 'temp');
+INSERT INTO data_points VALUES (2, 1, 1, '2026-02-28 16:07:00.250000', 'TEMP_A', 3.142, 'C', 'WARN', NULL);
+INSERT INTO data_points VALUES (3, 1, 1, '2026-02-28 16:07:00.000000', 'PRESS_1', 1.023, NULL, NULL, 'pressure');
+INSERT INTO import_runs VALUES (2, 2, '2026-02-28 21:00:00.000000', 'deleted.csv', 1, 0, 0);
+INSERT INTO data_points VALUES (4, 2, 2, '2026-02-28 16:08:00.000000', 'TEMP_A', 9.0, NULL, NULL, NULL);
+"""
+
+
+def _baseline_engine(tmp_path: Path):
+    # Исходная версия работала без PRAGMA foreign_keys: строки удалённых экспериментов оставались
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    baseline = create_engine(url, future=True)
+    with baseline.begin() as conn:
+        for statement in BASELINE_SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(text(statement))
+    baseline.dispose()
+    engine = create_engine(url, future=True)
+    event.listen(engine, "connect", enable_sqlite_foreign_keys)
+    return engine
+
+
+def test_upgrade_baseline_database(tmp_path):
+    engine = _baseline_engine(tmp_path)
+    assert migrations.upgrade(engine) == [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13]
+
+    columns = {c["name"] for c in inspect(engine).get_columns("data_points")}
+    assert {"channel_id", "unit_id", "tag_id", "ts_us", "tz_offset"} <= columns
+    assert not {"channel", "timestamp"} & columns
+    # Набор индексов совпадает с тем, что создаётся по моделям
+    indexes = {(i["name"], tuple(i["column_names"])) for i in inspect(engine).get_indexes("data_points")}
+    expected = {(i.name, tuple(c.name for c in i.columns)) for i in DataPoint.__table__.indexes}
+    assert indexes == expected
+    # Все колонки моделей есть после обновления: новые колонки добавляются только шагами миграций
+    for table in Base.metadata.sorted_tables:
+        columns = {c["name"] for c in inspect(engine).get_columns(table.name)}
+        assert columns == {c.name for c in table.columns}, table.name
+
+    with Session(engine) as db:
+        channels = analytics_service.get_channels(db, 1)
+        assert [(c["channel"], c["count"]) for c in channels] == [("PRESS_1", 1), ("TEMP_A", 2)]
+        assert (channels[1]["min"], channels[1]["max"]) == (3.125, 3.142)
+        assert channels[1]["p50"] == pytest.approx(3.1335)
+        hours = db.execute(
+            select(ChannelRollup.count, ChannelRollup.min, ChannelRollup.max, ChannelRollup.last_value)
+            .where(ChannelRollup.resolution == 3600)
+            .order_by(ChannelRollup.count)
+        ).all()
+        assert [tuple(row) for row in hours] == [(1, 1.023, 1.023, 1.023), (2, 3.125, 3.142, 3.142)]
+        summary = analytics_service.get_summary(db, 1)
+        assert summary["points_by_quality"] == {"OK": 1, "WARN": 1}
+        csv_text = export_service.export_csv(db, 1, None, None, None, None)
+        assert csv_text.splitlines()[1:] == [
+            "2026-02-28T16:06:00+00:00,TEMP_A,3.125,C,OK,temp",
+            "2026-02-28T16:07:00+00:00,PRESS_1,1.023,,,pressure",
+            "2026-02-28T16:07:00.250000+00:00,TEMP_A,3.142,C,WARN,",
+        ]
+        run = import_service.get_import_run(db, 1)
+        assert (run["status"], run["source"], run["inserted"]) == ("done", "file", 3)
+        assert db.scalar(select(Experiment.data_version)) == 0
+        # Строки удалённого эксперимента 2 (и построенные по ним сводки) удалены
+        assert db.scalar(select(func.count()).select_from(DataPoint)) == 3
+        assert analytics_service.get_channels(db, 2) == []
+        assert db.scalar(select(func.count()).select_from(ChannelRollup).where(ChannelRollup.experiment_id == 2)) == 0
+        # id 2 был у удалённого эксперимента: новый получает следующий
+        experiment = Experiment(name="New", created_at=datetime.now().astimezone())
+        db.add(experiment)
+        db.commit()
+        assert experiment.id == 3
+
+    # Повторный запуск ничего не делает
+    assert migrations.upgrade(engine) == []
+    engine.dispose()
+
+
+def test_rollup_first_offset_filled_from_points(tmp_path, sample_csv):
+    engine = create_engine(f"sqlite:///{tmp_path / 'v10.db'}", future=True)
+    migrations.upgrade(engine)
+    with Session(engine) as db:
+        experiment = Experiment(name="Local", created_at=datetime.now().astimezone())
+        db.add(experiment)
+        db.commit()
+        import_service._import_stream(io.BytesIO(sample_csv.encode()), "data.csv", experiment.id, db)
+    # База версии 10: агрегаты без смещения пояса
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE channel_rollups DROP COLUMN first_offset"))
+        migrations._set_version(conn, 10)
+
+    assert migrations.upgrade(engine) == [11, 12, 13]
+    with Session(engine) as db:
+        assert set(db.scalars(select(ChannelRollup.first_offset))) == {300}
+    engine.dispose()
+
+
+def test_new_database_is_stamped_latest(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}", future=True)
+    assert migrations.upgrade(engine) == []
+    with engine.connect() as conn:
+        assert migrations._get_version(conn) == migrations.LATEST_VERSION
+    engine.dispose()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import pytest
+
+from app.services import (
+    analytics_service,
+    experiment_service,
+    import_job_service,
+    import_service,
+    result_cache,
+    series_binary,
+)
+
+
+def _import(client, experiment_id, text) -> dict:
+    response = client.post(
+        f"/experiments/{experiment_id}/import",
+        files={"file": ("data.csv", text, "text/csv")},
+    )
+    assert response.status_code in (200, 201)
+    return response.json()
+
+
+def test_etag_and_not_modified(client, experiment_id, sample_csv):
+    _import(client, experiment_id, sample_csv)
+    first = client.get(f"/experiments/{experiment_id}/summary")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    again = client.get(f"/experiments/{experiment_id}/summary", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    # Список тегов и слабая форма тоже совпадают
+    listed = client.get(f"/experiments/{experiment_id}/summary", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert listed.status_code == 304
+
+    # Другие параметры — другой ETag
+    channels = client.get(f"/experiments/{experiment_id}/channels", headers={"If-None-Match": etag})
+    assert channels.status_code == 200
+    assert channels.headers["etag"] != etag
+
+
+def test_import_changes_etag(client, experiment_id, sample_csv):
+    _import(client, experiment_id, sample_csv)
+    before = client.get(f"/experiments/{experiment_id}/channels")
+
+    _import(client, experiment_id, sample_csv)
+    after = client.get(f"/experiments/{experiment_id}/channels", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    counts = {channel["channel"]: channel["count"] for channel in after.json()}
+    assert counts["TEMP_A"] == 8
+
+
+def test_deleted_points_change_data_version(client, experiment_id, sample_csv, db_session):
+    run_id = _import(client, experiment_id, sample_csv)["import_run_id"]
+    version = experiment_service.get_data_version_or_404(db_session, experiment_id)
+
+    import_job_service._fail_run(db_session, run_id, import_service.RUN_CANCELLED, None)
+    assert experiment_service.get_data_version_or_404(db_session, experiment_id) != version
+    assert client.get(f"/experiments/{experiment_id}/summary").json()["total_points"] == 0
+
+
+def test_deleted_experiment_id_is_not_reused(file_client, sample_csv):
+    experiment_id = file_client.post("/experiments", json={"name": "Old"}).json()["id"]
+    _import(file_client, experiment_id, sample_csv)
+    etag = file_client.get(f"/experiments/{experiment_id}/summary").headers["etag"]
+    file_client.delete(f"/experiments/{experiment_id}")
+
+    # Новый эксперимент не получает id удалённого, а с ним — его версию данных и кэш
+    new_id = file_client.post("/experiments", json={"name": "New"}).json()["id"]
+    assert new_id > experiment_id
+    _import(file_client, new_id, sample_csv.replace("TEMP_A", "TEMP_C"))
+    response = file_client.get(f"/experiments/{new_id}/summary", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    channels = file_client.get(f"/experiments/{new_id}/channels").json()
+    assert "TEMP_A" not in {channel["channel"] for channel in channels}
+    assert file_client.get(f"/experiments/{experiment_id}/summary").status_code == 404
+
+
+def test_cached_response_skips_queries(client, experiment_id, sample_csv, monkeypatch):
+    _import(client, experiment_id, sample_csv)
+    calls = []
+    original = analytics_service.get_channels
+
+    def counting(db, experiment_id, exact=False):
+        calls.append(exact)
+        return original(db, experiment_id, exact=exact)
+
+    monkeypatch.setattr(analytics_service, "get_channels", counting)
+    first = client.get(f"/experiments/{experiment_id}/channels")
+    second = client.get(f"/experiments/{experiment_id}/channels")
+    assert second.content == first.content
+    assert second.headers["content-type"] == first.headers["content-type"]
+    assert calls == [False]
+
+    client.get(f"/experiments/{experiment_id}/channels", params={"exact": True})
+    assert calls == [False, True]
+    _import(client, experiment_id, sample_csv)
+    client.get(f"/experiments/{experiment_id}/channels")
+    assert calls == [False, True, False]
+
+
+def test_series_key_normalizes_params(client, experiment_id, sample_csv):
+    _import(client, experiment_id, sample_csv)
+    url = f"/experiments/{experiment_id}/series"
+    utc = client.get(url, params={"channels": "TEMP_A", "start": "2026-02-28T16:07:00Z"})
+    local = client.get(url, params={"channels": "TEMP_A", "start": "2026-02-28T21:07:00+05:00"})
+    assert local.headers["etag"] == utc.headers["etag"]
+    assert local.headers["vary"] == "Accept"
+
+    binary = client.get(url, params={"channels": "TEMP_A"}, headers={"Accept": series_binary.MEDIA_TYPE})
+    assert binary.headers["content-type"] == series_binary.MEDIA_TYPE
+    json_body = client.get(url, params={"channels": "TEMP_A"})
+    assert json_body.headers["etag"] != binary.headers["etag"]
+    assert json_body.json()["TEMP_A"]
+
+    # Порядок каналов меняет ответ
+    ab = client.get(url, params={"channels": ["TEMP_A", "TEMP_B"]})
+    ba = client.get(url, params={"channels": ["TEMP_B", "TEMP_A"]})
+    assert ab.headers["etag"] != ba.headers["etag"]
+
+
+def test_series_stream_has_etag_but_is_not_cached(client, experiment_id, sample_csv):
+    _import(client, experiment_id, sample_csv)
+    url = f"/experiments/{experiment_id}/series"
+    cached = len(result_cache.cache)
+    streamed = client.get(url, params={"channels": "TEMP_A", "stream": True})
+    assert len(result_cache.cache) == cached
+    again = client.get(url, params={"channels": "TEMP_A", "stream": True}, headers={"If-None-Match": "*"})
+    assert again.status_code == 304
+    assert again.headers["etag"] == streamed.headers["etag"]
+
+    page = client.get(url, params={"channels": "TEMP_A", "limit": 2})
+    assert len(result_cache.cache) == cached + 1
+    assert client.get(url, params={"channels": "TEMP_A", "limit": 2}).json() == page.json()
+
+
+def test_analytics_not_found_and_errors_not_cached(client, experiment_id):
+    assert client.get("/experiments/9999/summary", headers={"If-None-Match": "*"}).status_code == 404
+    response = client.get(f"/experiments/{experiment_id}/series", params={"format": "xml"})
+    assert response.status_code == 400
+    assert len(result_cache.cache) == 0
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = result_cache.ResultCache(max_bytes=40)
+    for key in ("a", "b", "c"):
+        cache.put(key, result_cache.CachedResponse(b"x" * 10, "application/json"))
+    assert cache.get("a") is not None
+    cache.put("d", result_cache.CachedResponse(b"x" * 10, "application/json"))
+    cache.put("e", result_cache.CachedResponse(b"x" * 10, "application/json"))
+    assert cache.get("b") is None
+    assert [key for key in "acde" if cache.get(key) is not None] == ["a", "c", "d", "e"]
+    assert cache.size == 40
+
+    # Тело больше четверти бюджета не кэшируется
+    cache.put("big", result_cache.CachedResponse(b"x" * 11, "application/json"))
+    assert cache.get("big") is None
+    assert len(cache) == 4
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [(None, False), ("*", True), ('"abc"', True), ('W/"abc"', True), ('"x", "abc"', True), ('"abcd"', False)],
+)
+def test_not_modified(header, expected):
+    assert result_cache.not_modified(header, '"abc"') is expected
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services import series_binary
+
+
+def test_round_trip_is_aligned():
+    series = {
+        "TEMP_A": {"t": np.array([-1, 0, 1_772_294_760_000_001]), "v": np.array([1.5, -2.0, 3.25]), "total": 9},
+        "ПУСТОЙ": {"t": np.empty(0, np.int64), "v": np.empty(0), "total": 0},
+        "B": {"t": np.array([5]), "v": np.array([np.nan])},
+    }
+    body = series_binary.encode(series)
+    decoded = series_binary.decode(body)
+
+    assert list(decoded) == ["TEMP_A", "ПУСТОЙ", "B"]
+    assert decoded["TEMP_A"]["t"].tolist() == [-1, 0, 1_772_294_760_000_001]
+    assert decoded["TEMP_A"]["v"].tolist() == [1.5, -2.0, 3.25]
+    assert decoded["TEMP_A"]["total"] == 9
+    assert len(decoded["ПУСТОЙ"]["t"]) == 0
+    assert np.isnan(decoded["B"]["v"][0])
+    # Массивы — представления тела ответа (без копий), выровненные на 8 байт от его начала
+    start = np.frombuffer(body, dtype=np.uint8).ctypes.data
+    for columns in decoded.values():
+        for array in (columns["t"], columns["v"]):
+            assert (array.ctypes.data - start) % 8 == 0
+            assert not array.flags.owndata
+
+
+def test_decode_rejects_other_bodies():
+    with pytest.raises(ValueError):
+        series_binary.decode(b'{"TEMP_A": []}')
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        (None, False),
+        ("application/json", False),
+        ("application/vnd.experiment-series", True),
+        ("application/json;q=0.5, application/vnd.experiment-series", True),
+        ("application/vnd.experiment-series;q=0", False),
+        ("application/vnd.experiment-series; q=0.8", True),
+    ],
+)
+def test_accepts(accept, expected):
+    assert series_binary.accepts(accept) is expected
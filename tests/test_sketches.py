@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.sketches import Moments, TDigest
+
+
+def _parts(values: np.ndarray, count: int) -> list[np.ndarray]:
+    return np.array_split(values, count)
+
+
+def test_moments_merge_matches_numpy():
+    values = np.random.default_rng(1).normal(100.0, 3.0, 10_000)
+    merged = Moments()
+    for part in _parts(values, 7):
+        moments = Moments()
+        for batch in _parts(part, 5):
+            moments.add(batch)
+        merged.merge(moments)
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.stddev == pytest.approx(values.std(ddof=1))
+
+
+def test_moments_stddev_needs_two_values():
+    moments = Moments()
+    moments.add(np.array([1.0]))
+    assert moments.stddev is None
+
+
+@pytest.mark.parametrize("q", [0.01, 0.5, 0.95, 0.99])
+def test_tdigest_merged_quantiles(q):
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.normal(0.0, 1.0, 50_000), rng.exponential(5.0, 50_000)])
+    rng.shuffle(values)
+
+    digests = []
+    for part in _parts(values, 4):
+        digest = TDigest()
+        for batch in _parts(part, 10):
+            digest.add(batch)
+        digests.append(TDigest.from_bytes(digest.to_bytes()))
+    merged = TDigest()
+    merged.merge(digests)
+
+    assert merged.count == len(values)
+    assert len(merged.means) <= merged.compression
+    # Ошибка по рангу, а не по значению: для t-digest она мала у хвостов
+    rank = np.searchsorted(np.sort(values), merged.quantile(q)) / len(values)
+    assert rank == pytest.approx(q, abs=0.005)
+
+
+def test_tdigest_extremes_and_empty():
+    digest = TDigest()
+    assert digest.quantile(0.5) is None
+    digest.add(np.array([5.0, -1.0, 3.0]))
+    assert (digest.quantile(0.0), digest.quantile(1.0)) == (-1.0, 5.0)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.timestamps import (
+    FORMAT_GENERIC,
+    FORMAT_NAIVE,
+    FORMAT_OFFSET,
+    FORMAT_UTC,
+    TimestampParser,
+    detect_format,
+    format_epoch_us,
+    from_epoch_us,
+    parse_timestamp,
+    to_epoch_us,
+)
+
+SAMPLES = [
+    "2026-02-28T21:06:00+05:00",
+    "2026-02-28T21:06:59-03:30",
+    "2026-02-28T21:06:00Z",
+    "2026-02-28T21:06:00",
+    "2026-02-28 21:06:00",
+    "2026-02-28T21:06:00.250+05:00",
+    "2026-02-28",
+    "1969-12-31T23:59:59+00:00",
+]
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("2026-02-28T21:06:00+05:00", FORMAT_OFFSET),
+        ("2026-02-28T21:06:00Z", FORMAT_UTC),
+        ("2026-02-28T21:06:00", FORMAT_NAIVE),
+        ("2026-02-28T21:06:00.250+05:00", FORMAT_GENERIC),
+        ("2026-02-28", FORMAT_GENERIC),
+    ],
+)
+def test_detect_format(raw, expected):
+    assert detect_format(raw) == expected
+
+
+@pytest.mark.parametrize("first", SAMPLES)
+def test_parser_matches_parse_timestamp(first):
+    """Результат не зависит от того, какой формат определился по первой строке."""
+    parser = TimestampParser()
+    parser.parse(first)
+    for raw in SAMPLES:
+        expected = parse_timestamp(raw)
+        parsed = parser.parse(raw)
+        assert parsed == expected
+        assert parsed.utcoffset() == expected.utcoffset()
+
+        epoch_parser = TimestampParser()
+        epoch_parser.parse_epoch_us(first)
+        epoch_us, offset = epoch_parser.parse_epoch_us(raw)
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        assert epoch_us == (expected - epoch) // timedelta(microseconds=1)
+        assert offset == expected.utcoffset() // timedelta(minutes=1)
+
+
+@pytest.mark.parametrize("raw", ["NOT_A_DATE", "2026-02-30T21:06:00+05:00", "2026-02-28T21:06:60+05:00", ""])
+def test_parser_rejects_invalid_values(raw):
+    parser = TimestampParser()
+    parser.parse("2026-02-28T21:06:00+05:00")
+    with pytest.raises(ValueError, match="Cannot parse timestamp"):
+        parser.parse(raw)
+    with pytest.raises(ValueError, match="Cannot parse timestamp"):
+        parser.parse_epoch_us(raw)
+
+
+def test_parser_keeps_fraction_with_same_length_as_offset():
+    """'.12+05' и '.1234Z' той же длины, что '+05:00': дробная часть не теряется."""
+    rows = [
+        "2026-02-28T21:06:00+05:00",
+        "2026-02-28T21:06:00.12+05",
+        "2026-02-28T21:06:00.1234Z",
+        "2026-02-28T21:06:01+05:00",
+    ]
+    parser = TimestampParser()
+    parsed = [parser.parse_epoch_us(raw) for raw in rows]
+    assert parsed == [(1772294760000000, 300), (1772294760120000, 300), (1772312760123400, 0), (1772294761000000, 300)]
+
+
+def test_parser_memo_is_bounded():
+    parser = TimestampParser(memo_size=8)
+    start = datetime(2026, 2, 28, 21, 0, 0)
+    for i in range(100):
+        raw = (start + timedelta(seconds=i // 4)).isoformat() + "+05:00"
+        for _ in range(4):
+            assert parser.parse(raw) == parse_timestamp(raw)
+        assert len(parser._memo) + len(parser._memo_previous) <= 8
+    assert parser._memo_enabled
+
+
+def test_parser_memo_disabled_for_unique_values():
+    parser = TimestampParser(memo_size=8)
+    start = datetime(2026, 2, 28, 21, 0, 0)
+    for i in range(100):
+        raw = (start + timedelta(seconds=i)).isoformat()
+        assert parser.parse(raw) == parse_timestamp(raw)
+    assert not parser._memo_enabled
+
+
+@pytest.mark.parametrize("raw", SAMPLES)
+def test_epoch_us_round_trip(raw):
+    value = parse_timestamp(raw)
+    offset = int(value.utcoffset().total_seconds() // 60) if value.tzinfo else 0
+    epoch_us = to_epoch_us(value)
+    assert from_epoch_us(epoch_us, offset) == value.replace(tzinfo=value.tzinfo or timezone.utc)
+    assert format_epoch_us(epoch_us, offset) == from_epoch_us(epoch_us, offset).isoformat()